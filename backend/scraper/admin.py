@@ -1,8 +1,19 @@
 from django.contrib import admin
 from .models import Link
+from .search import search_links
 
 @admin.register(Link)
 class LinkAdmin(admin.ModelAdmin):
     list_display = ('url', 'type', 'relevance_score', 'keywords')
     list_filter = ('type', 'keywords')
     search_fields = ('url', 'metadata')
+    search_help_text = 'Full-text search on anchor text and URL ("phrase", or, -word)'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the indexed search vector instead of icontains scans over url and metadata
+        if not search_term.strip():
+            return queryset, False
+        return search_links(queryset, search_term), False
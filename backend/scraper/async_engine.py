@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import httpx
+
+from .frontier import AsyncFrontier
+from .politeness import parse_retry_after, THROTTLE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCrawlEngine:
+    """
+    Crawl engine built on an asyncio event loop and an async HTTP client.
+    Fetches are bounded by max_concurrency in-flight requests; URL handling
+    (canonicalize_url, is_internal, parse_links) and link processing are delegated
+    to the owning WebScraper, and URLs go through an AsyncFrontier, so both engines
+    produce the same results. A page is marked done once its links are saved.
+    """
+
+    def __init__(self, scraper, max_concurrency: int = 500, scoring_workers: int = 8,
+                 connect_timeout: float = 10.0, read_timeout: float = 30.0):
+        self.scraper = scraper
+        self.max_concurrency = max(1, max_concurrency)
+        self.scoring_workers = max(1, scoring_workers)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+
+    def run(self, start_url_canonical: str, base_domain: str, max_depth: int, pending: list = None) -> int:
+        """
+        Run the crawl to completion (or until a stop is requested). When resuming, pending
+        holds the (url, depth) pairs left by the previous run instead of the start URL.
+        Returns the number of visited URLs.
+        """
+        return asyncio.run(self._run(start_url_canonical, base_domain, max_depth, pending))
+
+    def _get_headers(self):
+        headers = self.scraper._get_headers()
+        # httpx only decodes brotli when the optional brotli package is installed
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        return headers
+
+    async def fetch_page(self, client: httpx.AsyncClient, url: str, depth: int, requeue) -> str:
+        """
+        Fetches a page through the scraper's per-host scheduler; throttled URLs are handed
+        to requeue(url, depth) while they may still be retried.
+        """
+        scheduler = self.scraper.host_scheduler
+        host = urlparse(url).netloc
+        while True:
+            wait = scheduler.try_acquire(host)
+            if wait <= 0:
+                break
+            if self.scraper.stop_requested:
+                return ""
+            await asyncio.sleep(min(wait, 0.5))
+
+        cached, conditional_headers = self.scraper.revalidation_headers(url)
+        started = time.monotonic()
+        response = None
+        try:
+            logger.debug(f"Sending request to {url}")
+            response = await client.get(url, headers={**self._get_headers(), **conditional_headers})
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {str(e)}")
+        finally:
+            latency = time.monotonic() - started
+            status = response.status_code if response is not None else None
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+            scheduler.release(host, status, latency, retry_after)
+            self.scraper.metrics.observe_fetch(latency, status, len(response.content) if status == 200 else 0)
+
+        if response is None:
+            return ""
+        if response.status_code in THROTTLE_STATUSES:
+            if self.scraper.should_retry(url, response.status_code):
+                requeue(url, depth)
+            return ""
+        self.scraper.clear_retries(url)
+        if response.status_code in (200, 304):
+            return self.scraper.page_from_response(url, response, cached)
+        logger.error(f"Error scraping {url}: Status code: {response.status_code}")
+        return ""
+
+    async def _run(self, start_url_canonical: str, base_domain: str, max_depth: int, pending: list = None) -> int:
+        loop = asyncio.get_running_loop()
+        parsed_start = urlparse(start_url_canonical)
+        # Same deduplication, ordering, trap checks and journal as the thread engine
+        frontier = AsyncFrontier(f"{parsed_start.scheme}://{parsed_start.netloc}", visited=self.scraper.visited,
+                                 journal=self.scraper.frontier_journal, trap_detector=self.scraper.trap_detector,
+                                 mode=self.scraper.frontier_mode, aging_window=self.scraper.aging_window)
+        if pending is None:
+            frontier.add(start_url_canonical, 0)
+        else:
+            for url, depth in pending:
+                frontier.restore(url, depth)
+        self.scraper.frontier = frontier
+        # Blocking work (LLM scoring and DB writes) runs off the event loop; parsing uses the default executor
+        executor = ThreadPoolExecutor(max_workers=self.scoring_workers, thread_name_prefix="async-crawl")
+        scoring_slots = asyncio.Semaphore(self.scoring_workers * 2)
+        scoring_tasks = set()
+
+        async def score(url, links):
+            completed = False
+            try:
+                if not self.scraper.stop_requested:
+                    saved = await loop.run_in_executor(executor, self.scraper.process_links, links)
+                    # Links left unscored (stop requested) keep the page pending
+                    completed = saved == len(links)
+            finally:
+                frontier.task_done(url, completed)
+                scoring_slots.release()
+
+        async def worker(client):
+            while True:
+                current_url, depth = await frontier.get()
+                # Stays False if the URL is skipped or cancelled by a stop, so a resume fetches it
+                completed = False
+                # Once the links are handed to score(), it marks the page done
+                handed_over = False
+                try:
+                    if self.scraper.stop_requested:
+                        continue
+                    if depth > max_depth:
+                        completed = True
+                        continue
+                    if not self.scraper.take_page():
+                        # Out of page budget: left pending, so a resume continues from here
+                        continue
+
+                    logger.info(f"Crawling: {current_url} (depth: {depth}, queue size: {frontier.qsize()}, visited: {frontier.visited_count()})")
+                    html = await self.fetch_page(client, current_url, depth, frontier.requeue)
+                    if self.scraper.stop_requested:
+                        continue
+                    if not html:
+                        completed = True
+                        continue
+
+                    links = await loop.run_in_executor(None, self.scraper.parse_links, html, current_url)
+                    new_links = []
+                    restored = self.scraper.is_restored(current_url)
+                    for link in links:
+                        if self.scraper.stop_requested:
+                            break
+                        canonical = self.scraper.canonicalize_url(link["url"])
+                        if not canonical or not self.scraper.is_internal(canonical, base_domain):
+                            continue
+                        # Links one level past max_depth are still scored, but never fetched
+                        if (frontier.add(canonical, depth + 1, enqueue=depth + 1 <= max_depth,
+                                         score=self.scraper.link_priority(link)) or restored):
+                            # Restored pages were found by the interrupted run, maybe without being saved
+                            new_links.append(link)
+                    completed = not self.scraper.stop_requested
+
+                    if new_links and completed:
+                        # Left pending if a stop cancels the wait for a slot
+                        completed = False
+                        # Backpressure: wait for a scoring slot before scheduling more LLM work
+                        await scoring_slots.acquire()
+                        task = asyncio.create_task(score(current_url, new_links))
+                        handed_over = True
+                        scoring_tasks.add(task)
+                        task.add_done_callback(scoring_tasks.discard)
+                finally:
+                    if not handed_over:
+                        frontier.task_done(current_url, completed)
+
+        async def watch_stop():
+            while not self.scraper.stop_requested:
+                await asyncio.sleep(0.5)
+
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits, follow_redirects=True) as client:
+            workers = [asyncio.create_task(worker(client)) for _ in range(self.max_concurrency)]
+            done_task = asyncio.create_task(frontier.join())
+            stop_task = asyncio.create_task(watch_stop())
+            await asyncio.wait([done_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+            for task in workers + [done_task, stop_task]:
+                task.cancel()
+            await asyncio.gather(*workers, done_task, stop_task, return_exceptions=True)
+
+        if scoring_tasks:
+            await asyncio.gather(*scoring_tasks, return_exceptions=True)
+        executor.shutdown(wait=True)
+        return frontier.visited_count()
@@ -0,0 +1,202 @@
+import hashlib
+import http.server
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from . import llm_cache, llm_processor
+from .frontier import peak_rss_bytes
+from .models import Crawler
+from .politeness import HostScheduler
+from .services import WebScraper
+
+logger = logging.getLogger(__name__)
+
+# Anchor texts of the synthetic site: boilerplate, keyword hits, type hints and noise,
+# so the pre-filter settles some links and sends the rest to the (fake) LLM
+ANCHOR_TEXTS = [
+    "Home", "Contact us", "Next page", "Read more", "Annual budget report", "Budget 2024 (PDF)",
+    "Budget office staff", "City news", "Permit services", "Department directory", "Public hearing",
+    "Meeting minutes", "Forms and applications", "About the council", "Procurement notices",
+    "Budget amendments", "Press releases", "Tax rates", "Parks and recreation", "Job openings",
+]
+
+LINK_CATEGORIES = ["document", "contact", "service", "news", "unknown"]
+
+
+def _unit(*parts) -> float:
+    """Deterministic number in [0, 1) derived from the parts."""
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+class SyntheticSite:
+    """
+    Generated site graph served from a local HTTP server. Page i links to the next
+    pages of a fan-out tree (so every page is reachable) plus random pages. A fraction
+    of the pages are slow or answer 500; everything is derived from the seed.
+    """
+
+    def __init__(self, pages: int = 1000, fanout: int = 10, page_size: int = 20_000,
+                 slow_ratio: float = 0.0, slow_delay: float = 0.5, error_ratio: float = 0.0, seed: int = 0):
+        self.pages = max(1, pages)
+        self.fanout = max(1, fanout)
+        self.page_size = page_size
+        self.slow_ratio = slow_ratio
+        self.slow_delay = slow_delay
+        self.error_ratio = error_ratio
+        self.seed = seed
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def links(self, page: int) -> list:
+        rng = random.Random(f"{self.seed}-{page}")
+        tree = [page * self.fanout + k for k in range(1, self.fanout + 1) if page * self.fanout + k < self.pages]
+        return tree + [rng.randrange(self.pages) for _ in range(self.fanout - len(tree))]
+
+    def render(self, page: int) -> str:
+        rng = random.Random(f"{self.seed}-text-{page}")
+        anchors = "".join(
+            f'<li><a href="/p/{target}">{rng.choice(ANCHOR_TEXTS)} {target}</a></li>'
+            for target in self.links(page)
+        )
+        body = f"<html><head><title>Page {page}</title></head><body><h1>Page {page}</h1><ul>{anchors}</ul>"
+        filler = "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>"
+        padding = max(0, self.page_size - len(body)) // len(filler) + 1
+        return body + filler * padding + "</body></html>"
+
+    def _handler(self):
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                match = re.fullmatch(r"/(?:p/(\d+))?", self.path)
+                page = int(match.group(1) or 0) if match else None
+                if page is None or page >= site.pages:
+                    return self._send(404, b"not found")
+                if _unit(site.seed, "slow", page) < site.slow_ratio:
+                    time.sleep(site.slow_delay)
+                if _unit(site.seed, "error", page) < site.error_ratio:
+                    return self._send(500, b"error")
+                self._send(200, site.render(page).encode("utf-8"))
+
+            def _send(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakeLLM:
+    """
+    Deterministic stand-in for ollama_llm: answers the batch, score and classification
+    prompts with values derived from the link text, after base_latency plus
+    per_text_latency for every text in the prompt.
+    """
+
+    def __init__(self, base_latency: float = 0.05, per_text_latency: float = 0.005):
+        self.base_latency = base_latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if "Texts:\n" in prompt:
+            texts = re.findall(r"^\d+\. (.*)$", prompt.split("Texts:\n", 1)[1], re.MULTILINE)
+            time.sleep(self.base_latency + self.per_text_latency * len(texts))
+            return json.dumps([
+                {"id": i, "score": int(_unit("score", text) * 100),
+                 "category": LINK_CATEGORIES[int(_unit("category", text) * len(LINK_CATEGORIES))]}
+                for i, text in enumerate(texts, start=1)
+            ])
+        time.sleep(self.base_latency + self.per_text_latency)
+        match = re.search(r'(?:Text: |Link text: ")(.*)', prompt)
+        text = match.group(1) if match else prompt
+        if "Return only the category name" in prompt:
+            return LINK_CATEGORIES[int(_unit("category", text) * len(LINK_CATEGORIES))]
+        return str(int(_unit("score", text) * 100))
+
+
+def run_benchmark(start_url: str, user, workers: int, engine: str = "threads", keyword: str = "budget",
+                  max_depth: int = 50, llm: FakeLLM = None, host_rate: float = 1000.0, keep: bool = False,
+                  **scraper_options) -> dict:
+    """
+    Crawl the synthetic site once with the fake LLM and return the measurements. The LLM
+    score cache is keyed per run, so every run starts cold.
+    """
+    llm = llm or FakeLLM()
+    original_llm, original_model = llm_processor.ollama_llm, llm_cache.MODEL_NAME
+    llm_processor.ollama_llm = llm
+    llm_cache.MODEL_NAME = f"benchmark-{time.time_ns()}"
+    llm_calls_before = llm_processor.get_llm_call_count()
+    try:
+        scraper = WebScraper(keyword=keyword, user=user, **scraper_options)
+        scraper.allowed_schemes = ("http", "https")
+        # Every run fetches and parses every page
+        scraper.http_cache = None
+        # No politeness limits against our own server
+        scraper.host_scheduler = HostScheduler(rate=host_rate, burst=host_rate, max_rate=host_rate,
+                                               concurrency=max(workers, 1), max_concurrency=max(workers, 1))
+        started = time.monotonic()
+        scraper.crawl(start_url, max_depth=max_depth, max_workers=workers, engine=engine)
+        elapsed = time.monotonic() - started
+    finally:
+        llm_processor.ollama_llm, llm_cache.MODEL_NAME = original_llm, original_model
+
+    crawler = Crawler.objects.get(id=scraper.crawler_model.id)
+    stats = crawler.stats or {}
+    metrics = stats.get("metrics", {})
+    counters = metrics.get("counters", {})
+    links = crawler.links.count()
+    result = {
+        "engine": engine,
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "pages": counters.get("pages_fetched", 0),
+        "pages_per_sec": round(counters.get("pages_fetched", 0) / elapsed, 2),
+        "links": links,
+        "links_per_sec": round(links / elapsed, 2),
+        "llm_calls": llm_processor.get_llm_call_count() - llm_calls_before,
+        "llm_texts": counters.get("llm_texts", 0),
+        "db_writes": counters.get("db_rows", 0),
+        "db_flushes": counters.get("db_flushes", 0),
+        "fetch_latency_p50": metrics.get("fetch_latency", {}).get("p50"),
+        "fetch_latency_p95": metrics.get("fetch_latency", {}).get("p95"),
+        "prefilter": stats.get("prefilter"),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    if not keep:
+        crawler.delete()
+    return result
@@ -0,0 +1,93 @@
+import hashlib
+import re
+import threading
+from array import array
+
+_SCRIPT_RE = re.compile(r"<(script|style|noscript)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]*>")
+_TOKEN_RE = re.compile(r"\w+")
+
+# Features are runs of SHINGLE_SIZE words, so word order matters
+SHINGLE_SIZE = 3
+# Pages with fewer words (e.g. pages rendered by JavaScript) are never treated as duplicates
+MIN_TOKENS = 20
+
+
+def simhash(html: str):
+    """
+    64-bit SimHash of the visible text of a page (3-word shingles), or None if the page
+    has too little text. Pages with similar text get fingerprints a few bits apart.
+    """
+    text = _TAG_RE.sub(" ", _SCRIPT_RE.sub(" ", html))
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < MIN_TOKENS:
+        return None
+
+    # Bit votes are counted per byte value of the feature hashes (8 counters per feature
+    # instead of 64), then spread over the bits once per distinct byte value
+    byte_counts = [[0] * 256 for _ in range(8)]
+    features = len(tokens) - SHINGLE_SIZE + 1
+    for i in range(features):
+        digest = hashlib.blake2b(" ".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"), digest_size=8).digest()
+        for position, value in enumerate(digest):
+            byte_counts[position][value] += 1
+
+    fingerprint = 0
+    for position, counts in enumerate(byte_counts):
+        bit_votes = [0] * 8
+        for value, count in enumerate(counts):
+            if count:
+                for bit in range(8):
+                    if value >> bit & 1:
+                        bit_votes[bit] += count
+        for bit, votes in enumerate(bit_votes):
+            if 2 * votes > features:
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """
+    Per-crawl index of page SimHashes answering "is there a page within max_distance
+    bits?". The 64 bits are split into max_distance + 1 bands: two fingerprints that
+    close agree exactly on at least one band, so only pages sharing a band value are
+    compared. Each page costs one 8-byte array slot per band.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        self.max_distance = max(0, min(max_distance, 31))
+        bands = self.max_distance + 1
+        width = 64 // bands
+        # (shift, mask) per band; the last band takes the remaining bits
+        self._bands = [
+            (i * width, (1 << (64 - i * width if i == bands - 1 else width)) - 1)
+            for i in range(bands)
+        ]
+        self._tables = [{} for _ in self._bands]
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "duplicates": 0, "skipped_short": 0}
+
+    def check_and_add(self, fingerprint) -> bool:
+        """True if a page within max_distance bits was seen before; otherwise remembers this one."""
+        if fingerprint is None:
+            with self._lock:
+                self.stats["skipped_short"] += 1
+            return False
+        keys = [(fingerprint >> shift) & mask for shift, mask in self._bands]
+        with self._lock:
+            self.stats["checked"] += 1
+            for table, key in zip(self._tables, keys):
+                for other in table.get(key, ()):
+                    if (fingerprint ^ other).bit_count() <= self.max_distance:
+                        self.stats["duplicates"] += 1
+                        return True
+            for table, key in zip(self._tables, keys):
+                bucket = table.get(key)
+                if bucket is None:
+                    bucket = table[key] = array("Q")
+                bucket.append(fingerprint)
+        return False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "max_distance": self.max_distance}
@@ -0,0 +1,326 @@
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Crawler, FrontierEntry
+from .pipeline import Stage
+from .recrawl import recrawl_report
+from .politeness import HostScheduler
+from .services import WebScraper, canonicalize_url
+from .sessions import SessionPool
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of processing one leased URL
+DONE = "done"
+RETRY = "retry"
+RELEASE = "release"
+
+
+def submit_distributed_crawl(start_url: str, keyword: str, user, max_depth: int = 3, recrawl_of: Crawler = None) -> Crawler:
+    """Create a crawler whose frontier is processed by crawl_worker processes, seeded with the start URL."""
+    seed = canonicalize_url(start_url, WebScraper.allowed_schemes)
+    if not seed:
+        raise ValueError(f"Cannot crawl {start_url}: only {', '.join(WebScraper.allowed_schemes)} URLs are allowed")
+    crawler = Crawler.objects.create(
+        url=start_url,
+        keyword=keyword,
+        is_running=True,
+        status=Crawler.RUNNING,
+        max_depth=max_depth,
+        user=user,
+        distributed=True,
+        recrawl_of=recrawl_of
+    )
+    # Canonical like the links workers discover, so a link back to the start page is not fetched twice
+    FrontierEntry.objects.create(crawler=crawler, url=seed, depth=0)
+    return crawler
+
+
+def lease_entries(worker_id: str, limit: int, lease_seconds: float, crawler_ids=None) -> list:
+    """
+    Lease up to limit pending URLs of running distributed crawls. Rows locked by another
+    worker's lease transaction are skipped instead of waited for, and a lease whose
+    leased_until has passed (its worker died or stalled) can be taken over.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = FrontierEntry.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+            Q(leased_until__isnull=True) | Q(leased_until__lt=now),
+            state=FrontierEntry.PENDING,
+            crawler__distributed=True,
+            crawler__is_running=True
+        )
+        if crawler_ids:
+            queryset = queryset.filter(crawler_id__in=crawler_ids)
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:limit])
+        if ids:
+            FrontierEntry.objects.filter(id__in=ids).update(
+                lease_owner=worker_id,
+                leased_until=now + timedelta(seconds=lease_seconds)
+            )
+    return list(FrontierEntry.objects.filter(id__in=ids).select_related('crawler').order_by('id'))
+
+
+def record_children(crawler: Crawler, urls: list, depth: int, pending: bool, batch_size: int = 500,
+                    allow=None) -> list:
+    """
+    Insert the URLs into the crawler's frontier. Returns the URLs that were not recorded
+    yet; the unique (crawler, url) key keeps concurrent workers from inserting one twice.
+    allow(url) (e.g. TrapDetector.allow) is asked about every new URL; the ones it rejects
+    are recorded as done instead of pending.
+    """
+    new_urls = []
+    for start in range(0, len(urls), batch_size):
+        chunk = urls[start:start + batch_size]
+        existing = set(FrontierEntry.objects.filter(crawler=crawler, url__in=chunk).values_list('url', flat=True))
+        new_urls.extend(url for url in chunk if url not in existing)
+
+    def state(url):
+        if pending and (allow is None or allow(url)):
+            return FrontierEntry.PENDING
+        return FrontierEntry.DONE
+
+    FrontierEntry.objects.bulk_create(
+        [FrontierEntry(crawler=crawler, url=url, depth=depth, state=state(url)) for url in new_urls],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    )
+    return new_urls
+
+
+class CrawlWorker:
+    """
+    Processes distributed crawls from the shared frontier table. Each worker leases a
+    batch of URLs, fetches and parses them with `concurrency` threads, records the new
+    links in the frontier, scores them into Link, and then marks the batch done. A
+    heartbeat thread keeps the leases alive while the batch is being processed, so a
+    worker that dies only delays its URLs by lease_seconds. Any number of workers can
+    run on any number of machines against the same database.
+    """
+
+    def __init__(self, worker_id: str = None, concurrency: int = 8, batch_size: int = None,
+                 lease_seconds: float = 120.0, heartbeat_interval: float = 30.0, idle_sleep: float = 2.0,
+                 retry_delay: float = 10.0, crawler_ids=None, pool_size: int = 10, host_rate: float = 10.0):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        self.batch_size = batch_size or self.concurrency * 2
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_sleep = idle_sleep
+        self.retry_delay = retry_delay
+        self.crawler_ids = crawler_ids
+        # Shared by every crawl this worker processes, so per-host limits apply across crawls
+        self.session_pool = SessionPool(pool_size=pool_size)
+        self.host_scheduler = HostScheduler(rate=host_rate, burst=max(1.0, host_rate))
+        self._scrapers = {}
+        self._scrapers_lock = threading.Lock()
+        self._leased = set()
+        self._leased_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"batches": 0, "done": 0, "retried": 0, "released": 0, "lease_renewals": 0}
+
+    def stop(self):
+        """Finish the current batch quickly and exit; unprocessed URLs are released."""
+        self._stop.set()
+        with self._scrapers_lock:
+            for scraper in self._scrapers.values():
+                scraper.stop_requested = True
+
+    def _scraper_for(self, crawler: Crawler) -> WebScraper:
+        """WebScraper holding the per-crawl state (keyword, score cache, link buffer)."""
+        with self._scrapers_lock:
+            scraper = self._scrapers.get(crawler.id)
+            if scraper is None:
+                scraper = WebScraper(
+                    keyword=crawler.keyword,
+                    user=None,
+                    near_duplicate_distance=getattr(settings, 'CRAWL_NEAR_DUPLICATE_DISTANCE', 3),
+                    trap_detection=getattr(settings, 'CRAWL_TRAP_DETECTION', True),
+                    trap_limits=getattr(settings, 'CRAWL_TRAP_LIMITS', {})
+                )
+                scraper.session_pool.close()
+                scraper.session_pool = self.session_pool
+                scraper.host_scheduler = self.host_scheduler
+                scraper.attach(crawler)
+                scraper.stop_requested = self._stop.is_set()
+                self._scrapers[crawler.id] = scraper
+            return scraper
+
+    def process_entry(self, entry: FrontierEntry) -> str:
+        crawler = entry.crawler
+        scraper = self._scraper_for(crawler)
+        if scraper.stop_requested:
+            return RELEASE
+        if entry.depth > crawler.max_depth:
+            return DONE
+
+        retry = []
+        html = scraper.polite_fetch(entry.url, entry.depth, lambda url, depth: retry.append(url))
+        if retry:
+            return RETRY
+        if scraper.stop_requested:
+            return RELEASE
+        if not html:
+            return DONE
+
+        base_domain = urlparse(crawler.url).netloc
+        candidates = {}
+        for link in scraper.parse_links(html, entry.url):
+            canonical = scraper.canonicalize_url(link["url"])
+            if canonical and scraper.is_internal(canonical, base_domain) and canonical not in candidates:
+                candidates[canonical] = link
+        # Links one level past max_depth are still scored, but never fetched
+        new_urls = record_children(
+            crawler,
+            list(candidates),
+            entry.depth + 1,
+            pending=entry.depth + 1 <= crawler.max_depth,
+            # Per worker: each worker only counts the URLs it discovered itself
+            allow=scraper.trap_detector.allow if scraper.trap_detector is not None else None
+        )
+        scraper.process_links([candidates[url] for url in new_urls])
+        return DONE
+
+    def _heartbeat(self):
+        try:
+            while not self._stop.wait(self.heartbeat_interval):
+                with self._leased_lock:
+                    ids = list(self._leased)
+                if not ids:
+                    continue
+                try:
+                    FrontierEntry.objects.filter(id__in=ids, lease_owner=self.worker_id).update(
+                        leased_until=timezone.now() + timedelta(seconds=self.lease_seconds)
+                    )
+                    self.stats["lease_renewals"] += 1
+                except Exception as e:
+                    logger.error(f"Error renewing leases of worker {self.worker_id}: {e}")
+        finally:
+            connection.close()
+
+    def _finish_batch(self, entries: list, results: list):
+        # Links go to the database before their pages are marked done
+        crawlers = {entry.crawler_id: entry.crawler for entry in entries}
+        for crawler_id in crawlers:
+            scraper = self._scrapers.get(crawler_id)
+            if scraper is not None:
+                scraper.link_buffer.flush()
+
+        by_result = {DONE: [], RETRY: [], RELEASE: []}
+        for entry, result in zip(entries, results):
+            by_result[result].append(entry.id)
+        now = timezone.now()
+        FrontierEntry.objects.filter(id__in=by_result[DONE]).update(
+            state=FrontierEntry.DONE, lease_owner='', leased_until=None
+        )
+        # Throttled URLs become available again once the host had time to recover
+        FrontierEntry.objects.filter(id__in=by_result[RETRY]).update(
+            lease_owner='', leased_until=now + timedelta(seconds=self.retry_delay)
+        )
+        FrontierEntry.objects.filter(id__in=by_result[RELEASE]).update(lease_owner='', leased_until=None)
+        with self._leased_lock:
+            self._leased.difference_update(entry.id for entry in entries)
+        self.stats["done"] += len(by_result[DONE])
+        self.stats["retried"] += len(by_result[RETRY])
+        self.stats["released"] += len(by_result[RELEASE])
+
+        for crawler in crawlers.values():
+            if not FrontierEntry.objects.filter(crawler=crawler, state=FrontierEntry.PENDING).exists():
+                self._finish_crawler(crawler)
+
+    def _close_scraper(self, crawler_id: int):
+        with self._scrapers_lock:
+            scraper = self._scrapers.pop(crawler_id, None)
+        if scraper is not None:
+            scraper.link_buffer.close()
+
+    def _evict_scrapers(self):
+        """
+        Close the scrapers of crawls this worker has nothing left to do for: crawls that
+        were stopped or finished elsewhere, and crawls whose pending URLs are all leased by
+        other workers. URLs waiting out their retry delay still count as leasable.
+        """
+        with self._scrapers_lock:
+            crawler_ids = list(self._scrapers)
+        if not crawler_ids:
+            return
+        active = set(FrontierEntry.objects.filter(
+            Q(lease_owner='') | Q(leased_until__isnull=True) | Q(leased_until__lt=timezone.now()),
+            crawler_id__in=crawler_ids,
+            state=FrontierEntry.PENDING,
+            crawler__is_running=True
+        ).values_list('crawler_id', flat=True).distinct())
+        for crawler_id in crawler_ids:
+            if crawler_id not in active:
+                self._close_scraper(crawler_id)
+
+    def _finish_crawler(self, crawler: Crawler):
+        finished = Crawler.objects.filter(id=crawler.id, is_running=True).update(
+            status=Crawler.FINISHED,
+            is_running=False,
+            end_time=timezone.now()
+        )
+        if finished:
+            logger.info(f"Distributed crawler {crawler.id} finished")
+        self._close_scraper(crawler.id)
+        if finished and crawler.recrawl_of_id:
+            # Every worker wrote its links before marking its last URLs done
+            try:
+                report = recrawl_report(crawler)
+                crawler.refresh_from_db(fields=['stats'])
+                crawler.stats = {**(crawler.stats or {}), "recrawl": report}
+                crawler.save(update_fields=['stats'])
+            except Exception as e:
+                logger.error(f"Error comparing crawler {crawler.id} with its previous crawl: {e}")
+
+    def run(self, exit_when_idle: bool = False):
+        """Lease and process batches until stop() is called (or, with exit_when_idle, until nothing is left)."""
+        logger.info(f"Crawl worker {self.worker_id} started")
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        results = {}
+
+        def process(entry):
+            results[entry.id] = self.process_entry(entry)
+
+        stage = Stage("crawl-worker", process, self.concurrency, queue_size=self.batch_size).start()
+        try:
+            while not self._stop.is_set():
+                entries = lease_entries(self.worker_id, self.batch_size, self.lease_seconds, self.crawler_ids)
+                if not entries:
+                    self._evict_scrapers()
+                    if exit_when_idle:
+                        break
+                    self._stop.wait(self.idle_sleep)
+                    continue
+                with self._leased_lock:
+                    self._leased.update(entry.id for entry in entries)
+                results.clear()
+                for entry in entries:
+                    stage.put(entry)
+                stage.queue.join()
+                # Failed URLs count as done, so a page that always fails is not retried forever
+                self._finish_batch(entries, [results.get(entry.id, DONE) for entry in entries])
+                self._evict_scrapers()
+                self.stats["batches"] += 1
+        finally:
+            self._stop.set()
+            stage.close()
+            heartbeat.join(timeout=5)
+            with self._scrapers_lock:
+                scrapers = list(self._scrapers.values())
+                self._scrapers = {}
+            for scraper in scrapers:
+                scraper.link_buffer.close()
+            self.session_pool.close()
+            logger.info(f"Crawl worker {self.worker_id} stopped: {self.stats}")
+        return self.stats
@@ -0,0 +1,178 @@
+import csv
+
+import orjson
+from rest_framework.renderers import BaseRenderer
+
+from .streaming import NDJSONRenderer
+
+EXPORT_FIELDS = ('id', 'url', 'type', 'relevance_score', 'keywords', 'metadata', 'created_at', 'updated_at', 'crawler_id')
+
+# Rows fetched per round trip of the server-side cursor, and per Parquet row group
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ExportUnavailable(Exception):
+    """The requested export format needs an optional dependency that is not installed."""
+
+
+def export_rows(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Rows of EXPORT_FIELDS as tuples, read with a server-side cursor (chunked fetches on
+    databases without one), so no more than chunk_size rows are in memory at a time.
+    """
+    return queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_ndjson(rows, chunk_size: int = EXPORT_CHUNK_SIZE):
+    for chunk in _chunks(rows, chunk_size):
+        # orjson writes datetimes and UUIDs natively; one write per chunk, not per row
+        yield b"".join(
+            orjson.dumps(dict(zip(EXPORT_FIELDS, row)), option=orjson.OPT_APPEND_NEWLINE)
+            for row in chunk
+        )
+
+
+class _LineBuffer:
+    """File-like target for csv.writer that hands back what was written."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self) -> bytes:
+        data = "".join(self.parts).encode("utf-8")
+        self.parts = []
+        return data
+
+
+def iter_csv(rows, chunk_size: int = EXPORT_CHUNK_SIZE):
+    metadata = EXPORT_FIELDS.index('metadata')
+    timestamps = [EXPORT_FIELDS.index('created_at'), EXPORT_FIELDS.index('updated_at')]
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.drain()
+    for chunk in _chunks(rows, chunk_size):
+        for row in chunk:
+            row = list(row)
+            row[metadata] = orjson.dumps(row[metadata]).decode("utf-8")
+            for i in timestamps:
+                row[i] = row[i].isoformat()
+            writer.writerow(row)
+        yield buffer.drain()
+
+
+class _ChunkSink:
+    """Write-only file that keeps what was written until drained (Parquet output stream)."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_schema():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ExportUnavailable("Parquet export requires pyarrow (pip install -r requirements-parquet.txt)")
+    return pa.schema([
+        ('id', pa.int64()),
+        ('url', pa.string()),
+        ('type', pa.string()),
+        ('relevance_score', pa.float64()),
+        ('keywords', pa.string()),
+        ('metadata', pa.string()),
+        ('created_at', pa.timestamp('us', tz='UTC')),
+        ('updated_at', pa.timestamp('us', tz='UTC')),
+        ('crawler_id', pa.string()),
+    ])
+
+
+def iter_parquet(rows, chunk_size: int = EXPORT_CHUNK_SIZE, schema=None):
+    """One row group per chunk; the bytes of each row group are sent as soon as it is written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = schema or parquet_schema()
+    metadata = EXPORT_FIELDS.index('metadata')
+    crawler = EXPORT_FIELDS.index('crawler_id')
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='zstd')
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            columns = [list(column) for column in zip(*chunk)]
+            columns[metadata] = [orjson.dumps(value).decode("utf-8") for value in columns[metadata]]
+            columns[crawler] = [str(value) for value in columns[crawler]]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    # Footer
+    yield sink.drain()
+
+
+class CSVRenderer(BaseRenderer):
+    """CSV; non-export responses (errors) are sent as key,value rows."""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer)
+        for key, value in (data or {}).items():
+            writer.writerow([key, value])
+        return buffer.drain()
+
+
+class ParquetRenderer(BaseRenderer):
+    """Parquet; non-export responses (errors) are sent as JSON text."""
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return orjson.dumps(data)
+
+
+EXPORT_RENDERERS = [NDJSONRenderer, CSVRenderer, ParquetRenderer]
+
+EXPORT_ENCODERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+    'parquet': iter_parquet,
+}
@@ -0,0 +1,211 @@
+import re
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# Elements that never have content, so they are never left open (same list Beautiful Soup uses)
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta',
+    'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+    'nextid', 'spacer',
+])
+
+# Text inside these elements is not part of an anchor's visible text
+NON_TEXT_ELEMENTS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+def resolve_href(href: str, attrs: dict):
+    """
+    Returns the usable href of an <a> element, or None if there is none.
+    When href is "javascript:..." the URL is taken from data-href, data-url or an
+    http(s) URL inside onclick.
+    """
+    href = href.strip()
+
+    # If href is "javascript:void(0)" or similar, try alternative attributes
+    if href.lower().startswith("javascript:"):
+        href_alternatives = [attrs.get("data-href"), attrs.get("data-url"), attrs.get("onclick")]
+        for alt in href_alternatives:
+            if alt:
+                if "onclick" in attrs and alt == attrs.get("onclick"):
+                    match = re.search(r"(https?://[^\s'\"]+)", alt)
+                    if match:
+                        href = match.group(1)
+                        break
+                else:
+                    href = alt.strip()
+                    if not href.lower().startswith("javascript:"):
+                        break
+
+    if not href or href.lower().startswith("javascript:"):
+        return None
+    return href
+
+
+class LinkExtractor:
+    """Extracts {"url", "text"} dicts for the <a href> elements of a page, in document order."""
+
+    name = None
+
+    def extract(self, html: str, base_url: str) -> list:
+        raise NotImplementedError
+
+    def _build_link(self, href: str, attrs: dict, text: str, base_url: str):
+        resolved = resolve_href(href, attrs)
+        if resolved is None:
+            logger.debug(f"Ignored link (invalid href): {href} | Text: {text}")
+            return None
+        return {"url": urljoin(base_url, resolved), "text": text}
+
+
+class SoupLinkExtractor(LinkExtractor):
+    """Reference implementation: builds a full BeautifulSoup tree with html.parser."""
+
+    name = "soup"
+
+    def extract(self, html: str, base_url: str) -> list:
+        try:
+            soup = BeautifulSoup(html, "html.parser")
+        except Exception as e:
+            logger.error(f"Error parsing HTML with html.parser: {e}. Trying lxml...", exc_info=True)
+            try:
+                soup = BeautifulSoup(html, "lxml")
+            except Exception as e2:
+                logger.error(f"Error parsing HTML with lxml: {e2}", exc_info=True)
+                return []  # If both fail, return empty list
+
+        links = []
+        for a in soup.find_all("a", href=True):
+            link = self._build_link(a.get("href"), a.attrs, a.get_text(strip=True), base_url)
+            if link:
+                links.append(link)
+        return links
+
+
+class _AnchorTokenizer(HTMLParser):
+    """
+    Streams through the document keeping only a stack of open tag names and the text
+    of the anchors that are currently open. Nesting follows Beautiful Soup's html.parser
+    tree builder: an end tag closes the most recent open element with that name.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.anchors = []
+        self._stack = []  # (tag name, anchor record or None)
+        self._open_anchors = 0
+        self._non_text_depth = 0
+        self._data = []
+
+    def _end_data(self, cdata: bool = False):
+        if not self._data:
+            return
+        text = "".join(self._data).strip()
+        self._data = []
+        if text and self._open_anchors and (cdata or not self._non_text_depth):
+            for _, anchor in self._stack:
+                if anchor is not None:
+                    anchor[2].append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        anchor = None
+        if tag == "a":
+            attr_dict = {}
+            for key, value in attrs:
+                attr_dict[key] = "" if value is None else value
+            if "href" in attr_dict:
+                anchor = (attr_dict["href"], attr_dict, [])
+                self.anchors.append(anchor)
+        if tag in VOID_ELEMENTS:
+            return
+        self._stack.append((tag, anchor))
+        if anchor is not None:
+            self._open_anchors += 1
+        if tag in NON_TEXT_ELEMENTS:
+            self._non_text_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._end_data()
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for name, anchor in self._stack[i:]:
+                    if anchor is not None:
+                        self._open_anchors -= 1
+                    if name in NON_TEXT_ELEMENTS:
+                        self._non_text_depth -= 1
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, decl):
+        self._end_data()
+
+    def handle_pi(self, data):
+        self._end_data()
+
+    def unknown_decl(self, data):
+        self._end_data()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections count as text, like Beautiful Soup's CData strings
+            self._data.append(data[len("CDATA["):])
+            self._end_data(cdata=True)
+
+    def close(self):
+        super().close()
+        self._end_data()
+
+
+class StreamingLinkExtractor(LinkExtractor):
+    """
+    Fast backend: tokenizes the page with the standard library HTML tokenizer and
+    never builds a tree. Produces the same links as SoupLinkExtractor; the only known
+    differences are in the decoding of malformed character references in anchor text.
+    """
+
+    name = "streaming"
+
+    def extract(self, html: str, base_url: str) -> list:
+        tokenizer = _AnchorTokenizer()
+        try:
+            tokenizer.feed(html)
+            tokenizer.close()
+        except Exception as e:
+            logger.error(f"Error tokenizing HTML: {e}. Falling back to BeautifulSoup...", exc_info=True)
+            return SoupLinkExtractor().extract(html, base_url)
+
+        links = []
+        for href, attrs, texts in tokenizer.anchors:
+            link = self._build_link(href, attrs, "".join(texts), base_url)
+            if link:
+                links.append(link)
+        return links
+
+
+EXTRACTORS = {
+    SoupLinkExtractor.name: SoupLinkExtractor,
+    StreamingLinkExtractor.name: StreamingLinkExtractor,
+}
+
+DEFAULT_EXTRACTOR = StreamingLinkExtractor.name
+
+
+def get_extractor(name: str = DEFAULT_EXTRACTOR) -> LinkExtractor:
+    try:
+        return EXTRACTORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown link extractor: {name}")
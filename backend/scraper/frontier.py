@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import queue
+import resource
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+VISITED_MODES = ("fingerprint", "bloom", "exact")
+
+# "bfs": first in, first out. "best_first": highest predicted relevance first, with aging
+FRONTIER_MODES = ("bfs", "best_first")
+
+# Approximate size of a queued (path, depth) tuple besides the path string itself
+_QUEUE_ITEM_OVERHEAD = sys.getsizeof((None, 0)) + sys.getsizeof(0)
+
+
+def url_fingerprint(url: str) -> int:
+    """64-bit fingerprint of a URL."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ExactURLSet:
+    """Keeps the full URL strings. Exact, but the most memory hungry."""
+
+    mode = "exact"
+
+    def __init__(self):
+        self._urls = set()
+
+    def add(self, url: str) -> bool:
+        """Add the URL; returns False if it was already present."""
+        if url in self._urls:
+            return False
+        self._urls.add(url)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+    def memory_usage(self) -> int:
+        return sys.getsizeof(self._urls) + sum(sys.getsizeof(url) for url in self._urls)
+
+
+class FingerprintSet:
+    """
+    Stores 64-bit URL fingerprints in a sorted array (8 bytes per URL) plus a small
+    set of recent additions that is merged into the array as it grows. A false
+    "already visited" needs a 64-bit collision, which is negligible for crawl sizes.
+    """
+
+    mode = "fingerprint"
+
+    def __init__(self, min_merge_size: int = 4096):
+        self._sorted = array("Q")
+        self._recent = set()
+        self.min_merge_size = min_merge_size
+        self._count = 0
+
+    def _find(self, fingerprint: int) -> bool:
+        if fingerprint in self._recent:
+            return True
+        i = bisect_left(self._sorted, fingerprint)
+        return i < len(self._sorted) and self._sorted[i] == fingerprint
+
+    def add(self, url: str) -> bool:
+        """Add the URL; returns False if it was already present."""
+        fingerprint = url_fingerprint(url)
+        if self._find(fingerprint):
+            return False
+        self._recent.add(fingerprint)
+        self._count += 1
+        # Merge once the buffer is a fraction of the array so merging stays amortized O(1)
+        if len(self._recent) >= max(self.min_merge_size, len(self._sorted) // 8):
+            self._merge()
+        return True
+
+    def _merge(self):
+        self._sorted = array("Q", heapq.merge(self._sorted, sorted(self._recent)))
+        self._recent = set()
+
+    def __contains__(self, url: str) -> bool:
+        return self._find(url_fingerprint(url))
+
+    def __len__(self):
+        return self._count
+
+    def memory_usage(self) -> int:
+        return (sys.getsizeof(self._sorted) + sys.getsizeof(self._recent)
+                + len(self._recent) * sys.getsizeof(2 ** 63))
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for an expected capacity and false-positive rate.
+    A false positive makes an unseen URL look visited, so it is skipped.
+    """
+
+    mode = "bloom"
+
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._count = 0
+
+    def _positions(self, url: str):
+        digest = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, url: str) -> bool:
+        """Add the URL; returns False if it was (probably) already present."""
+        added = False
+        for position in self._positions(url):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self._count += 1
+        return added
+
+    def __contains__(self, url: str) -> bool:
+        for position in self._positions(url):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self):
+        return self._count
+
+    def memory_usage(self) -> int:
+        return sys.getsizeof(self._bits)
+
+
+def make_visited_set(mode: str = "fingerprint", capacity: int = 10_000_000, error_rate: float = 0.001):
+    if mode == "fingerprint":
+        return FingerprintSet()
+    if mode == "bloom":
+        return BloomFilter(capacity=capacity, error_rate=error_rate)
+    if mode == "exact":
+        return ExactURLSet()
+    raise ValueError(f"Unknown visited set mode: {mode}")
+
+
+class LinkPriority:
+    """
+    Priority keys for best-first crawling; smaller keys are fetched first. The key is
+    queued / aging_window - score, with queued the number of URLs queued before this one
+    and scores on the 0-1 relevance scale: a URL gains a full point of priority over the
+    aging_window URLs queued after it, so low scoring URLs are reached eventually.
+    Keys never change once assigned, so a plain heap keeps them in order.
+    """
+
+    def __init__(self, aging_window: int = 1000):
+        self.aging_window = max(1, aging_window)
+        self._counter = itertools.count()
+
+    def key(self, score: float) -> tuple:
+        queued = next(self._counter)
+        return queued / self.aging_window - score, queued
+
+
+class Frontier:
+    """
+    Thread-safe frontier with deduplication: FIFO (mode "bfs") or best-first (mode
+    "best_first": ordered by the LinkPriority key of the score given to add()). Crawls
+    only follow internal links, so queued URLs are stored as paths relative to the
+    crawl origin. With a journal
+    (persistence.FrontierJournal) every discovered and finished URL is also recorded
+    durably, so the crawl can be resumed. With a trap detector (traps.TrapDetector) new
+    URLs it rejects are only recorded, never queued.
+    """
+
+    def __init__(self, origin: str, visited=None, journal=None, trap_detector=None, mode: str = "bfs",
+                 aging_window: int = 1000):
+        if mode not in FRONTIER_MODES:
+            raise ValueError(f"Unknown frontier mode: {mode}")
+        self.origin = origin.rstrip("/")
+        self.visited = visited if visited is not None else make_visited_set()
+        self.journal = journal
+        self.trap_detector = trap_detector
+        self.mode = mode
+        self.priority = LinkPriority(aging_window) if mode == "best_first" else None
+        self._queue = self._new_queue()
+        self._lock = threading.Lock()
+        self._queued_bytes = 0
+
+    def _new_queue(self):
+        return queue.Queue() if self.priority is None else queue.PriorityQueue()
+
+    def _encode(self, url: str) -> str:
+        if url == self.origin or url.startswith(self.origin + "/"):
+            return url[len(self.origin):]
+        return url
+
+    def _decode(self, path: str) -> str:
+        return self.origin + path if not path or path.startswith("/") else path
+
+    def _put(self, path: str, depth: int, score: float):
+        if self.priority is None:
+            self._queue.put_nowait((path, depth))
+        else:
+            self._queue.put_nowait((self.priority.key(score), path, depth))
+
+    def add(self, url: str, depth: int, enqueue: bool = True, score: float = 0.0) -> bool:
+        """
+        Mark the URL as seen and queue it, unless it was already seen. Returns True if
+        the URL is new. With enqueue=False the URL is only recorded (e.g. beyond max depth).
+        score (0-1) is the predicted relevance used in best-first mode.
+        """
+        with self._lock:
+            if not self.visited.add(url):
+                return False
+            if enqueue and self.trap_detector is not None and not self.trap_detector.allow(url):
+                enqueue = False
+            if self.journal is not None:
+                self.journal.add(url, depth, pending=enqueue)
+            if not enqueue:
+                return True
+            path = self._encode(url)
+            self._queued_bytes += sys.getsizeof(path) + _QUEUE_ITEM_OVERHEAD
+        self._put(path, depth, score)
+        return True
+
+    def requeue(self, url: str, depth: int, score: float = 0.0):
+        """Queue an already seen URL again (e.g. to retry it after a back-off)."""
+        if self.journal is not None:
+            self.journal.retry(url)
+        path = self._encode(url)
+        with self._lock:
+            self._queued_bytes += sys.getsizeof(path) + _QUEUE_ITEM_OVERHEAD
+        self._put(path, depth, score)
+
+    def restore(self, url: str, depth: int, score: float = 0.0):
+        """Queue a URL left pending by a previous run (already marked seen and tracked by the journal)."""
+        path = self._encode(url)
+        with self._lock:
+            self._queued_bytes += sys.getsizeof(path) + _QUEUE_ITEM_OVERHEAD
+        self._put(path, depth, score)
+
+    def get(self, timeout: float = None):
+        """Return the next (url, depth); raises queue.Empty after timeout."""
+        return self._taken(self._queue.get(timeout=timeout))
+
+    def _taken(self, item) -> tuple:
+        path, depth = item[-2:]
+        with self._lock:
+            self._queued_bytes -= sys.getsizeof(path) + _QUEUE_ITEM_OVERHEAD
+        return self._decode(path), depth
+
+    def task_done(self, url: str = None, completed: bool = True):
+        """
+        Mark a URL returned by get() as processed. completed=False (e.g. skipped because
+        the crawl is stopping) leaves it pending in the journal, so a resume fetches it.
+        """
+        if self.journal is not None and url is not None and completed:
+            self.journal.done(url)
+        self._queue.task_done()
+
+    def join(self, timeout: float = None) -> bool:
+        """Wait until every queued URL was marked done. Returns False on timeout."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.visited
+
+    def visited_count(self) -> int:
+        return len(self.visited)
+
+    def memory_usage(self) -> dict:
+        with self._lock:
+            return {
+                "visited_mode": self.visited.mode,
+                "visited_count": len(self.visited),
+                "visited_bytes": self.visited.memory_usage(),
+                "queue_mode": self.mode,
+                "queue_size": self._queue.qsize(),
+                "queue_bytes": self._queued_bytes,
+            }
+
+
+class AsyncFrontier(Frontier):
+    """
+    Frontier for the asyncio engine: the same deduplication, ordering, trap checks and
+    journal, with get() and join() awaited on the event loop. Not thread-safe: use it
+    from the event loop thread only.
+    """
+
+    def _new_queue(self):
+        return asyncio.Queue() if self.priority is None else asyncio.PriorityQueue()
+
+    async def get(self):
+        """Return the next (url, depth), waiting until one is queued."""
+        return self._taken(await self._queue.get())
+
+    async def join(self):
+        """Wait until every queued URL was marked done."""
+        await self._queue.join()
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process (ru_maxrss is in KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+
+import orjson
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FetchedPage(str):
+    """HTML of a downloaded page, carrying the validators to cache its links under."""
+
+    def __new__(cls, html: str, etag: str = None, last_modified: str = None):
+        page = super().__new__(cls, html)
+        page.etag = etag
+        page.last_modified = last_modified
+        page.content_hash = content_hash(html)
+        return page
+
+
+class CachedPage:
+    """
+    A page whose cached copy is still valid (304 Not Modified, or a body with the same
+    content hash). Stands in for the HTML: parse_links returns the cached links as is.
+    """
+
+    def __init__(self, url: str, links: list):
+        self.url = url
+        self.links = links
+
+    def __bool__(self):
+        return True
+
+
+def content_hash(html: str) -> str:
+    return hashlib.blake2b(html.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class HttpCache:
+    """
+    Disk cache of page validators (ETag / Last-Modified), content hashes and extracted
+    links, shared by every crawl. One compressed file per URL under directory. The total
+    size is kept under max_bytes by evicting the least recently used entries; use is
+    tracked in memory and in the file modification time, so the order survives restarts.
+    Several processes may share the directory: a file evicted by another process is a miss.
+    """
+
+    def __init__(self, directory, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max(0, max_bytes)
+        self._entries = {}  # path -> [size, last use]
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".cache"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                self._entries[path] = [stat.st_size, stat.st_mtime]
+                self._size += stat.st_size
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.cache")
+
+    def get(self, url: str):
+        """The cached entry of the URL ({"etag", "last_modified", "content_hash", "links"}) or None."""
+        path = self._path(url)
+        try:
+            with open(path, "rb") as f:
+                entry = orjson.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        except (OSError, zlib.error, orjson.JSONDecodeError) as e:
+            logger.error(f"Error reading HTTP cache entry for {url}: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+            return None
+        if entry.get("url") != url:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        self._touch(path)
+        with self._lock:
+            self.stats["hits"] += 1
+        return entry
+
+    def put(self, url: str, etag: str = None, last_modified: str = None, content_hash: str = None, links: list = ()):
+        """Store the validators and links of a page, then evict down to max_bytes."""
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "links": list(links),
+            "stored_at": time.time(),
+        }
+        data = zlib.compress(orjson.dumps(entry), 1)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(url)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Readers (in any process) see the old or the new entry, never half of one
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error writing HTTP cache entry for {url}: {e}")
+            with self._lock:
+                self.stats["errors"] += 1
+            return
+        with self._lock:
+            previous = self._entries.get(path)
+            if previous:
+                self._size -= previous[0]
+            self._entries[path] = [len(data), time.time()]
+            self._size += len(data)
+            self.stats["stores"] += 1
+        self._evict()
+
+    def touch(self, url: str):
+        """Mark the URL's entry as recently used (e.g. after a 304)."""
+        self._touch(self._path(url))
+
+    def _touch(self, path: str):
+        now = time.time()
+        with self._lock:
+            if path in self._entries:
+                self._entries[path][1] = now
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            # Down to 90% so eviction does not run on every store once the cache is full
+            target = self.max_bytes * 0.9
+            victims = []
+            for path, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+                if self._size <= target:
+                    break
+                del self._entries[path]
+                self._size -= size
+                victims.append(path)
+            self.stats["evictions"] += len(victims)
+        for path in victims:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """The process-wide HTTP cache, created from settings on first use (None if HTTP_CACHE_DIR is empty)."""
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            directory = getattr(settings, 'HTTP_CACHE_DIR', None)
+            if not directory:
+                return None
+            _http_cache = HttpCache(directory, getattr(settings, 'HTTP_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+        return _http_cache
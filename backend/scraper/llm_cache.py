@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .llm_processor import MODEL_NAME, PROMPT_VERSION
+from .models import ScoreCacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = timedelta(days=7)
+DEFAULT_MEMORY_SIZE = 10000
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different anchors share a cache entry."""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def make_key(text: str, keyword: str) -> str:
+    raw = f"{MODEL_NAME}|{PROMPT_VERSION}|{normalize_text(keyword)}|{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded in-memory LRU mapping."""
+
+    def __init__(self, maxsize: int = DEFAULT_MEMORY_SIZE):
+        self.maxsize = max(1, maxsize)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Shared by every crawl in this process
+memory_cache = LRUCache()
+
+
+class ScoreCache:
+    """
+    Two-tier cache of (relevance score, link type) pairs keyed by normalized anchor text,
+    keyword and model/prompt version: a process-wide LRU in front of the ScoreCacheEntry table.
+    One instance is used per crawl so hit/miss stats are reported per crawl.
+    """
+
+    def __init__(self, memory: LRUCache = None, ttl: timedelta = DEFAULT_TTL, use_db: bool = True):
+        self.memory = memory if memory is not None else memory_cache
+        self.ttl = ttl
+        self.use_db = use_db
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def _count(self, name: str, amount: int):
+        if amount:
+            with self._lock:
+                self.stats[name] += amount
+
+    def get_many(self, texts: list, keyword: str) -> dict:
+        """Return {normalized text: (score, link_type)} for every text found in the cache."""
+        results = {}
+        missing = {}
+        for text in texts:
+            norm = normalize_text(text)
+            if norm in results or norm in missing:
+                continue
+            key = make_key(norm, keyword)
+            value = self.memory.get(key)
+            if value is not None:
+                results[norm] = value
+            else:
+                missing[norm] = key
+        self._count("memory_hits", len(results))
+
+        if missing and self.use_db:
+            try:
+                rows = ScoreCacheEntry.objects.filter(
+                    key__in=list(missing.values()),
+                    expires_at__gt=timezone.now()
+                ).values_list("key", "relevance_score", "type")
+                by_key = {key: (score, link_type) for key, score, link_type in rows}
+            except Exception as e:
+                logger.error(f"Error reading score cache: {e}")
+                by_key = {}
+
+            for norm, key in list(missing.items()):
+                value = by_key.get(key)
+                if value is not None:
+                    self.memory.set(key, value)
+                    results[norm] = value
+                    del missing[norm]
+            self._count("db_hits", len(by_key))
+
+        self._count("misses", len(missing))
+        return results
+
+    def set_many(self, values: dict, keyword: str):
+        """Store {text: (score, link_type)} in both tiers."""
+        entries = []
+        expires_at = timezone.now() + self.ttl
+        for text, (score, link_type) in values.items():
+            key = make_key(text, keyword)
+            self.memory.set(key, (score, link_type))
+            entries.append(ScoreCacheEntry(key=key, relevance_score=score, type=link_type, expires_at=expires_at))
+
+        if entries and self.use_db:
+            try:
+                ScoreCacheEntry.objects.bulk_create(
+                    entries,
+                    update_conflicts=True,
+                    unique_fields=["key"],
+                    update_fields=["relevance_score", "type", "expires_at"]
+                )
+            except Exception as e:
+                logger.error(f"Error writing score cache: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def purge_expired_scores() -> int:
+    """Delete expired rows from the persistent tier. Returns the number of rows removed."""
+    deleted, _ = ScoreCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
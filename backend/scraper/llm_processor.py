@@ -1,15 +1,43 @@
 import re
+import json
 import logging
+import threading
+from urllib.parse import urlparse
 from langchain_ollama import OllamaLLM
 
-ollama_llm = OllamaLLM(model="llama3")
+MODEL_NAME = "llama3"
+# Bump whenever a scoring/classification prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
+ollama_llm = OllamaLLM(model=MODEL_NAME)
 logger = logging.getLogger(__name__)
 
+LINK_TYPES = ['document', 'contact', 'service', 'news', 'unknown']
+
+# Number of model calls made by this process, for measuring calls per link
+_llm_calls = 0
+_llm_calls_lock = threading.Lock()
+
+def _invoke(prompt: str) -> str:
+    global _llm_calls
+    with _llm_calls_lock:
+        _llm_calls += 1
+    return ollama_llm.invoke(prompt)
+
+def get_llm_call_count() -> int:
+    """Return the number of LLM calls made so far by this process."""
+    return _llm_calls
+
 def get_relevance_score(text: str, keyword: str) -> float:
     """
     Analyze the given text and assign a rigorous relevance score for the keyword,
     considering that we are specifically looking for contact information and file/document references.
     """
+    score = _llm_relevance_score(text, keyword)
+    return score if score is not None else 0.0
+
+def _llm_relevance_score(text: str, keyword: str):
+    """get_relevance_score, but None when the LLM could not be asked or gave no score."""
     prompt = (
         f"Your goal is to analyze the following text and rigorously evaluate its relevance to the keyword '{keyword}'.\n\n"
         "Instructions:\n"
@@ -21,7 +49,7 @@ def get_relevance_score(text: str, keyword: str) -> float:
         f"Text: {text}\n\nScore:"
     )
     try:
-        response = ollama_llm.invoke(prompt).strip()
+        response = _invoke(prompt).strip()
         logger.info(f"LLM response: {response}")
         
         # Extract the first number found in the response
@@ -31,13 +59,19 @@ def get_relevance_score(text: str, keyword: str) -> float:
             # Convert the score to a range of 0 to 1 (by dividing by 100)
             score = max(0.0, min(score_raw / 100.0, 1.0))
         else:
-            score = 0.0
+            logger.error(f"No score in LLM response: {response}")
+            score = None
     except Exception as e:
         logger.error(f"Error obtaining LLM score: {e}")
-        score = 0.0
+        score = None
     return score
 
 def classify_link_type(text: str) -> str:
+    category = _llm_link_type(text)
+    return category if category is not None else 'unknown'
+
+def _llm_link_type(text: str):
+    """classify_link_type, but None when the LLM could not be asked."""
     prompt = f"""Analyze this link text and classify it into one of these categories:
     - document: for files, reports, budgets, policies, forms
     - contact: for contact information, staff directories, departments
@@ -50,13 +84,200 @@ def classify_link_type(text: str) -> str:
     Return only the category name, nothing else."""
 
     try:
-        response = ollama_llm.invoke(prompt).strip()
+        response = _invoke(prompt).strip()
         logger.info(f"Link classification response: {response}")
         
         category = response.strip().lower()
-        if category in ['document', 'contact', 'service', 'news', 'unknown']:
+        if category in LINK_TYPES:
             return category
         return 'unknown'
     except Exception as e:
         logger.error(f"Error classifying link type: {e}")
-        return 'unknown'
\ No newline at end of file
+        return None
+
+def _parse_batch_response(response: str, size: int) -> dict:
+    """
+    Parses the JSON array returned by the batch prompt into {index: (score, category)}.
+    Items that are missing or invalid are left out (score or category may be None).
+    """
+    match = re.search(r"\[.*\]", response, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return {}
+
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("id")
+        if isinstance(index, str) and index.isdigit():
+            index = int(index)
+        if not isinstance(index, int) or not 1 <= index <= size or index - 1 in results:
+            continue
+
+        score = item.get("score")
+        try:
+            score = max(0.0, min(float(score) / 100.0, 1.0))
+        except (TypeError, ValueError):
+            score = None
+
+        category = item.get("category")
+        category = category.strip().lower() if isinstance(category, str) else None
+        if category not in LINK_TYPES:
+            category = None
+
+        results[index - 1] = (score, category)
+    return results
+
+def score_and_classify_batch(texts: list, keyword: str) -> list:
+    """
+    Scores and classifies many link texts with a single LLM call.
+    Returns a list of (score, category) pairs in the same order as texts. Items the
+    model did not return (or returned invalid values for) fall back to
+    get_relevance_score / classify_link_type individually; items still unscored after
+    that (the LLM failed) are None, so they are not cached as real results.
+    """
+    if not texts:
+        return []
+
+    numbered = "\n".join(f"{i}. {json.dumps(text)}" for i, text in enumerate(texts, start=1))
+    prompt = (
+        f"Your goal is to analyze each of the following link texts and rigorously evaluate its relevance to the keyword '{keyword}'.\n\n"
+        "Instructions:\n"
+        "1. If the text contains clear contact information (such as name, email, phone) or direct references to files/documents related to the keyword, "
+        "assign a high score.\n"
+        "2. If the text is ambiguous, irrelevant, or does not provide any contact or file-related information, assign a low score.\n"
+        "3. Use a scale from 0 to 100, where 100 means the text is extremely relevant and 0 means there is no relevance.\n"
+        "4. Classify each text into one of these categories:\n"
+        "   - document: for files, reports, budgets, policies, forms\n"
+        "   - contact: for contact information, staff directories, departments\n"
+        "   - service: for public services, applications, permits\n"
+        "   - news: for news, announcements, updates\n"
+        "   - unknown: if none of the above apply\n"
+        "5. Return ONLY a JSON array with one object per text, like "
+        '[{"id": 1, "score": 80, "category": "document"}], with no additional commentary.\n\n'
+        f"Texts:\n{numbered}\n\nJSON:"
+    )
+    try:
+        response = _invoke(prompt).strip()
+        logger.info(f"LLM batch response: {response}")
+        parsed = _parse_batch_response(response, len(texts))
+    except Exception as e:
+        logger.error(f"Error obtaining LLM batch scores: {e}")
+        parsed = {}
+
+    results = []
+    for i, text in enumerate(texts):
+        score, category = parsed.get(i, (None, None))
+        if score is None:
+            score = _llm_relevance_score(text, keyword)
+        if category is None and score is not None:
+            category = _llm_link_type(text)
+        results.append((score, category) if score is not None and category is not None else None)
+
+    fallbacks = len(texts) - sum(1 for score, category in parsed.values() if score is not None and category is not None)
+    if fallbacks:
+        logger.warning(f"LLM batch: {fallbacks}/{len(texts)} items fell back to individual calls")
+    failed = results.count(None)
+    if failed:
+        logger.error(f"LLM batch: {failed}/{len(texts)} items could not be scored")
+    return results
+
+# Pre-filter: a cheap, deterministic score computed before any LLM call. Links scoring
+# below the low threshold or above the high threshold of the band keep the pre-filter
+# result; only links inside the band are sent to the model. The low bound sits below
+# the base score of any real anchor, so only stop-list, pagination, empty and social
+# links (score 0.0) skip the LLM on the low side; keyword matches with a type or URL
+# hint score above the high bound. On a typical government home page this settles
+# about 40% of the links; a low bound of 0.2 settles about 80%, but also every anchor
+# without the keyword or a type hint (synonyms, other languages).
+DEFAULT_PREFILTER_BAND = (0.1, 0.8)
+
+BOILERPLATE_ANCHORS = frozenset([
+    "home", "inicio", "início", "menu", "search", "buscar", "skip to content", "skip to main content",
+    "back", "voltar", "back to top", "top", "topo", "next", "previous", "prev", "next page", "previous page",
+    "first", "last", "more", "read more", "leia mais", "saiba mais", "see more", "ver mais", "click here",
+    "login", "log in", "sign in", "entrar", "logout", "sign up", "register", "share", "print", "imprimir",
+    "facebook", "twitter", "instagram", "linkedin", "youtube", "whatsapp", "tiktok", "flickr", "rss",
+    "english", "español", "português", "accessibility", "acessibilidade", "sitemap", "mapa do site",
+    "privacy policy", "cookie policy", "terms of use", "«", "»", "‹", "›", "<", ">", "<<", ">>", "...",
+])
+
+SOCIAL_HOSTS = (
+    "facebook.com", "twitter.com", "x.com", "instagram.com", "linkedin.com", "youtube.com",
+    "whatsapp.com", "wa.me", "tiktok.com", "flickr.com", "t.me",
+)
+
+DOCUMENT_EXTENSIONS = (
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".csv", ".odt", ".ods", ".odp", ".ppt", ".pptx", ".rtf", ".zip",
+)
+
+# Words that hint at one of the categories the LLM prompts look for
+TYPE_HINTS = {
+    "contact": ("contact", "contato", "contacto", "email", "e-mail", "phone", "telefone", "telefono", "staff",
+                "directory", "ouvidoria", "fale conosco", "department", "departamento", "secretaria"),
+    "document": ("document", "documento", "report", "relatório", "relatorio", "budget", "orçamento", "orcamento",
+                 "policy", "form", "formulário", "formulario", "download", "pdf", "file", "arquivo", "edital"),
+    "service": ("service", "serviço", "servico", "permit", "licença", "licenca", "application", "request",
+                "solicitação", "solicitacao", "agendamento"),
+    "news": ("news", "notícia", "noticia", "announcement", "update", "press", "imprensa"),
+}
+
+_PAGINATION_RE = re.compile(r"^(page\s*|página\s*|pagina\s*)?\d{1,4}$")
+
+def _tokens(text: str) -> list:
+    return re.findall(r"\w+", (text or "").lower())
+
+def _keyword_overlap(tokens: list, keyword: str) -> float:
+    """Fraction of keyword tokens found in the text (prefix match, so plurals count)."""
+    keyword_tokens = _tokens(keyword)
+    if not keyword_tokens:
+        return 0.0
+    matched = sum(
+        1 for kw in keyword_tokens
+        if any(token.startswith(kw) or (kw.startswith(token) and len(token) >= 4) for token in tokens)
+    )
+    return matched / len(keyword_tokens)
+
+def _url_hint(url: str):
+    lowered = (url or "").lower()
+    if lowered.startswith("mailto:") or lowered.startswith("tel:"):
+        return "contact"
+    parsed = urlparse(lowered)
+    if parsed.path.endswith(DOCUMENT_EXTENSIONS):
+        return "document"
+    host = parsed.netloc
+    if any(host == social or host.endswith("." + social) for social in SOCIAL_HOSTS):
+        return "social"
+    return None
+
+def prefilter_link(text: str, url: str, keyword: str, stop_list=BOILERPLATE_ANCHORS) -> tuple:
+    """
+    Cheap deterministic relevance estimate used before the LLM.
+    Returns (score, link_type) with the score on the same 0-1 scale as get_relevance_score.
+    """
+    normalized = re.sub(r"\s+", " ", text or "").strip().lower()
+    tokens = _tokens(normalized)
+    url_hint = _url_hint(url)
+
+    if url_hint == "social":
+        return 0.0, "unknown"
+    if not url_hint and (not tokens or normalized in stop_list or _PAGINATION_RE.match(normalized)):
+        return 0.0, "unknown"
+
+    type_hint = None
+    for link_type, words in TYPE_HINTS.items():
+        if any((word in normalized) if " " in word else any(token.startswith(word) for token in tokens) for word in words):
+            type_hint = link_type
+            break
+
+    score = 0.15 + 0.5 * _keyword_overlap(tokens, keyword)
+    if type_hint:
+        score += 0.2
+    if url_hint:
+        score += 0.25
+    return round(min(score, 1.0), 4), url_hint or type_hint or "unknown"
+
@@ -0,0 +1,130 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from scraper.benchmark import SyntheticSite, FakeLLM, run_benchmark
+from scraper.services import CRAWL_ENGINES
+
+
+class Command(BaseCommand):
+    help = ("Benchmark WebScraper.crawl against a generated local site with a fake LLM "
+            "and print the results as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,8,32',
+                            help='Comma-separated max_workers values, one run each')
+        parser.add_argument('--engine', choices=CRAWL_ENGINES, default='threads')
+        parser.add_argument('--pages', type=int, default=1000)
+        parser.add_argument('--fanout', type=int, default=10, help='Links per page')
+        parser.add_argument('--page-size', type=int, default=20_000, help='Approximate page size in bytes')
+        parser.add_argument('--slow-ratio', type=float, default=0.0, help='Fraction of slow pages')
+        parser.add_argument('--slow-delay', type=float, default=0.5, help='Delay of slow pages in seconds')
+        parser.add_argument('--error-ratio', type=float, default=0.0, help='Fraction of pages answering 500')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--llm-latency', type=float, default=0.05, help='Fake LLM latency per call')
+        parser.add_argument('--llm-text-latency', type=float, default=0.005,
+                            help='Additional fake LLM latency per link text')
+        parser.add_argument('--keyword', default='budget')
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark crawlers and links')
+        parser.add_argument('--in-process', action='store_true',
+                            help='Run every crawl in this process (peak RSS is then cumulative)')
+        parser.add_argument('--site-url', help='Crawl this already running synthetic site (used by child runs)')
+
+    def handle(self, *args, **options):
+        try:
+            workers_values = [int(value) for value in options['workers'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError("--workers must be a comma-separated list of integers")
+        if not workers_values or min(workers_values) < 1:
+            raise CommandError("--workers values must be positive")
+
+        if options['site_url']:
+            # Child run: one crawl, result as a single JSON line
+            result = self._crawl(options['site_url'], workers_values[0], options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        site = SyntheticSite(
+            pages=options['pages'],
+            fanout=options['fanout'],
+            page_size=options['page_size'],
+            slow_ratio=options['slow_ratio'],
+            slow_delay=options['slow_delay'],
+            error_ratio=options['error_ratio'],
+            seed=options['seed']
+        ).start()
+        results = []
+        try:
+            for workers in workers_values:
+                requests_before = site.requests
+                if options['in_process']:
+                    result = self._crawl(site.url, workers, options)
+                else:
+                    # A fresh process per run, so peak RSS belongs to that run alone
+                    result = self._crawl_in_subprocess(site.url, workers, options)
+                result["http_requests"] = site.requests - requests_before
+                results.append(result)
+                self.stderr.write(f"workers={workers}: {result['pages_per_sec']} pages/s, "
+                                  f"{result['links_per_sec']} links/s, {result['llm_calls']} LLM calls")
+        finally:
+            site.stop()
+
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "config": {
+                key: options[key] for key in (
+                    'engine', 'pages', 'fanout', 'page_size', 'slow_ratio', 'slow_delay',
+                    'error_ratio', 'seed', 'llm_latency', 'llm_text_latency', 'keyword'
+                )
+            },
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def _crawl(self, site_url: str, workers: int, options: dict) -> dict:
+        user, _ = User.objects.get_or_create(username='benchmark')
+        return run_benchmark(
+            site_url,
+            user,
+            workers,
+            engine=options['engine'],
+            keyword=options['keyword'],
+            llm=FakeLLM(options['llm_latency'], options['llm_text_latency']),
+            keep=options['keep']
+        )
+
+    def _crawl_in_subprocess(self, site_url: str, workers: int, options: dict) -> dict:
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_crawl',
+            '--site-url', site_url,
+            '--workers', str(workers),
+            '--engine', options['engine'],
+            '--llm-latency', str(options['llm_latency']),
+            '--llm-text-latency', str(options['llm_text_latency']),
+            '--keyword', options['keyword'],
+        ]
+        if options['keep']:
+            command.append('--keep')
+        if options.get('settings'):
+            command += ['--settings', options['settings']]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            raise CommandError(f"Benchmark run with {workers} workers failed:\n{completed.stderr[-2000:]}")
+        return json.loads(lines[-1])
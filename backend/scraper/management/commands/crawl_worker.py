@@ -0,0 +1,47 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+
+from scraper.distributed import CrawlWorker
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run a crawl worker that processes distributed crawls from the shared frontier table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-id', help='Lease owner name (default: hostname-pid)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Fetch threads')
+        parser.add_argument('--batch-size', type=int, help='URLs leased at a time (default: 2 x concurrency)')
+        parser.add_argument('--lease-seconds', type=float, default=120.0,
+                            help='How long a leased URL stays reserved without a heartbeat')
+        parser.add_argument('--heartbeat-interval', type=float, default=30.0)
+        parser.add_argument('--host-rate', type=float, default=10.0, help='Initial requests/second per host')
+        parser.add_argument('--crawler', action='append', dest='crawler_ids',
+                            help='Only process this crawler id (repeatable)')
+        parser.add_argument('--exit-when-idle', action='store_true',
+                            help='Exit when no URL can be leased instead of waiting for new crawls')
+
+    def handle(self, *args, **options):
+        worker = CrawlWorker(
+            worker_id=options['worker_id'],
+            concurrency=options['concurrency'],
+            batch_size=options['batch_size'],
+            lease_seconds=options['lease_seconds'],
+            heartbeat_interval=options['heartbeat_interval'],
+            crawler_ids=options['crawler_ids'],
+            host_rate=options['host_rate']
+        )
+
+        # Finish the current batch and release unprocessed leases on Ctrl+C / SIGTERM
+        def shutdown(signum, frame):
+            logger.info(f"Signal {signum} received, stopping crawl worker {worker.worker_id}")
+            worker.stop()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        stats = worker.run(exit_when_idle=options['exit_when_idle'])
+        self.stdout.write(self.style.SUCCESS(f"Crawl worker {worker.worker_id} finished: {stats}"))
@@ -0,0 +1,234 @@
+import math
+import threading
+import time
+
+# Histogram bucket upper bounds, in seconds
+FETCH_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+DB_FLUSH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style: cumulative counts per upper bound)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def _quantile(self, counts, count, q: float):
+        """Upper bound of the bucket holding the q-quantile (None when empty or above the last bucket)."""
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == math.inf else str(bound)] = running
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "mean": round(total / count, 6) if count else None,
+            "p50": self._quantile(counts, count, 0.5),
+            "p95": self._quantile(counts, count, 0.95),
+            "p99": self._quantile(counts, count, 0.99),
+            "buckets": cumulative,
+        }
+
+
+class RateMeter:
+    """Events per second over a sliding window, counted in one-second slots."""
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._created = time.monotonic()
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def mark(self, n: int = 1):
+        second = int(time.monotonic())
+        with self._lock:
+            self._slots[second] = self._slots.get(second, 0) + n
+            if len(self._slots) > self.window * 2:
+                self._prune(second)
+
+    def _prune(self, now_second: int):
+        for second in [s for s in self._slots if s <= now_second - self.window]:
+            del self._slots[second]
+
+    def rate(self) -> float:
+        now_second = int(time.monotonic())
+        with self._lock:
+            self._prune(now_second)
+            total = sum(self._slots.values())
+        # Shorter than the window right after the start
+        return total / min(self.window, max(1.0, time.monotonic() - self._created))
+
+
+class CrawlMetrics:
+    """
+    Live instrumentation of one crawl: counters, latency histograms and gauges. Gauges
+    are callables registered by whoever owns the value (frontier size, visited count,
+    stage queues) and are only evaluated when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.counters = {
+            "pages_fetched": 0,
+            "fetch_errors": 0,
+            "cache_not_modified": 0,
+            "cache_unchanged": 0,
+            "bytes_fetched": 0,
+            "links_extracted": 0,
+            "near_duplicates": 0,
+            "llm_batches": 0,
+            "llm_texts": 0,
+            "llm_errors": 0,
+            "llm_failed_texts": 0,
+            "db_flushes": 0,
+            "db_rows": 0,
+        }
+        self.fetch_latency = Histogram(FETCH_LATENCY_BUCKETS)
+        self.llm_latency = Histogram(LLM_LATENCY_BUCKETS)
+        self.db_flush_time = Histogram(DB_FLUSH_BUCKETS)
+        self.page_rate = RateMeter()
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, source):
+        """Register a callable returning the current value of a gauge."""
+        self.gauges[name] = source
+
+    def observe_fetch(self, latency: float, status: int = None, size: int = 0):
+        """One HTTP request; status None means a network error. 304 (revalidated) counts as fetched."""
+        self.fetch_latency.observe(latency)
+        if status in (200, 304):
+            self.page_rate.mark()
+            with self._lock:
+                self.counters["pages_fetched"] += 1
+                self.counters["bytes_fetched"] += size
+        else:
+            self.count("fetch_errors")
+
+    def observe_llm(self, latency: float, texts: int, error: bool = False, failed: int = 0):
+        """error: the batch failed (raised or left some texts unscored); failed: texts left unscored."""
+        self.llm_latency.observe(latency)
+        with self._lock:
+            self.counters["llm_batches"] += 1
+            self.counters["llm_texts"] += texts
+            self.counters["llm_failed_texts"] += failed
+            if error or failed:
+                self.counters["llm_errors"] += 1
+
+    def observe_flush(self, seconds: float, rows: int):
+        self.db_flush_time.observe(seconds)
+        with self._lock:
+            self.counters["db_flushes"] += 1
+            self.counters["db_rows"] += rows
+
+    def snapshot(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        with self._lock:
+            counters = dict(self.counters)
+        gauges = {}
+        for name, source in list(self.gauges.items()):
+            try:
+                gauges[name] = source()
+            except Exception:
+                gauges[name] = None
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_sec": round(counters["pages_fetched"] / elapsed, 3),
+            "pages_per_sec_1m": round(self.page_rate.rate(), 3),
+            "counters": counters,
+            "gauges": gauges,
+            "fetch_latency": self.fetch_latency.snapshot(),
+            "llm_latency": self.llm_latency.snapshot(),
+            "db_flush_time": self.db_flush_time.snapshot(),
+        }
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prometheus_labels(labels: dict) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def to_prometheus(snapshots: dict) -> str:
+    """Render {crawler_id: snapshot} in the Prometheus text exposition format."""
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    counters = sorted({name for snapshot in snapshots.values() for name in snapshot["counters"]})
+    for name in counters:
+        family(f"crawler_{name}_total", "counter", f"Crawl counter {name}.", [
+            f"crawler_{name}_total{_prometheus_labels({'crawler': crawler_id})} {snapshot['counters'].get(name, 0)}"
+            for crawler_id, snapshot in snapshots.items()
+        ])
+
+    family("crawler_pages_per_second", "gauge", "Pages fetched per second over the last minute.", [
+        f"crawler_pages_per_second{_prometheus_labels({'crawler': crawler_id})} {snapshot['pages_per_sec_1m']}"
+        for crawler_id, snapshot in snapshots.items()
+    ])
+
+    gauges = sorted({name for snapshot in snapshots.values() for name, value in snapshot["gauges"].items()
+                     if isinstance(value, (int, float))})
+    for name in gauges:
+        family(f"crawler_{name}", "gauge", f"Crawl gauge {name}.", [
+            f"crawler_{name}{_prometheus_labels({'crawler': crawler_id})} {snapshot['gauges'][name]}"
+            for crawler_id, snapshot in snapshots.items()
+            if isinstance(snapshot["gauges"].get(name), (int, float))
+        ])
+
+    for key, name, help_text in (
+        ("fetch_latency", "crawler_fetch_latency_seconds", "HTTP fetch latency."),
+        ("llm_latency", "crawler_llm_latency_seconds", "LLM batch call latency."),
+        ("db_flush_time", "crawler_db_flush_seconds", "Duration of buffered database writes."),
+    ):
+        samples = []
+        for crawler_id, snapshot in snapshots.items():
+            histogram = snapshot[key]
+            for bound, count in histogram["buckets"].items():
+                samples.append(f"{name}_bucket{_prometheus_labels({'crawler': crawler_id, 'le': bound})} {count}")
+            samples.append(f"{name}_sum{_prometheus_labels({'crawler': crawler_id})} {histogram['sum']}")
+            samples.append(f"{name}_count{_prometheus_labels({'crawler': crawler_id})} {histogram['count']}")
+        family(name, "histogram", help_text, samples)
+
+    return "\n".join(lines) + "\n"
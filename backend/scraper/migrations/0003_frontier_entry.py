@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-17 03:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0002_score_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrontierEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2048)),
+                ('depth', models.IntegerField(default=0)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('crawler', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frontier', to='scraper.crawler')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['crawler', 'state'], name='scraper_fro_crawler_4f3e51_idx')],
+                'unique_together': {('crawler', 'url')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-17 03:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0003_frontier_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawler',
+            name='distributed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='frontierentry',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='frontierentry',
+            name='leased_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='frontierentry',
+            index=models.Index(fields=['state', 'leased_until'], name='scraper_fro_state_fc124f_idx'),
+        ),
+    ]
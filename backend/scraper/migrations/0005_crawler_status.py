@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-17 03:53
+
+from django.db import migrations, models
+
+
+def set_existing_status(apps, schema_editor):
+    # Crawlers created before scheduling existed were either running or ended
+    Crawler = apps.get_model('scraper', 'Crawler')
+    Crawler.objects.filter(is_running=True).update(status='running')
+    Crawler.objects.filter(is_running=False, end_time__isnull=True).update(status='stopped')
+    Crawler.objects.filter(is_running=False, end_time__isnull=False).update(status='finished')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0004_distributed_leases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawler',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('finished', 'Finished'), ('stopped', 'Stopped')], default='queued', max_length=10),
+        ),
+        migrations.RunPython(set_existing_status, migrations.RunPython.noop),
+    ]
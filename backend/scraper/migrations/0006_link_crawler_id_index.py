@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0005_crawler_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['crawler', 'id'], name='scraper_lin_crawler_8dac51_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0006_link_crawler_id_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='link',
+            name='scraper_lin_keyword_dc1d3c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='link',
+            name='scraper_lin_type_4645a8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='link',
+            name='scraper_lin_relevan_b4d94b_idx',
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['relevance_score', 'id'], name='scraper_lin_relevan_f40fca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['keywords', 'relevance_score', 'id'], name='scraper_lin_keyword_fb3a02_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['type', 'relevance_score', 'id'], name='scraper_lin_type_1dbb52_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['crawler', 'relevance_score', 'id'], name='scraper_lin_crawler_d36af8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['crawler', 'type', 'relevance_score', 'id'], name='scraper_lin_crawler_0dbc4c_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-17 04:06
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0007_link_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector(django.db.models.fields.json.KeyTextTransform('text', 'metadata'), config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(models.Func(models.F('url'), models.Value('[^[:alnum:]]+'), models.Value(' '), models.Value('g'), function='REGEXP_REPLACE', output_field=models.TextField()), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='scraper_lin_search__233b03_gin'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 04:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0008_link_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawler',
+            name='recrawl_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recrawls', to='scraper.crawler'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-17 04:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+def search_vector_field():
+    return models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector(django.db.models.fields.json.KeyTextTransform('text', 'metadata'), config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(models.Func(models.F('url'), models.Value('[^[:alnum:]]+'), models.Value(' '), models.Value('g'), function='REGEXP_REPLACE', output_field=models.TextField()), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0009_crawler_recrawl_of'),
+    ]
+
+    # Postgres cannot change the type of a column a generated column depends on, so
+    # search_vector (and its index) is dropped around the change and computed again
+    operations = [
+        migrations.RemoveIndex(
+            model_name='link',
+            name='scraper_lin_search__233b03_gin',
+        ),
+        migrations.RemoveField(
+            model_name='link',
+            name='search_vector',
+        ),
+        migrations.AlterField(
+            model_name='link',
+            name='url',
+            field=models.URLField(max_length=2048),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='search_vector',
+            field=search_vector_field(),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='scraper_lin_search__233b03_gin'),
+        ),
+    ]
@@ -1,16 +1,40 @@
 from django.db import models
+from django.db.models.fields.json import KeyTextTransform
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 import uuid
 
+# Text search configuration of Link.search_vector. 'simple' does not stem, so anchor
+# texts in any language (english, portuguese, spanish sites) are matched alike
+SEARCH_CONFIG = 'simple'
+
 class Crawler(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    STOPPED = 'stopped'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FINISHED, 'Finished'),
+        (STOPPED, 'Stopped'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     url = models.URLField()
     keyword = models.CharField(max_length=100)
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
-    is_running = models.BooleanField(default=True)
+    is_running = models.BooleanField(default=True)  # True while queued or running
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
     max_depth = models.IntegerField(default=3)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='crawlers')
+    stats = models.JSONField(default=dict, blank=True)
+    # Distributed crawls are processed by crawl_worker processes instead of the web process
+    distributed = models.BooleanField(default=False)
+    # Previous crawl of the same site whose unchanged links are reused instead of scored again
+    recrawl_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='recrawls')
     
     def __str__(self):
         return f"Crawler {self.id} - {self.url} - {self.keyword}"
@@ -19,7 +43,8 @@ class Crawler(models.Model):
         ordering = ['-start_time']
 
 class Link(models.Model):
-    url = models.URLField()
+    # Same limit as FrontierEntry.url, so every URL the frontier records can be saved
+    url = models.URLField(max_length=2048)
     type = models.CharField(max_length=50)
     relevance_score = models.FloatField()
     keywords = models.CharField(max_length=100)
@@ -27,14 +52,73 @@ class Link(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     crawler = models.ForeignKey(Crawler, on_delete=models.CASCADE, related_name='links')
+    # Maintained by the database: anchor text (weight A) and the words of the URL (weight B)
+    search_vector = models.GeneratedField(
+        expression=SearchVector(KeyTextTransform('text', 'metadata'), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            models.Func(models.F('url'), models.Value('[^[:alnum:]]+'), models.Value(' '), models.Value('g'),
+                        function='REGEXP_REPLACE', output_field=models.TextField()),
+            weight='B',
+            config=SEARCH_CONFIG
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True
+    )
     
     def __str__(self):
         return f"{self.url} ({self.type})"
     
     class Meta:
         indexes = [
-            models.Index(fields=['keywords']),
-            models.Index(fields=['type']),
-            models.Index(fields=['relevance_score']),
+            # Every listing is ordered by (relevance_score, id) descending; one index per
+            # filter combination lets it read rows in order without sorting
+            models.Index(fields=['relevance_score', 'id']),
+            models.Index(fields=['keywords', 'relevance_score', 'id']),
+            models.Index(fields=['type', 'relevance_score', 'id']),
+            models.Index(fields=['crawler', 'relevance_score', 'id']),
+            models.Index(fields=['crawler', 'type', 'relevance_score', 'id']),
+            models.Index(fields=['crawler', 'id']),
+            GinIndex(fields=['search_vector']),
         ]
         unique_together = ['url', 'crawler']
+
+class ScoreCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    relevance_score = models.FloatField()
+    type = models.CharField(max_length=50)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} ({self.type}, {self.relevance_score})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+class FrontierEntry(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    STATE_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+    ]
+
+    crawler = models.ForeignKey(Crawler, on_delete=models.CASCADE, related_name='frontier')
+    url = models.URLField(max_length=2048)
+    depth = models.IntegerField(default=0)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=PENDING)
+    # Set while a crawl worker holds the URL; an expired lease makes it available again
+    lease_owner = models.CharField(max_length=100, blank=True, default='')
+    leased_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.url} ({self.state}, depth {self.depth})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['crawler', 'state']),
+            models.Index(fields=['state', 'leased_until']),
+        ]
+        unique_together = ['crawler', 'url']
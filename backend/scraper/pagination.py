@@ -0,0 +1,110 @@
+import base64
+import json
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class LinkCursorPagination(BasePagination):
+    """
+    Keyset pagination on (relevance_score, id), highest score first. The cursor holds the
+    last row of the previous page, so every page is an index range scan from that row
+    on (no OFFSET) and stays stable while new links are written. Forward only.
+    Search results (annotated with search_rank) are paged on (search_rank, id) instead.
+    """
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    key_field = 'relevance_score'
+    rank_field = 'search_rank'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if self.rank_field in queryset.query.annotations:
+            self.key_field = self.rank_field
+        queryset = queryset.order_by(f'-{self.key_field}', '-id')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            key, link_id = position
+            # (key, id) < (key, link_id): the range bound is on the leading index column,
+            # the exclusion only drops rows tied on the key
+            queryset = queryset.filter(**{f'{self.key_field}__lte': key}).exclude(
+                **{self.key_field: key, 'id__gte': link_id}
+            )
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            score, link_id = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return float(score), int(link_id)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, link) -> str:
+        position = json.dumps([getattr(link, self.key_field), link.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.encode_cursor(self.page[-1])
+        params[self.page_size_query_param] = self.page_size
+        return self.request.build_absolute_uri(f"{self.request.path}?{params.urlencode()}")
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor taken from the "next" link of the previous page',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Links per page (default {self.page_size}, max {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
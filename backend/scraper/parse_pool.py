@@ -0,0 +1,83 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from .extractors import get_extractor
+
+logger = logging.getLogger(__name__)
+
+# One extractor per worker process, created on first use
+_process_extractors = {}
+
+
+def _extract_in_process(extractor_name: str, html: str, base_url: str) -> list:
+    """Runs in a worker process. Returns compact (url, text) tuples instead of dicts."""
+    extractor = _process_extractors.get(extractor_name)
+    if extractor is None:
+        extractor = _process_extractors[extractor_name] = get_extractor(extractor_name)
+    return [(link["url"], link["text"]) for link in extractor.extract(html, base_url)]
+
+
+class ParsePool:
+    """
+    Parses fetched HTML in a pool of worker processes so link extraction is not
+    serialized by the GIL. At most max_pending pages are shipped to the pool at
+    once; callers block (checking for cancellation) until a slot frees up.
+    """
+
+    def __init__(self, processes: int, extractor_name: str, max_pending: int = None, poll_interval: float = 0.5):
+        self.processes = max(1, processes)
+        self.extractor_name = extractor_name
+        self.poll_interval = poll_interval
+        self._slots = threading.BoundedSemaphore(max_pending or self.processes * 2)
+        # spawn: forking a process that runs many threads (and DB connections) is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._lock = threading.Lock()
+        self.stats = {"parsed": 0, "cancelled": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def parse(self, html: str, base_url: str, cancelled=lambda: False) -> list:
+        """
+        Extract links from html in a worker process. Returns [] if cancelled() becomes
+        true while waiting for a slot or for the result.
+        """
+        while not self._slots.acquire(timeout=self.poll_interval):
+            if cancelled():
+                self._count("cancelled")
+                return []
+
+        try:
+            future = self._executor.submit(_extract_in_process, self.extractor_name, html, base_url)
+            while True:
+                try:
+                    links = future.result(timeout=self.poll_interval)
+                    break
+                except FutureTimeoutError:
+                    if cancelled():
+                        future.cancel()
+                        self._count("cancelled")
+                        return []
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"Error parsing {base_url} in worker process: {e}")
+            return []
+        finally:
+            self._slots.release()
+
+        self._count("parsed")
+        return [{"url": url, "text": text} for url, text in links]
+
+    def shutdown(self, cancel: bool = False):
+        """Stop the worker processes; with cancel=True queued pages are dropped."""
+        self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
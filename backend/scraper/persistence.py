@@ -0,0 +1,270 @@
+import logging
+import threading
+import time
+
+from django.db import connection
+
+from .models import Link, FrontierEntry
+from .frontier import url_fingerprint
+from .streaming import link_notifier
+
+logger = logging.getLogger(__name__)
+
+URL_MAX_LENGTH = Link._meta.get_field('url').max_length
+
+
+class LinkWriteBuffer:
+    """
+    Write-behind buffer for scored links. Rows are collected in memory and written with a
+    single bulk upsert on the (url, crawler) unique key whenever batch_size rows are pending
+    or flush_interval seconds have passed. close() always performs a final flush. A batch
+    the database rejects is written again in halves, so only the offending rows are lost.
+    """
+
+    def __init__(self, crawler, batch_size: int = 500, flush_interval: float = 2.0, metrics=None):
+        self.crawler = crawler
+        self.metrics = metrics
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+        self.stats = {"flushes": 0, "rows": 0, "errors": 0, "dropped": 0}
+
+    def start(self):
+        """Start the background thread that flushes on time."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self._closed.wait(self.flush_interval):
+                self.flush()
+        finally:
+            connection.close()
+
+    def add(self, url: str, link_type: str, score: float, keyword: str, metadata: dict):
+        if len(url) > URL_MAX_LENGTH:
+            logger.error(f"Skipping link longer than {URL_MAX_LENGTH} characters: {url[:100]}...")
+            with self._write_lock:
+                self.stats["dropped"] += 1
+            return
+        link = Link(
+            url=url,
+            crawler=self.crawler,
+            type=link_type,
+            relevance_score=score,
+            keywords=keyword,
+            metadata=metadata
+        )
+        with self._lock:
+            # Keyed by URL: an upsert batch must not contain the same conflict key twice
+            self._pending[url] = link
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all pending rows. Returns the number of rows written."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = list(self._pending.values())
+            self._pending = {}
+
+        # Serialize writers so concurrent flushes do not deadlock on the same rows
+        with self._write_lock:
+            started = time.monotonic()
+            written = self._write(batch)
+            self.stats["flushes"] += 1
+            self.stats["rows"] += written
+            if self.metrics is not None:
+                self.metrics.observe_flush(time.monotonic() - started, written)
+        if written:
+            # Wake up link streams of this crawler
+            link_notifier.notify(self.crawler.id)
+        return written
+
+    def _write(self, batch: list) -> int:
+        """Upsert the rows; on failure, retry each half until the rows that fail are isolated and dropped."""
+        try:
+            Link.objects.bulk_create(
+                batch,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=['url', 'crawler'],
+                update_fields=['type', 'relevance_score', 'keywords', 'metadata', 'updated_at']
+            )
+            return len(batch)
+        except Exception as e:
+            self.stats["errors"] += 1
+            if len(batch) == 1:
+                self.stats["dropped"] += 1
+                logger.error(f"Error saving link {batch[0].url}: {e}")
+                return 0
+            logger.error(f"Error flushing {len(batch)} links, retrying in halves: {e}")
+            middle = len(batch) // 2
+            return self._write(batch[:middle]) + self._write(batch[middle:])
+
+    def close(self):
+        """Stop the background flusher and write whatever is still pending."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self._write_lock:
+            return dict(self.stats)
+
+
+class FrontierJournal:
+    """
+    Write-behind record of a crawl's frontier in FrontierEntry rows, so a crawl can be
+    resumed after a restart. Discovered URLs are inserted as pending (or done, when they
+    are only recorded and never fetched) and marked done once fully processed. Inserts are
+    always written before done-updates, so a URL is never marked done before it exists.
+    With a link_buffer (LinkWriteBuffer) pending links are flushed first, so a page is
+    never marked done before the links found on it are saved.
+    """
+
+    def __init__(self, crawler, batch_size: int = 500, flush_interval: float = 2.0, metrics=None,
+                 link_buffer=None):
+        self.crawler = crawler
+        self.metrics = metrics
+        self.link_buffer = link_buffer
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._new = {}
+        self._done = set()
+        # Fingerprint -> number of queued copies (a URL requeued for a retry is queued twice)
+        self._outstanding = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+        self.stats = {"flushes": 0, "inserted": 0, "completed": 0, "errors": 0}
+
+    def start(self):
+        """Start the background thread that flushes on time."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            while not self._closed.wait(self.flush_interval):
+                self.flush()
+        finally:
+            connection.close()
+
+    def add(self, url: str, depth: int, pending: bool = True):
+        """Record a newly discovered URL; pending=False records it as seen but never fetched."""
+        state = FrontierEntry.PENDING if pending else FrontierEntry.DONE
+        with self._lock:
+            self._new[url] = FrontierEntry(crawler=self.crawler, url=url, depth=depth, state=state)
+            if pending:
+                self._outstanding[url_fingerprint(url)] = 1
+            full = len(self._new) + len(self._done) >= self.batch_size
+        if full:
+            self.flush()
+
+    def track(self, url: str):
+        """Track a pending URL restored from the database without writing it again."""
+        with self._lock:
+            self._outstanding[url_fingerprint(url)] = 1
+
+    def retry(self, url: str):
+        """The URL was queued again; it is done only once every queued copy is done."""
+        fingerprint = url_fingerprint(url)
+        with self._lock:
+            self._outstanding[fingerprint] = self._outstanding.get(fingerprint, 0) + 1
+
+    def done(self, url: str):
+        """A queued copy of the URL was processed."""
+        fingerprint = url_fingerprint(url)
+        with self._lock:
+            remaining = self._outstanding.get(fingerprint, 1) - 1
+            if remaining > 0:
+                self._outstanding[fingerprint] = remaining
+                return
+            self._outstanding.pop(fingerprint, None)
+            entry = self._new.get(url)
+            if entry is not None:
+                # Not written yet: insert it as done directly
+                entry.state = FrontierEntry.DONE
+            else:
+                self._done.add(url)
+            full = len(self._new) + len(self._done) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write pending inserts and done-updates. Returns the number of rows written. Taking
+        and writing a snapshot is serialized, so a done-update is never written before the
+        insert of its URL taken by an earlier flush. Rows of a failed write are put back
+        and written by the next flush.
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self._new and not self._done:
+                    return 0
+                new = self._new
+                done = self._done
+                self._new = {}
+                self._done = set()
+
+            if self.link_buffer is not None:
+                self.link_buffer.flush()
+            started = time.monotonic()
+            try:
+                FrontierEntry.objects.bulk_create(list(new.values()), batch_size=self.batch_size, ignore_conflicts=True)
+                done_urls = list(done)
+                for start in range(0, len(done_urls), self.batch_size):
+                    FrontierEntry.objects.filter(
+                        crawler=self.crawler,
+                        url__in=done_urls[start:start + self.batch_size]
+                    ).update(state=FrontierEntry.DONE)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Error flushing frontier ({len(new)} new, {len(done)} done), retrying later: {e}")
+                with self._lock:
+                    # Inserts are idempotent, so rows already written are harmless to write again
+                    self._new = {**new, **self._new}
+                    self._done |= done
+                return 0
+            self.stats["flushes"] += 1
+            self.stats["inserted"] += len(new)
+            self.stats["completed"] += len(done)
+            if self.metrics is not None:
+                self.metrics.observe_flush(time.monotonic() - started, len(new) + len(done))
+        return len(new) + len(done)
+
+    def close(self):
+        """Stop the background flusher and write whatever is still pending."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> dict:
+        with self._write_lock:
+            stats = dict(self.stats)
+        with self._lock:
+            stats["outstanding"] = len(self._outstanding)
+        return stats
+
+
+def load_frontier(crawler, chunk_size: int = 5000):
+    """Yield (url, depth, is_pending) for every URL recorded for the crawler."""
+    entries = FrontierEntry.objects.filter(crawler=crawler).values_list('url', 'depth', 'state')
+    for url, depth, state in entries.iterator(chunk_size=chunk_size):
+        yield url, depth, state == FrontierEntry.PENDING
@@ -0,0 +1,135 @@
+import logging
+import queue
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Sent once per worker to make it exit after the items queued before it
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of the crawl pipeline: `concurrency` worker threads consuming a bounded
+    input queue and calling handler(item) for each item. A full queue blocks producers,
+    which is what keeps a slow stage from being buried by a fast one.
+    """
+
+    def __init__(self, name: str, handler, concurrency: int = 1, queue_size: int = 1000):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = []
+        self._lock = threading.Lock()
+        self.stats = {"processed": 0, "errors": 0, "busy": 0, "max_queue_depth": 0}
+
+    def start(self):
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def _next(self):
+        return self.queue.get()
+
+    def _item_done(self):
+        self.queue.task_done()
+
+    def _run(self):
+        try:
+            while True:
+                item = self._next()
+                if item is _STOP:
+                    self._item_done()
+                    break
+                with self._lock:
+                    self.stats["busy"] += 1
+                try:
+                    self.handler(item)
+                    with self._lock:
+                        self.stats["processed"] += 1
+                except Exception as e:
+                    with self._lock:
+                        self.stats["errors"] += 1
+                    logger.error(f"Error in {self.name} stage: {e}", exc_info=True)
+                finally:
+                    with self._lock:
+                        self.stats["busy"] -= 1
+                    self._item_done()
+        finally:
+            connection.close()  # Each worker thread opens its own DB connection
+
+    def put(self, item, should_stop=lambda: False, poll_interval: float = 0.5) -> bool:
+        """
+        Queue an item, blocking while the queue is full. Returns False (item dropped)
+        if should_stop() becomes true while waiting.
+        """
+        while True:
+            try:
+                self.queue.put(item, timeout=poll_interval)
+                break
+            except queue.Full:
+                if should_stop():
+                    return False
+        depth = self.queue.qsize()
+        with self._lock:
+            if depth > self.stats["max_queue_depth"]:
+                self.stats["max_queue_depth"] = depth
+        return True
+
+    def close(self, timeout: float = None):
+        """Let the workers finish everything already queued, then stop them."""
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["queue_size"] = self.queue.maxsize
+        stats["concurrency"] = self.concurrency
+        return stats
+
+
+class FrontierStage(Stage):
+    """
+    Stage whose input is the crawl frontier instead of its own queue. The handler is
+    responsible for calling frontier.task_done() once the URL is fully processed.
+    """
+
+    def __init__(self, name: str, handler, frontier, concurrency: int = 1, poll_interval: float = 0.5):
+        super().__init__(name, handler, concurrency, queue_size=1)
+        self.frontier = frontier
+        self.poll_interval = poll_interval
+        self._closing = threading.Event()
+
+    def _next(self):
+        while not self._closing.is_set():
+            try:
+                return self.frontier.get(timeout=self.poll_interval)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _item_done(self):
+        pass
+
+    def close(self, timeout: float = None):
+        self._closing.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def metrics(self) -> dict:
+        stats = super().metrics()
+        stats["queue_depth"] = self.frontier.qsize()
+        stats["queue_size"] = None
+        return stats
+
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from datetime import timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean "slow down"; the URL is retried after the back-off
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now: float = None):
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=dt_timezone.utc)
+    now = time.time() if now is None else now
+    return max(0.0, retry_at.timestamp() - now)
+
+
+class HostState:
+    def __init__(self, rate: float, burst: float, concurrency: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.latency = None
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+
+class HostScheduler:
+    """
+    Per-host politeness: a token bucket limits the request rate, and an AIMD limit on
+    concurrent requests grows while responses are fast and healthy and is cut on slow
+    responses, errors and throttling (429/503). Retry-After pauses the whole host.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: float = 10.0, min_rate: float = 0.2, max_rate: float = 50.0,
+                 concurrency: float = 8, min_concurrency: float = 1, max_concurrency: float = 64,
+                 target_latency: float = 2.0, default_backoff: float = 10.0, max_backoff: float = 300.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.default_backoff = default_backoff
+        self.max_backoff = max_backoff
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def _host(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.rate, self.burst, self.initial_concurrency)
+        return state
+
+    def try_acquire(self, host: str) -> float:
+        """
+        Take a request slot for the host if one is available right now. Returns 0.0 when
+        acquired, otherwise the number of seconds to wait before trying again.
+        """
+        now = time.monotonic()
+        with self._condition:
+            state = self._host(host)
+            if state.blocked_until > now:
+                return state.blocked_until - now
+            if state.in_flight >= int(state.concurrency):
+                return 0.05
+            state.refill(now)
+            if state.tokens < 1:
+                return (1 - state.tokens) / state.rate
+            state.tokens -= 1
+            state.in_flight += 1
+            state.stats["requests"] += 1
+            return 0.0
+
+    def acquire(self, host: str, should_stop=lambda: False) -> bool:
+        """Block until a request to the host is allowed. Returns False if should_stop() became true."""
+        while True:
+            wait = self.try_acquire(host)
+            if wait <= 0:
+                return True
+            if should_stop():
+                return False
+            with self._condition:
+                self._condition.wait(timeout=min(wait, 0.5))
+
+    def release(self, host: str, status: int = None, latency: float = None, retry_after: float = None):
+        """
+        Report the outcome of a request. status is None for network errors.
+        Returns the back-off in seconds applied to the host (0.0 if none).
+        """
+        backoff = 0.0
+        with self._condition:
+            state = self._host(host)
+            state.in_flight = max(0, state.in_flight - 1)
+            if latency is not None:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+
+            if status in THROTTLE_STATUSES:
+                state.stats["throttled"] += 1
+                # Multiplicative decrease of both limits, once per back-off window (requests
+                # that were already in flight when the host started throttling don't count again)
+                if state.blocked_until <= time.monotonic():
+                    state.concurrency = max(self.min_concurrency, state.concurrency / 2)
+                    state.rate = max(self.min_rate, state.rate / 2)
+                backoff = min(self.max_backoff, retry_after if retry_after is not None else self.default_backoff)
+                state.blocked_until = max(state.blocked_until, time.monotonic() + backoff)
+                logger.warning(f"Host {host} throttled us ({status}); pausing {backoff:.1f}s, "
+                               f"concurrency {state.concurrency:.1f}, rate {state.rate:.2f}/s")
+            elif status is None or status >= 500:
+                state.stats["errors"] += 1
+                state.concurrency = max(self.min_concurrency, state.concurrency * 0.75)
+            elif latency is not None and latency > 2 * self.target_latency:
+                state.concurrency = max(self.min_concurrency, state.concurrency * 0.75)
+            elif latency is None or latency <= self.target_latency:
+                # Additive increase: about one more slot per window of successful requests
+                state.concurrency = min(self.max_concurrency, state.concurrency + 1 / state.concurrency)
+                state.rate = min(self.max_rate, state.rate + 0.1)
+            self._condition.notify_all()
+        return backoff
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                host: {
+                    **state.stats,
+                    "concurrency": round(state.concurrency, 2),
+                    "rate": round(state.rate, 2),
+                    "latency": round(state.latency, 3) if state.latency is not None else None,
+                    "in_flight": state.in_flight,
+                }
+                for host, state in self._hosts.items()
+            }
@@ -0,0 +1,64 @@
+import logging
+import threading
+
+from django.db.models import Exists, OuterRef
+
+from .models import Link
+
+logger = logging.getLogger(__name__)
+
+
+class RecrawlDiff:
+    """
+    Reuse of a previous crawl's results by a recrawl (Crawler.recrawl_of). Links whose URL
+    was found by the previous crawl with the same anchor text keep its score and type; new
+    and changed links are scored as usual. Lookups go to the database per batch (through
+    the (url, crawler) unique index), so nothing of the previous crawl is held in memory.
+    """
+
+    def __init__(self, previous_crawler_id):
+        self.previous_crawler_id = previous_crawler_id
+        self._lock = threading.Lock()
+        self.stats = {"reused": 0, "rescored": 0}
+
+    def match(self, links: list) -> dict:
+        """{index in links: (score, link_type)} for the links the previous crawl found unchanged."""
+        urls = {link.get("url", "") for link in links}
+        previous = {
+            url: (text, score, link_type)
+            for url, text, score, link_type in Link.objects.filter(
+                crawler_id=self.previous_crawler_id, url__in=urls
+            ).values_list('url', 'metadata__text', 'relevance_score', 'type')
+        }
+        matched = {}
+        for i, link in enumerate(links):
+            found = previous.get(link.get("url", ""))
+            if found is not None and found[0] == link.get("text", ""):
+                matched[i] = (found[1], found[2])
+        with self._lock:
+            self.stats["reused"] += len(matched)
+            self.stats["rescored"] += len(links) - len(matched)
+        return matched
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+def recrawl_report(crawler) -> dict:
+    """
+    Links of the recrawl compared with those of the previous crawl: added (new URLs),
+    removed (URLs not found again), unchanged (same URL and anchor text) and changed.
+    """
+    links = Link.objects.filter(crawler=crawler)
+    previous = Link.objects.filter(crawler_id=crawler.recrawl_of_id)
+    same_url = previous.filter(url=OuterRef('url'))
+    found_again = links.filter(Exists(same_url)).count()
+    unchanged = links.filter(Exists(same_url.filter(metadata__text=OuterRef('metadata__text')))).count()
+    return {
+        "previous_crawler": str(crawler.recrawl_of_id),
+        "added": links.count() - found_again,
+        "removed": previous.exclude(Exists(links.filter(url=OuterRef('url')))).count(),
+        "unchanged": unchanged,
+        "changed": found_again - unchanged,
+    }
@@ -0,0 +1,204 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Crawler
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerError(Exception):
+    """A crawl job was rejected by admission control."""
+
+
+class CrawlJob:
+    def __init__(self, crawler: Crawler, workers: int, target, slots: int = None):
+        self.crawler = crawler
+        self.crawler_id = str(crawler.id)
+        self.user_id = crawler.user_id
+        self.workers = workers
+        # Share of the worker budget the job holds while it runs
+        self.slots = workers if slots is None else slots
+        self.target = target
+        self.submitted_at = time.monotonic()
+
+
+class CrawlScheduler:
+    """
+    Process-wide queue of crawl jobs. A job asks for a number of workers and is started
+    only while the sum over running jobs stays within max_total_workers. Users take turns:
+    the next job comes from the user with the fewest workers currently running (oldest
+    submission first on ties), so one user's burst cannot hold the whole budget while
+    others wait. Only the head of that queue is considered, so big jobs are not starved
+    by a stream of small ones.
+
+    For the async engine workers are in-flight requests, not threads: up to
+    max_async_concurrency are accepted, and every async_requests_per_worker of them
+    count as one worker of the budget.
+    """
+
+    def __init__(self, max_total_workers: int = 200, max_workers_per_crawl: int = 50, max_queued_per_user: int = 20,
+                 max_async_concurrency: int = 2000, async_requests_per_worker: int = 50):
+        self.max_total_workers = max(1, max_total_workers)
+        self.max_workers_per_crawl = max(1, min(max_workers_per_crawl, self.max_total_workers))
+        self.max_queued_per_user = max_queued_per_user
+        self.max_async_concurrency = max(1, max_async_concurrency)
+        self.async_requests_per_worker = max(1, async_requests_per_worker)
+        self._queues = {}   # user id -> deque of CrawlJob
+        self._running = {}  # crawler id -> CrawlJob
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "started": 0, "finished": 0, "cancelled": 0, "rejected": 0}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_total_workers=getattr(settings, 'CRAWL_MAX_TOTAL_WORKERS', 200),
+            max_workers_per_crawl=getattr(settings, 'CRAWL_MAX_WORKERS_PER_CRAWL', 50),
+            max_queued_per_user=getattr(settings, 'CRAWL_MAX_QUEUED_PER_USER', 20),
+            max_async_concurrency=getattr(settings, 'CRAWL_MAX_ASYNC_CONCURRENCY', 2000),
+            async_requests_per_worker=getattr(settings, 'CRAWL_ASYNC_REQUESTS_PER_WORKER', 50)
+        )
+
+    def max_workers(self, engine: str = "threads") -> int:
+        """Largest workers value accepted for a crawl of the engine."""
+        return self.max_async_concurrency if engine == "async" else self.max_workers_per_crawl
+
+    def budget_share(self, workers: int, engine: str = "threads") -> int:
+        """Workers of the budget held by a crawl of the engine."""
+        if engine == "async":
+            return min(math.ceil(workers / self.async_requests_per_worker), self.max_workers_per_crawl)
+        return workers
+
+    def submit(self, crawler: Crawler, workers: int, target, engine: str = "threads") -> int:
+        """
+        Queue target(workers) to run the crawler. Raises SchedulerError if workers is out
+        of bounds for the engine or the user has too many queued crawls. Returns the queue
+        position (0 if the job started right away).
+        """
+        max_workers = self.max_workers(engine)
+        if not 1 <= workers <= max_workers:
+            with self._lock:
+                self.stats["rejected"] += 1
+            raise SchedulerError(f"workers must be between 1 and {max_workers}")
+
+        job = CrawlJob(crawler, workers, target, slots=self.budget_share(workers, engine))
+        with self._lock:
+            if len(self._queues.get(job.user_id, ())) >= self.max_queued_per_user:
+                self.stats["rejected"] += 1
+                raise SchedulerError(f"Too many queued crawls (limit {self.max_queued_per_user})")
+
+        # Before the job becomes visible: a dispatch from another thread may start it right away
+        Crawler.objects.filter(id=crawler.id).update(status=Crawler.QUEUED, is_running=True, end_time=None)
+        with self._lock:
+            self._queues.setdefault(job.user_id, deque()).append(job)
+            self.stats["submitted"] += 1
+        self._dispatch()
+        with self._lock:
+            return self._position(job)
+
+    def _position(self, job: CrawlJob) -> int:
+        user_queue = self._queues.get(job.user_id, ())
+        return list(user_queue).index(job) + 1 if job in user_queue else 0
+
+    def _used_workers(self) -> int:
+        return sum(job.slots for job in self._running.values())
+
+    def _user_workers(self, user_id) -> int:
+        return sum(job.slots for job in self._running.values() if job.user_id == user_id)
+
+    def _next_job(self):
+        """Head job of the user with the fewest running workers, if it fits in the budget."""
+        waiting = [user_queue[0] for user_queue in self._queues.values() if user_queue]
+        if not waiting:
+            return None
+        job = min(waiting, key=lambda j: (self._user_workers(j.user_id), j.submitted_at))
+        if self._used_workers() + job.slots > self.max_total_workers:
+            return None
+        self._queues[job.user_id].popleft()
+        if not self._queues[job.user_id]:
+            del self._queues[job.user_id]
+        return job
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                job = self._next_job()
+                if job is None:
+                    return
+                self._running[job.crawler_id] = job
+                self.stats["started"] += 1
+            logger.info(f"Starting crawler {job.crawler_id} with {job.workers} workers "
+                        f"({self.running_workers()}/{self.max_total_workers} in use)")
+            threading.Thread(target=self._run, args=(job,), name=f"crawl-{job.crawler_id}", daemon=True).start()
+
+    def _run(self, job: CrawlJob):
+        try:
+            # Stopped while it was waiting
+            if Crawler.objects.filter(id=job.crawler.id, is_running=True).exists():
+                job.target(job.workers)
+        except Exception as e:
+            logger.error(f"Crawler {job.crawler_id} failed: {e}", exc_info=True)
+            Crawler.objects.filter(id=job.crawler.id, is_running=True).update(
+                status=Crawler.STOPPED, is_running=False, end_time=timezone.now()
+            )
+        finally:
+            connection.close()
+            with self._lock:
+                self._running.pop(job.crawler_id, None)
+                self.stats["finished"] += 1
+            self._dispatch()
+
+    def cancel(self, crawler_id) -> bool:
+        """Remove a queued (not yet started) crawl. Returns True if it was queued."""
+        crawler_id = str(crawler_id)
+        with self._lock:
+            for user_queue in self._queues.values():
+                for job in user_queue:
+                    if job.crawler_id == crawler_id:
+                        user_queue.remove(job)
+                        if not user_queue:
+                            del self._queues[job.user_id]
+                        self.stats["cancelled"] += 1
+                        return True
+        return False
+
+    def is_scheduled(self, crawler_id) -> bool:
+        """True if the crawl is queued or running in this process."""
+        crawler_id = str(crawler_id)
+        with self._lock:
+            return crawler_id in self._running or any(
+                job.crawler_id == crawler_id for user_queue in self._queues.values() for job in user_queue
+            )
+
+    def running_workers(self) -> int:
+        with self._lock:
+            return self._used_workers()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "queued": sum(len(user_queue) for user_queue in self._queues.values()),
+                "running": len(self._running),
+                "workers_in_use": self._used_workers(),
+                "max_total_workers": self.max_total_workers,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> CrawlScheduler:
+    """The process-wide scheduler, created from settings on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CrawlScheduler.from_settings()
+        return _scheduler
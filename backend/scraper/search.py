@@ -0,0 +1,18 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .models import SEARCH_CONFIG
+
+
+def search_links(queryset, q: str):
+    """
+    Links matching the web-search style query q ("quoted phrases", or, -excluded) on
+    their anchor text and URL, annotated with search_rank. The match is answered by the
+    GIN index on Link.search_vector.
+    """
+    query = SearchQuery(q, search_type='websearch', config=SEARCH_CONFIG)
+    # ts_rank returns real; as double precision the rank round-trips exactly through a
+    # pagination cursor (a Python float), so rows tied on it compare equal
+    rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+    return queryset.filter(search_vector=query).annotate(search_rank=rank)
@@ -10,8 +10,8 @@ class UserSerializer(serializers.ModelSerializer):
 class CrawlerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Crawler
-        fields = ['id', 'url', 'keyword', 'start_time', 'end_time', 'is_running', 'max_depth', 'user']
-        read_only_fields = ['id'] 
+        fields = ['id', 'url', 'keyword', 'start_time', 'end_time', 'is_running', 'status', 'max_depth', 'user', 'stats', 'recrawl_of']
+        read_only_fields = ['id', 'status', 'stats', 'recrawl_of']
 
 
 class LinkSerializer(serializers.ModelSerializer):
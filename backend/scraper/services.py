@@ -1,16 +1,28 @@
-import re
-import cloudscraper
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 import logging
 import uuid
-import queue
 import threading
 import time
 from django.utils import timezone
 
-from .llm_processor import get_relevance_score, classify_link_type
-from .models import Link, Crawler
+from .llm_processor import score_and_classify_batch, prefilter_link, DEFAULT_PREFILTER_BAND, BOILERPLATE_ANCHORS
+from .llm_cache import ScoreCache, normalize_text, purge_expired_scores
+from .models import Crawler
+from .sessions import SessionPool
+from .politeness import HostScheduler, parse_retry_after, THROTTLE_STATUSES
+from .metrics import CrawlMetrics
+from .http_cache import FetchedPage, CachedPage, get_http_cache
+from .dedup import simhash, NearDuplicateIndex
+from .traps import TrapDetector
+from .persistence import LinkWriteBuffer, FrontierJournal, load_frontier
+from .recrawl import RecrawlDiff, recrawl_report
+from .streaming import link_notifier
+from .extractors import get_extractor, DEFAULT_EXTRACTOR
+from .parse_pool import ParsePool
+from .pipeline import Stage, FrontierStage
+from .scheduler import get_scheduler
+from .frontier import Frontier, make_visited_set, peak_rss_bytes, VISITED_MODES, FRONTIER_MODES
+from .async_engine import AsyncCrawlEngine
 from fake_useragent import UserAgent
 
 logger = logging.getLogger(__name__)
@@ -18,30 +30,104 @@ logger = logging.getLogger(__name__)
 # Global dictionary to track active crawlers
 active_crawlers = {}
 
+# Available crawl engines, selectable per crawl
+CRAWL_ENGINES = ("threads", "async")
+
+
+def canonicalize_url(url: str, allowed_schemes=("https",)) -> str:
+    """WebScraper.canonicalize_url for a given set of schemes; "" if the scheme is not allowed."""
+    parsed = urlparse(url)
+    if parsed.scheme not in allowed_schemes:
+        return ""
+    path = parsed.path if parsed.path == "/" else parsed.path.rstrip("/")
+    canonical = parsed._replace(path=path, query="", fragment="").geturl()
+    # Optional: remove default ports if present
+    if parsed.port:
+        if (parsed.scheme == "http" and parsed.port == 80) or (parsed.scheme == "https" and parsed.port == 443):
+            canonical = canonical.replace(f":{parsed.port}", "")
+    return canonical
+
+
 class WebScraper:
-    def __init__(self, keyword, user):
+    # URL schemes the crawler follows; plain HTTP is only enabled for local sites (e.g. benchmarks)
+    allowed_schemes = ("https",)
+
+    def __init__(self, keyword, user, pool_size=10, connect_timeout=10.0, read_timeout=30.0, llm_batch_size=20,
+                 prefilter_band=DEFAULT_PREFILTER_BAND, prefilter_stop_list=BOILERPLATE_ANCHORS,
+                 db_batch_size=500, db_flush_interval=2.0, extractor=DEFAULT_EXTRACTOR,
+                 visited_mode="fingerprint", bloom_capacity=10_000_000, bloom_error_rate=0.001,
+                 parse_processes=0, parse_workers=4, score_workers=4, persist_workers=1, stage_queue_size=1000,
+                 host_rate=10.0, host_concurrency=8, max_retries=3, use_http_cache=True, near_duplicate_distance=3,
+                 trap_detection=True, trap_limits=None, frontier_mode="bfs", aging_window=1000, page_budget=None):
         self.keyword = keyword
         self.user = user
         self.crawler = None  # Initialize to None, we'll create it in crawl()
-    
-    def crawl(self, url, max_depth=3, max_workers=50):
-        # Create the crawler model with proper UUID
-        self.crawler_model = Crawler.objects.create(
-            url=url,
-            keyword=self.keyword,
-            user=self.user,
-            max_depth=max_depth,
-            is_running=True
+        self.llm_batch_size = max(1, llm_batch_size)
+        # Pre-filter scores below/above this band skip the LLM; use (0.0, 1.0) to send everything
+        self.prefilter_band = tuple(prefilter_band)
+        self.prefilter_stop_list = frozenset(prefilter_stop_list)
+        self.prefilter_stats = {"skipped_low": 0, "skipped_high": 0, "sent_to_llm": 0}
+        self._stats_lock = threading.Lock()
+        self.db_batch_size = db_batch_size
+        self.db_flush_interval = db_flush_interval
+        self.link_extractor = get_extractor(extractor)
+        # Parse in worker processes when parse_processes > 0 (pool is created per crawl)
+        self.parse_processes = parse_processes
+        self.parse_pool = None
+        # Pipeline stage sizes (the fetch stage uses crawl()'s max_workers)
+        self.parse_workers = max(parse_workers, parse_processes)
+        self.score_workers = score_workers
+        self.persist_workers = persist_workers
+        self.stage_queue_size = stage_queue_size
+        self.stages = []
+        self.metrics_interval = 30
+        if visited_mode not in VISITED_MODES:
+            raise ValueError(f"Unknown visited set mode: {visited_mode}")
+        self.visited_mode = visited_mode
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        if frontier_mode not in FRONTIER_MODES:
+            raise ValueError(f"Unknown frontier mode: {frontier_mode}")
+        # best_first fetches the URLs with the best pre-filter score of their link first
+        self.frontier_mode = frontier_mode
+        self.aging_window = aging_window
+        # Fetches allowed per run (None: no limit); URLs left over stay pending for a resume
+        self.page_budget = page_budget
+        self.pages_started = 0
+        # Per-host token bucket (requests/second) and adaptive concurrency limit
+        self.host_scheduler = HostScheduler(
+            rate=host_rate,
+            burst=max(1.0, host_rate),
+            max_rate=max(50.0, host_rate),
+            concurrency=host_concurrency,
+            max_concurrency=max(64, host_concurrency)
+        )
+        self.max_retries = max_retries
+        self._retries = {}
+        # Sessions are shared by all worker threads of this crawl and reused per host
+        self.session_pool = SessionPool(
+            pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout
         )
-        
-        self.crawler_id = self.crawler_model.id  # Store the UUID
         self.ua = UserAgent()
-        self.all_links = set()
+        # Validators and links of pages fetched by earlier crawls, to revalidate instead of refetching
+        self.http_cache = get_http_cache() if use_http_cache else None
+        # Pages whose SimHash is within this many bits of a parsed page are not parsed (None: parse all)
+        self.near_duplicate_distance = near_duplicate_distance
+        self.near_duplicates = None
+        # Keep calendars, faceted paths and repeating paths from filling the frontier
+        self.trap_detection = trap_detection
+        # TrapDetector keyword arguments (traps.TRAP_LIMITS)
+        self.trap_limits = dict(trap_limits or {})
+        self.trap_detector = None
+        self.frontier_journal = None
+        self.recrawl = None
+        self.crawler_model = None
+        self.crawler_id = None
+        self.is_running = False
         self.stop_requested = False
-        self.is_running = True
-
-        # Register this crawler in the global dictionary
-        active_crawlers[str(self.crawler_id)] = self
+        self.metrics = CrawlMetrics()
 
     def _get_headers(self):
         return {
@@ -60,94 +146,278 @@ class WebScraper:
             'DNT': '1',
         }
 
-    def fetch_page(self, url: str) -> str:
+    def fetch_response(self, url: str, extra_headers: dict = None):
+        """Sends the request and returns the response, or None if the request failed."""
         try:
-            scraper = cloudscraper.create_scraper(browser='chrome')
             headers = self._get_headers()
+            headers.update(extra_headers or {})
             logger.debug(f"Sending request to {url}")
-            response = scraper.get(url, headers=headers)
-            if response.status_code == 200:
-                logger.debug(f"Page loaded successfully: {url}")
-                return response.text
-            else:
-                raise Exception(f"Status code: {response.status_code}")
+            with self.session_pool.session(url) as scraper:
+                return scraper.get(url, headers=headers, timeout=self.session_pool.timeout)
         except Exception as e:
             logger.error(f"Error scraping {url}: {str(e)}")
+            return None
+
+    def fetch_page(self, url: str) -> str:
+        response = self.fetch_response(url)
+        if response is None:
             return ""
+        if response.status_code == 200:
+            logger.debug(f"Page loaded successfully: {url}")
+            return response.text
+        logger.error(f"Error scraping {url}: Status code: {response.status_code}")
+        return ""
+
+    def polite_fetch(self, url: str, depth: int, requeue) -> str:
+        """
+        Fetches a page through the per-host scheduler. Throttled requests (429/503) are
+        handed to requeue(url, depth) to be retried after the host's back-off, up to
+        max_retries times. Returns the page HTML (a FetchedPage), a CachedPage when the
+        HTTP cache still holds the page's links, or "".
+        """
+        host = urlparse(url).netloc
+        if not self.host_scheduler.acquire(host, should_stop=lambda: self.stop_requested):
+            return ""
+
+        cached, conditional_headers = self.revalidation_headers(url)
+        started = time.monotonic()
+        response = None
+        try:
+            response = self.fetch_response(url, conditional_headers)
+        finally:
+            latency = time.monotonic() - started
+            status = response.status_code if response is not None else None
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+            self.host_scheduler.release(host, status, latency, retry_after)
+            self.metrics.observe_fetch(latency, status, len(response.content) if status == 200 else 0)
+
+        if response is None:
+            return ""
+        if response.status_code in THROTTLE_STATUSES:
+            if self.should_retry(url, response.status_code):
+                requeue(url, depth)
+            return ""
+        self.clear_retries(url)
+        if response.status_code in (200, 304):
+            return self.page_from_response(url, response, cached)
+        logger.error(f"Error scraping {url}: Status code: {response.status_code}")
+        return ""
+
+    def revalidation_headers(self, url: str) -> tuple:
+        """The HTTP cache entry of the URL and the conditional headers revalidating it ((None, {}) if not cached)."""
+        if self.http_cache is None:
+            return None, {}
+        cached = self.http_cache.get(url)
+        if cached is None:
+            return None, {}
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return cached, headers
+
+    def page_from_response(self, url: str, response, cached: dict = None):
+        """
+        Page of a 200 or 304 response (requests or httpx). The cached links are reused when
+        the server answers 304 or sends the same content again; otherwise the HTML is
+        returned as a FetchedPage, whose links parse_links stores in the cache.
+        """
+        if response.status_code == 304:
+            if cached is None:
+                logger.error(f"Error scraping {url}: 304 Not Modified for a page that is not cached")
+                return ""
+            logger.debug(f"Page not modified, reusing cached links: {url}")
+            self.metrics.count("cache_not_modified")
+            return CachedPage(url, cached["links"])
+
+        logger.debug(f"Page loaded successfully: {url}")
+        page = FetchedPage(response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        if cached is not None and cached.get("content_hash") == page.content_hash:
+            self.metrics.count("cache_unchanged")
+            if (page.etag, page.last_modified) != (cached.get("etag"), cached.get("last_modified")):
+                self.http_cache.put(url, page.etag, page.last_modified, page.content_hash, cached["links"])
+            return CachedPage(url, cached["links"])
+        return page
+
+    def take_page(self) -> bool:
+        """Count a fetch against page_budget. False once the budget is used up."""
+        with self._stats_lock:
+            if self.page_budget is not None and self.pages_started >= self.page_budget:
+                return False
+            self.pages_started += 1
+            return True
+
+    def link_priority(self, link: dict) -> float:
+        """Predicted relevance (0-1) of a page not fetched yet: the pre-filter score of the link to it."""
+        if self.frontier_mode != "best_first":
+            return 0.0
+        return prefilter_link(link.get("text", ""), link.get("url", ""), self.keyword, self.prefilter_stop_list)[0]
+
+    def should_retry(self, url: str, status: int) -> bool:
+        """Counts a throttled attempt for the URL; True while it may still be retried."""
+        with self._stats_lock:
+            attempts = self._retries.get(url, 0) + 1
+            self._retries[url] = attempts
+        if attempts <= self.max_retries and not self.stop_requested:
+            logger.info(f"Retrying {url} later (attempt {attempts}/{self.max_retries}, status {status})")
+            return True
+        self.clear_retries(url)
+        logger.error(f"Giving up on {url} after {attempts} throttled attempts")
+        return False
+
+    def clear_retries(self, url: str):
+        """Forget the throttled attempts of a URL once it was fetched or given up on."""
+        with self._stats_lock:
+            self._retries.pop(url, None)
 
     def parse_links(self, html: str, base_url: str) -> list:
         """
         Extracts links from the page, handling relative URLs and cases where href is "javascript:void(0)".
         Attempts to get URL from alternative attributes if needed.
+        A CachedPage is not parsed again: its cached links are returned.
         """
-        try:
-            soup = BeautifulSoup(html, "html.parser")
-        except Exception as e:
-            logger.error(f"Error parsing HTML with html.parser: {e}. Trying lxml...", exc_info=True)
-            try:
-                soup = BeautifulSoup(html, "lxml")
-            except Exception as e2:
-                logger.error(f"Error parsing HTML with lxml: {e2}", exc_info=True)
-                return []  # If both fail, return empty list
-        
-        links = []
-    
-        for a in soup.find_all("a", href=True):
-            href = a.get("href").strip()
-            link_text = a.get_text(strip=True)
-
-            # If href is "javascript:void(0)" or similar, try alternative attributes
-            if href.lower().startswith("javascript:"):
-                href_alternatives = [a.get("data-href"), a.get("data-url"), a.get("onclick")]
-                for alt in href_alternatives:
-                    if alt:
-                        if "onclick" in a.attrs and alt == a.get("onclick"):
-                            match = re.search(r"(https?://[^\s'\"]+)", alt)
-                            if match:
-                                href = match.group(1)
-                                break
-                        else:
-                            href = alt.strip()
-                            if not href.lower().startswith("javascript:"):
-                                break
-
-            if not href or href.lower().startswith("javascript:"):
-                logger.debug(f"Ignored link (invalid href): {href} | Text: {link_text}")
-                continue
-
-            full_url = urljoin(base_url, href)
-            links.append({"url": full_url, "text": link_text})
+        if isinstance(html, CachedPage):
+            logger.info(f"{len(html.links)} links of page {base_url} taken from the HTTP cache.")
+            return html.links
+        if self.near_duplicates is not None and self.near_duplicates.check_and_add(simhash(html)):
+            # Mirrors (print views, language prefixes, session paths) link to the same pages
+            self.metrics.count("near_duplicates")
+            logger.info(f"Page {base_url} is a near-duplicate of a page already parsed; links not extracted.")
+            return []
+        if self.parse_pool is not None:
+            links = self.parse_pool.parse(str(html), base_url, cancelled=lambda: self.stop_requested)
+        else:
+            links = self.link_extractor.extract(html, base_url)
+        self.metrics.count("links_extracted", len(links))
         logger.info(f"{len(links)} links extracted from page {base_url}.")
+        # A parse cut short by a stop may be incomplete
+        if self.http_cache is not None and isinstance(html, FetchedPage) and not self.stop_requested:
+            self.http_cache.put(base_url, html.etag, html.last_modified, html.content_hash, links)
         return links
 
     def process_link(self, link: dict):
+        self.process_links([link])
+
+    def process_links(self, links: list) -> int:
+        """Scores and classifies links and saves them. Returns the number of links saved."""
+        saved = 0
+        for link, score, link_type in self.score_links(links):
+            try:
+                self._save_link(link.get("url", ""), link.get("text", ""), score, link_type)
+                saved += 1
+            except Exception as e:
+                logger.error(f"Error processing link: {str(e)}")
+        return saved
+
+    def score_links(self, links: list) -> list:
+        """
+        Returns (link, score, link_type) for each link that could be scored. The local
+        pre-filter settles obvious cases; only links in the uncertain band go to the
+        cache and then to the LLM (batches of llm_batch_size texts per call).
+        """
+        low, high = self.prefilter_band
+        results = [None] * len(links)
+        if self.recrawl is not None:
+            # Unchanged since the previous crawl: keep its score and type
+            for i, previous in self.recrawl.match(links).items():
+                results[i] = previous
+        uncertain = []
+        for i, link in enumerate(links):
+            if results[i] is not None:
+                continue
+            score, link_type = prefilter_link(link.get("text", ""), link.get("url", ""), self.keyword, self.prefilter_stop_list)
+            if score < low:
+                results[i] = (score, link_type)
+                self._count_prefilter("skipped_low")
+            elif score > high:
+                results[i] = (score, link_type)
+                self._count_prefilter("skipped_high")
+            else:
+                uncertain.append(i)
+                self._count_prefilter("sent_to_llm")
+
         try:
-            text = link.get("text", "")
-            url = link.get("url", "")
-            score = float(get_relevance_score(text, self.keyword))
-            link_type = classify_link_type(text)
-            metadata = {"text": text}
-            
-            if not isinstance(url, str) or not isinstance(link_type, str):
-                logger.error(f"Invalid data types for URL or link_type: {url}, {link_type}")
-                return
-                
-            # Use Django ORM to save the link with crawler reference
-            Link.objects.update_or_create(
-                url=url,
-                crawler=self.crawler_model,
-                defaults={
-                    'type': link_type,
-                    'relevance_score': score,
-                    'keywords': self.keyword,
-                    'metadata': metadata
-                }
-            )
-            
+            scored = self._score_texts([links[i].get("text", "") for i in uncertain])
         except Exception as e:
-            logger.error(f"Error processing link: {str(e)}")
+            logger.error(f"Error processing link batch: {str(e)}")
+            scored = [None] * len(uncertain)
+        for i, result in zip(uncertain, scored):
+            if result is None and not self.stop_requested:
+                # The LLM failed: keep the pre-filter result (not cached, so a later crawl asks again)
+                link = links[i]
+                result = prefilter_link(link.get("text", ""), link.get("url", ""), self.keyword, self.prefilter_stop_list)
+            results[i] = result
+
+        # None means the link was not scored because a stop was requested
+        return [(link, float(result[0]), result[1]) for link, result in zip(links, results) if result is not None]
+
+    def _count_prefilter(self, name: str):
+        with self._stats_lock:
+            self.prefilter_stats[name] += 1
+
+    def _score_texts(self, texts: list) -> list:
+        """
+        Returns a (score, link_type) pair per text, or None for texts left unscored (after a
+        stop, or because the LLM failed). Identical anchors are only scored once, and cached
+        results skip the LLM entirely; failures are never cached.
+        """
+        results = self.score_cache.get_many(texts, self.keyword)
+        pending = {}
+        for text in texts:
+            norm = normalize_text(text)
+            if norm not in results and norm not in pending:
+                pending[norm] = text
+        pending = list(pending.items())
+
+        for start in range(0, len(pending), self.llm_batch_size):
+            if self.stop_requested:
+                break
+            batch = pending[start:start + self.llm_batch_size]
+            started = time.monotonic()
+            try:
+                scores = score_and_classify_batch([text for _, text in batch], self.keyword)
+            except Exception:
+                self.metrics.observe_llm(time.monotonic() - started, len(batch), error=True)
+                raise
+            scored = {norm: result for (norm, _), result in zip(batch, scores) if result is not None}
+            self.metrics.observe_llm(time.monotonic() - started, len(batch), failed=len(batch) - len(scored))
+            self.score_cache.set_many(scored, self.keyword)
+            results.update(scored)
+
+        return [results.get(normalize_text(text)) for text in texts]
+
+    def _save_link(self, url: str, text: str, score: float, link_type: str):
+        metadata = {"text": text}
+
+        if not isinstance(url, str) or not isinstance(link_type, str):
+            logger.error(f"Invalid data types for URL or link_type: {url}, {link_type}")
             return
 
+        # Buffered; written in bulk with the crawler reference
+        self.link_buffer.add(url, link_type, score, self.keyword, metadata)
+
+    def _memory_usage(self) -> dict:
+        if self.frontier is not None:
+            usage = self.frontier.memory_usage()
+        else:
+            usage = {
+                "visited_mode": self.visited.mode,
+                "visited_count": len(self.visited),
+                "visited_bytes": self.visited.memory_usage(),
+            }
+        usage["peak_rss_bytes"] = peak_rss_bytes()
+        return usage
+
+    def _save_stats(self, **stats):
+        """Merge per-crawl statistics into Crawler.stats."""
+        logger.info(f"Crawler {self.crawler_id} stats: {stats}")
+        try:
+            self.crawler_model.stats = {**(self.crawler_model.stats or {}), **stats}
+            self.crawler_model.save(update_fields=['stats'])
+        except Exception as e:
+            logger.error(f"Error saving crawler stats: {e}")
+
     def is_internal(self, url: str, base_domain: str) -> bool:
         parsed_url = urlparse(url)
         return parsed_url.netloc == base_domain
@@ -155,136 +425,359 @@ class WebScraper:
     def canonicalize_url(self, url: str) -> str:
         """
         Normalizes the URL by removing query string, fragments, and trailing slashes.
-        Only HTTPS scheme URLs are considered.
+        Only URLs with a scheme in allowed_schemes (HTTPS by default) are considered.
         """
-        parsed = urlparse(url)
-        if parsed.scheme != "https":
-            return ""
-        path = parsed.path if parsed.path == "/" else parsed.path.rstrip("/")
-        canonical = parsed._replace(path=path, query="", fragment="").geturl()
-        # Optional: remove default ports if present
-        if parsed.port:
-            if (parsed.scheme == "http" and parsed.port == 80) or (parsed.scheme == "https" and parsed.port == 443):
-                canonical = canonical.replace(f":{parsed.port}", "")
-        return canonical
+        return canonicalize_url(url, self.allowed_schemes)
 
     def stop(self):
         """Request the crawler to stop gracefully"""
         logger.info(f"Stop requested for crawler {self.crawler_id}")
         self.stop_requested = True
         
+        # Persist links scored so far
+        if getattr(self, "link_buffer", None):
+            self.link_buffer.flush()
+
         # Update the crawler model
         if self.crawler_model:
+            self.crawler_model.status = Crawler.STOPPED
             self.crawler_model.is_running = False
             self.crawler_model.end_time = timezone.now()
             self.crawler_model.save()
             
         return True
 
-    def crawl(self, start_url: str, max_depth: int = 3, max_workers: int = 50):
+    def crawl(self, start_url: str, max_depth: int = 3, max_workers: int = 50, engine: str = "threads",
+              crawler_model: Crawler = None):
         """
-        Performs crawling using a thread-safe queue and multiple worker threads.
+        Performs crawling with the selected engine:
+        - "threads": a pipeline of fetch (max_workers threads), parse, score and persist stages.
+        - "async": an asyncio event loop with up to max_workers in-flight requests.
+        The frontier is recorded in FrontierEntry rows, so an interrupted crawl can be resumed.
+        crawler_model is an already created (e.g. queued) crawler to run; start_url and
+        max_depth are then taken from it.
         """
-        # Generate a unique ID for this crawler instance
-        self.crawler_id = f"{start_url}_{int(time.time())}"
+        if engine not in CRAWL_ENGINES:
+            raise ValueError(f"Unknown crawl engine: {engine}")
+
+        if crawler_model is None:
+            # Create and save the crawler model
+            crawler_model = Crawler.objects.create(
+                url=start_url,
+                keyword=self.keyword,
+                is_running=True,
+                max_depth=max_depth,
+                user=self.user  # Associate with the user
+            )
+        self._run(crawler_model, max_workers, engine, resume=False)
+
+    def resume(self, crawler_model: Crawler, max_workers: int = 50, engine: str = "threads"):
+        """
+        Continues a crawl that was stopped or interrupted (e.g. by a restart) from its
+        recorded frontier: pages already processed are not fetched again, pages that were
+        still pending are. Keyword and max depth are the ones the crawler was started with.
+        """
+        if engine not in CRAWL_ENGINES:
+            raise ValueError(f"Unknown crawl engine: {engine}")
+
+        crawler_model.end_time = None
+        crawler_model.save(update_fields=['end_time'])
+        self._run(crawler_model, max_workers, engine, resume=True)
+
+    def attach(self, crawler_model: Crawler):
+        """Binds the scraper to a crawler row: per-crawl score cache and buffered link writes."""
+        self.crawler_model = crawler_model
+        self.crawler_id = str(crawler_model.id)
+        self.keyword = crawler_model.keyword
+        self.score_cache = ScoreCache()
+        self.recrawl = RecrawlDiff(crawler_model.recrawl_of_id) if crawler_model.recrawl_of_id else None
+        if self.near_duplicate_distance is not None:
+            self.near_duplicates = NearDuplicateIndex(self.near_duplicate_distance)
+        if self.trap_detection:
+            self.trap_detector = TrapDetector(**self.trap_limits)
+        self.pages_started = 0
+        self.metrics = CrawlMetrics()
+        self.link_buffer = LinkWriteBuffer(
+            self.crawler_model,
+            batch_size=self.db_batch_size,
+            flush_interval=self.db_flush_interval,
+            metrics=self.metrics
+        ).start()
+
+    def _run(self, crawler_model: Crawler, max_workers: int, engine: str, resume: bool):
+        self.attach(crawler_model)
+        start_url = crawler_model.url
+        max_depth = crawler_model.max_depth
         self.is_running = True
         self.stop_requested = False
-        
-        # Create and save the crawler model
-        self.crawler_model = Crawler.objects.create(
-            id=self.crawler_id,
-            url=start_url,
-            keyword=self.keyword,
-            is_running=True,
-            max_depth=max_depth,
-            user=self.user  # Associate with the user
-        )
+        crawler_model.status = Crawler.RUNNING
+        crawler_model.is_running = True
+        crawler_model.save(update_fields=['status', 'is_running'])
+        # Single compact record of every discovered canonical URL, shared by both engines
+        self.visited = make_visited_set(self.visited_mode, capacity=self.bloom_capacity, error_rate=self.bloom_error_rate)
+        self.frontier = None
+        # Pages left pending by a previous run (see _load_frontier)
+        self.restored = None
+        if self.parse_processes > 0:
+            self.parse_pool = ParsePool(self.parse_processes, self.link_extractor.name)
         
         # Register this crawler in the global dictionary
         active_crawlers[self.crawler_id] = self
+        self.frontier_journal = FrontierJournal(
+            self.crawler_model,
+            batch_size=self.db_batch_size,
+            flush_interval=self.db_flush_interval,
+            metrics=self.metrics,
+            link_buffer=self.link_buffer
+        ).start()
+        self.metrics.gauge("visited", lambda: len(self.visited))
+        self.metrics.gauge("frontier_size", lambda: self.frontier.qsize() if self.frontier is not None else None)
         
         parsed_start = urlparse(start_url)
         base_domain = parsed_start.netloc
         start_url_canonical = self.canonicalize_url(start_url)
         if not start_url_canonical:
             logger.error("Invalid initial URL after canonicalization.")
-            self.is_running = False
-            del active_crawlers[self.crawler_id]
+            self.link_buffer.close()
+            self.frontier_journal.close()
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown(cancel=True)
+            self._finish()
             return
 
-        url_queue = queue.Queue()
-        url_queue.put((start_url_canonical, 0))
-        visited = set()
-        visited.add(start_url_canonical)
-        lock = threading.Lock()
-
-        def worker():
-            while not self.stop_requested:
-                try:
-                    current_url, depth = url_queue.get(timeout=5)
-                except queue.Empty:
-                    break
-                
+        # None starts from start_url; a resume with nothing recorded yet starts over as well
+        pending = self._load_frontier() if resume else None
+        if pending is not None:
+            logger.info(f"Resuming crawler {self.crawler_id}: {len(self.visited)} URLs recorded, {len(pending)} pending")
+        if pending == [] and not len(self.visited):
+            pending = None
+
+        if engine == "async":
+            engine_runner = AsyncCrawlEngine(
+                self,
+                max_concurrency=max_workers,
+                connect_timeout=self.session_pool.timeout[0],
+                read_timeout=self.session_pool.timeout[1]
+            )
+            visited_count = engine_runner.run(start_url_canonical, base_domain, max_depth, pending)
+        else:
+            visited_count = self._crawl_pipeline(start_url_canonical, base_domain, max_depth, max_workers, pending)
+
+        logger.info(f"Crawling finished. Total visited URLs: {visited_count}")
+        logger.info(f"Session pool stats: {self.session_pool.get_stats()}")
+        self.session_pool.close()
+        self.link_buffer.close()
+        self.frontier_journal.close()
+        stats = {
+            "llm_cache": self.score_cache.get_stats(),
+            "prefilter": dict(self.prefilter_stats),
+            "link_writes": self.link_buffer.get_stats(),
+            "frontier": self.frontier_journal.get_stats(),
+            "metrics": self.metrics.snapshot(),
+            "memory": self._memory_usage(),
+        }
+        if self.stages:
+            stats["pipeline"] = self.pipeline_metrics()
+        stats["hosts"] = self.host_scheduler.get_stats()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(cancel=self.stop_requested)
+            stats["parse_pool"] = self.parse_pool.get_stats()
+        if self.near_duplicates is not None:
+            stats["near_duplicates"] = self.near_duplicates.get_stats()
+        if self.trap_detector is not None:
+            stats["traps"] = self.trap_detector.get_stats()
+        if self.recrawl is not None:
+            stats["recrawl"] = self.recrawl_stats()
+        if self.page_budget is not None:
+            stats["page_budget"] = {
+                "budget": self.page_budget,
+                "used": self.pages_started,
+                "exhausted": self.pages_started >= self.page_budget,
+            }
+        self._save_stats(**stats)
+        try:
+            purge_expired_scores()
+        except Exception as e:
+            logger.error(f"Error purging expired score cache entries: {e}")
+        self._finish()
+
+    def recrawl_stats(self) -> dict:
+        """Added/removed/unchanged/changed links against the previous crawl, plus reused and rescored counts."""
+        stats = self.recrawl.get_stats()
+        # Links reused by an earlier (interrupted) run of this crawler
+        saved = (self.crawler_model.stats or {}).get("recrawl", {})
+        for name in stats:
+            stats[name] += saved.get(name, 0)
+        try:
+            stats.update(recrawl_report(self.crawler_model))
+        except Exception as e:
+            logger.error(f"Error comparing crawler {self.crawler_id} with its previous crawl: {e}")
+        return stats
+
+    def _finish(self):
+        self.is_running = False
+        if not self.stop_requested:
+            # stop() already recorded the end of a stopped crawl
+            self.crawler_model.status = Crawler.FINISHED
+            self.crawler_model.is_running = False
+            self.crawler_model.end_time = timezone.now()
+            self.crawler_model.save(update_fields=['status', 'is_running', 'end_time'])
+
+        # Remove from active crawlers
+        active_crawlers.pop(self.crawler_id, None)
+        # Let link streams see the end right away
+        link_notifier.notify(self.crawler_model.id)
+
+    def _load_frontier(self) -> list:
+        """
+        Marks every URL recorded by the previous run as seen. Returns the pending (url, depth)
+        pairs. Pending pages may have been parsed already, with their links recorded but not
+        saved; they are kept in self.restored so every link on them is scored again.
+        """
+        pending = []
+        self.restored = make_visited_set("fingerprint")
+        for url, depth, is_pending in load_frontier(self.crawler_model):
+            self.visited.add(url)
+            if is_pending:
+                self.frontier_journal.track(url)
+                self.restored.add(url)
+                pending.append((url, depth))
+        return pending
+
+    def is_restored(self, url: str) -> bool:
+        """True for pages left pending by a previous run (their links are scored even if already seen)."""
+        return self.restored is not None and url in self.restored
+
+    def _crawl_pipeline(self, start_url_canonical: str, base_domain: str, max_depth: int, max_workers: int,
+                        pending: list = None) -> int:
+        """
+        Thread engine: fetch -> parse -> score -> persist stages, each with its own thread
+        pool and a bounded queue in between, so fetching keeps going while scoring catches up.
+        A URL taken from the frontier is marked done once the links found on its page have
+        been scored and handed to the link buffer, so the frontier drains exactly when every
+        reachable page was processed, and a page whose links were not all scored (e.g.
+        because of a stop) stays pending for a resume.
+        When resuming, pending holds the (url, depth) pairs left by the previous run.
+        Returns the number of visited URLs.
+        """
+        parsed_start = urlparse(start_url_canonical)
+        frontier = Frontier(f"{parsed_start.scheme}://{parsed_start.netloc}", visited=self.visited,
+                            journal=self.frontier_journal, trap_detector=self.trap_detector,
+                            mode=self.frontier_mode, aging_window=self.aging_window)
+        if pending is None:
+            frontier.add(start_url_canonical, 0)
+        else:
+            for url, depth in pending:
+                frontier.restore(url, depth)
+        self.frontier = frontier
+        should_stop = lambda: self.stop_requested
+
+        def fetch(item):
+            current_url, depth = item
+            queued = False
+            # Stays False for URLs skipped because of a stop, so a resume fetches them
+            completed = False
+            try:
                 if self.stop_requested:
-                    url_queue.task_done()
-                    break
-                    
+                    return
                 if depth > max_depth:
-                    url_queue.task_done()
-                    continue
-                    
-                logger.info(f"Crawling: {current_url} (depth: {depth}, queue size: {url_queue.qsize()}, visited: {len(visited)})")
-                html = self.fetch_page(current_url)
-                
-                if not html or self.stop_requested:
-                    url_queue.task_done()
-                    continue
-                    
-                links = self.parse_links(html, current_url)
+                    completed = True
+                    return
+                if not self.take_page():
+                    # Out of page budget: left pending, so a resume continues from here
+                    return
+                completed = True
+                logger.info(f"Crawling: {current_url} (depth: {depth}, queue size: {frontier.qsize()}, visited: {frontier.visited_count()})")
+                html = self.polite_fetch(current_url, depth, frontier.requeue)
+                if html and not self.stop_requested:
+                    queued = parse_stage.put((current_url, depth, html), should_stop)
+                completed = not self.stop_requested
+            finally:
+                if not queued:
+                    frontier.task_done(current_url, completed)
+
+        def parse(item):
+            current_url, depth, html = item
+            completed = False
+            # Once the links are queued for scoring, the score stage marks the page done
+            handed_over = False
+            try:
+                if self.stop_requested:
+                    return
                 new_links = []
-                
-                for link in links:
+                restored = self.is_restored(current_url)
+                for link in self.parse_links(html, current_url):
                     if self.stop_requested:
                         break
-                        
                     canonical = self.canonicalize_url(link["url"])
-                    if canonical and self.is_internal(canonical, base_domain):
-                        with lock:
-                            if canonical not in visited:
-                                visited.add(canonical)
-                                new_links.append(link)
-                                url_queue.put((canonical, depth + 1))
-                                self.all_links.add(canonical)
-                
-                # Process new links
-                for link in new_links:
-                    if self.stop_requested:
-                        break
-                    self.process_link(link)
-                    
-                url_queue.task_done()
-
-        threads = []
-        for _ in range(max_workers):
-            t = threading.Thread(target=worker)
-            t.daemon = True
-            t.start()
-            threads.append(t)
-            
+                    if not canonical or not self.is_internal(canonical, base_domain):
+                        continue
+                    # Links one level past max_depth are still scored, but never fetched
+                    if (frontier.add(canonical, depth + 1, enqueue=depth + 1 <= max_depth,
+                                     score=self.link_priority(link)) or restored):
+                        new_links.append(link)
+                # Every child was recorded before the page is marked done
+                completed = not self.stop_requested
+                if new_links and completed:
+                    handed_over = score_stage.put((current_url, new_links), should_stop)
+                    completed = handed_over
+            finally:
+                if not handed_over:
+                    frontier.task_done(current_url, completed)
+
+        def score(item):
+            current_url, links = item
+            handed_over = False
+            try:
+                scored = self.score_links(links)
+                # Links left unscored (stop requested) keep the page pending
+                completed = len(scored) == len(links)
+                # Not interruptible: whatever was scored is persisted, even after a stop
+                persist_stage.put((current_url, scored, completed))
+                handed_over = True
+            finally:
+                if not handed_over:
+                    frontier.task_done(current_url, False)
+
+        def persist(item):
+            current_url, scored, completed = item
+            saved = False
+            try:
+                for link, score, link_type in scored:
+                    self._save_link(link.get("url", ""), link.get("text", ""), score, link_type)
+                saved = True
+            finally:
+                frontier.task_done(current_url, completed and saved)
+
+        persist_stage = Stage("persist", persist, self.persist_workers, self.stage_queue_size).start()
+        score_stage = Stage("score", score, self.score_workers, self.stage_queue_size).start()
+        parse_stage = Stage("parse", parse, self.parse_workers, self.stage_queue_size).start()
+        fetch_stage = FrontierStage("fetch", fetch, frontier, max_workers).start()
+        self.stages = [fetch_stage, parse_stage, score_stage, persist_stage]
+        for stage in self.stages:
+            self.metrics.gauge(f"{stage.name}_queue_depth", lambda stage=stage: stage.metrics()["queue_depth"])
+            self.metrics.gauge(f"{stage.name}_busy", lambda stage=stage: stage.metrics()["busy"])
+
+        last_report = time.monotonic()
         try:
-            url_queue.join()
+            while not frontier.join(timeout=1.0):
+                if self.stop_requested:
+                    break
+                if time.monotonic() - last_report >= self.metrics_interval:
+                    logger.info(f"Pipeline metrics for crawler {self.crawler_id}: {self.pipeline_metrics()}")
+                    last_report = time.monotonic()
         except KeyboardInterrupt:
             self.stop_requested = True
-            
-        for t in threads:
-            t.join(timeout=2)  # Give threads a chance to exit gracefully
 
-        logger.info(f"Crawling finished. Total visited URLs: {len(visited)}")
-        self.is_running = False
-        
-        # Remove from active crawlers
-        if self.crawler_id in active_crawlers:
-            del active_crawlers[self.crawler_id]
+        # Close in pipeline order so each stage drains everything the previous one produced
+        for stage in self.stages:
+            stage.close()
+
+        return frontier.visited_count()
+
+    def pipeline_metrics(self) -> dict:
+        """Per-stage queue depth, busy workers and throughput counters."""
+        return {stage.name: stage.metrics() for stage in self.stages}
 
 
 # Helper functions to manage crawlers
@@ -302,15 +795,15 @@ def get_active_crawlers():
             "id": crawler_id,
             "keyword": crawler.keyword,
             "running": crawler.is_running,
-            "url": crawler_id.split('_')[0],
-            "start_time": crawler_id.split('_')[-1]
+            "url": crawler.crawler_model.url,
+            "start_time": crawler.crawler_model.start_time.timestamp()
         }
     
     # Add crawlers from database that might not be in memory
     for db_crawler in db_crawlers:
-        if db_crawler.id not in result:
-            result[db_crawler.id] = {
-                "id": db_crawler.id,
+        if str(db_crawler.id) not in result:
+            result[str(db_crawler.id)] = {
+                "id": str(db_crawler.id),
                 "keyword": db_crawler.keyword,
                 "running": db_crawler.is_running,
                 "url": db_crawler.url,
@@ -330,10 +823,14 @@ def stop_crawler(crawler_id):
         str_id = str(crawler_id)
         if str_id in active_crawlers:
             active_crawlers[str_id].stop()
+        # A crawl that has not started yet just leaves the queue
+        get_scheduler().cancel(str_id)
         
         # Update database
         crawler = Crawler.objects.filter(id=crawler_id).first()
         if crawler:
+            if crawler.is_running:
+                crawler.status = Crawler.STOPPED
             crawler.is_running = False
             crawler.end_time = timezone.now()
             crawler.save()
@@ -352,6 +849,7 @@ def stop_all_crawlers():
     
     # Stop any crawlers in database
     Crawler.objects.filter(is_running=True).update(
+        status=Crawler.STOPPED,
         is_running=False,
         end_time=timezone.now()
     )
@@ -0,0 +1,174 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import cloudscraper
+
+logger = logging.getLogger(__name__)
+
+
+class SessionPoolTimeout(Exception):
+    """No session of the host's pool was returned in time."""
+
+
+def _connection_counts(session) -> tuple:
+    """(connections opened, requests sent) over the urllib3 connection pools of a session."""
+    connections = requests = 0
+    for adapter in getattr(session, "adapters", {}).values():
+        pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+        if pools is None:
+            continue
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests += pool.num_requests
+    return connections, requests
+
+
+class SessionPool:
+    """
+    Keeps a bounded pool of cloudscraper sessions per host so that worker threads
+    reuse keep-alive connections (and solved challenges) instead of creating a new
+    session for every request.
+
+    Stats count session checkouts (sessions_created, sessions_reused) and, read from
+    urllib3, the HTTP requests sent and the connections they opened; connection_reuse_ratio
+    is the share of requests sent over an already open keep-alive connection.
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10.0, read_timeout: float = 30.0,
+                 browser: str = 'chrome', checkout_timeout: float = None):
+        self.pool_size = max(1, pool_size)
+        self.timeout = (connect_timeout, read_timeout)
+        # A borrowed session is held for one request, so waiting longer than that means it leaked
+        self.checkout_timeout = checkout_timeout if checkout_timeout is not None else connect_timeout + read_timeout
+        self.browser = browser
+        self._pools = {}
+        self._created = {}
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"sessions_created": 0, "sessions_reused": 0, "checkouts": 0, "waits": 0, "timeouts": 0}
+        # Connection counters of sessions already closed
+        self._closed_connections = 0
+        self._closed_http_requests = 0
+
+    def _create_session(self):
+        # Keep cloudscraper's own TLS adapter mounted; it is what lets the session pass challenges
+        return cloudscraper.create_scraper(browser=self.browser)
+
+    def _host_pool(self, host: str):
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                pool = queue.LifoQueue(maxsize=self.pool_size)
+                self._pools[host] = pool
+                self._created[host] = 0
+            return pool
+
+    def _checkout(self, host: str):
+        """Borrow a session of the host; returns (pool it belongs to, session)."""
+        pool = self._host_pool(host)
+        try:
+            session = pool.get_nowait()
+            with self._lock:
+                self.stats["sessions_reused"] += 1
+                self.stats["checkouts"] += 1
+            return pool, session
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created[host] < self.pool_size
+            if can_create:
+                self._created[host] += 1
+                self.stats["sessions_created"] += 1
+                self.stats["checkouts"] += 1
+            else:
+                self.stats["waits"] += 1
+
+        if can_create:
+            try:
+                session = self._create_session()
+            except Exception:
+                with self._lock:
+                    self._created[host] -= 1
+                raise
+            with self._lock:
+                self._sessions.add(session)
+            return pool, session
+
+        # Pool exhausted for this host: wait for another thread to return a session
+        try:
+            session = pool.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise SessionPoolTimeout(f"No session for {host} returned within {self.checkout_timeout}s")
+        with self._lock:
+            self.stats["sessions_reused"] += 1
+            self.stats["checkouts"] += 1
+        return pool, session
+
+    def _discard(self, session):
+        """Close a session, keeping its connection counters."""
+        connections, requests = _connection_counts(session)
+        with self._lock:
+            self._sessions.discard(session)
+            self._closed_connections += connections
+            self._closed_http_requests += requests
+        try:
+            session.close()
+        except Exception as e:
+            logger.debug(f"Error closing session: {e}")
+
+    @contextmanager
+    def session(self, url: str):
+        """Borrow a session for the host of the given URL and return it to the pool afterwards."""
+        host = urlparse(url).netloc
+        pool, session = self._checkout(host)
+        try:
+            yield session
+        finally:
+            if self._closed:
+                # Free the slot of sessions created after close() so later checkouts create one instead of waiting
+                with self._lock:
+                    if self._pools.get(host) is pool:
+                        self._created[host] -= 1
+                self._discard(session)
+            else:
+                pool.put_nowait(session)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            sessions = list(self._sessions)
+            connections, http_requests = self._closed_connections, self._closed_http_requests
+        for session in sessions:
+            opened, sent = _connection_counts(session)
+            connections += opened
+            http_requests += sent
+        stats["http_requests"] = http_requests
+        stats["connections"] = connections
+        stats["connection_reuse_ratio"] = (
+            round((http_requests - connections) / http_requests, 4) if http_requests else 0.0
+        )
+        return stats
+
+    def close(self):
+        """Close every pooled session; sessions still borrowed are closed when they are returned."""
+        with self._lock:
+            self._closed = True
+            pools = list(self._pools.values())
+            self._pools = {}
+            self._created = {}
+        for pool in pools:
+            while True:
+                try:
+                    session = pool.get_nowait()
+                except queue.Empty:
+                    break
+                self._discard(session)
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+
+from django.db import connection
+from rest_framework.renderers import BaseRenderer
+
+from .models import Crawler, Link
+
+STREAM_FIELDS = ('id', 'url', 'type', 'relevance_score', 'keywords', 'metadata', 'created_at')
+
+# Seconds a link of a distributed crawl is held back before it is streamed (see iter_link_batches)
+STREAM_COMMIT_GRACE = 5.0
+
+# Longest a stream may stay open: under WSGI it holds a server worker thread the whole
+# time, so clients reconnect with Last-Event-ID instead of keeping one stream for hours
+STREAM_MAX_TIMEOUT = 300
+
+
+class LinkNotifier:
+    """
+    Wakes up link streams of a crawler when new links were written in this process, so
+    they do not have to poll the database. Streams still poll at a slow interval for
+    crawls written by other processes (e.g. distributed crawl workers).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+
+    def notify(self, crawler_id):
+        with self._condition:
+            key = str(crawler_id)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._condition.notify_all()
+
+    def version(self, crawler_id) -> int:
+        with self._condition:
+            return self._versions.get(str(crawler_id), 0)
+
+    def wait(self, crawler_id, version: int, timeout: float) -> bool:
+        """Wait until the crawler's version moves past version. Returns False on timeout."""
+        key = str(crawler_id)
+        with self._condition:
+            return self._condition.wait_for(lambda: self._versions.get(key, 0) != version, timeout)
+
+
+# Shared by every write buffer and stream in this process
+link_notifier = LinkNotifier()
+
+
+def iter_link_batches(crawler_id, cursor: int = 0, batch_size: int = 200, poll_interval: float = 5.0,
+                      max_duration: float = 300.0, commit_grace: float = 0.0):
+    """
+    Yield ("links", rows) batches of links with an id greater than cursor, in id order,
+    as they are written; ("keepalive", None) while idle; and ("end", reason) once the
+    crawler is no longer running and everything was sent, or max_duration has passed.
+    At most batch_size rows are held at a time.
+
+    With several writers (distributed crawls), a link can commit after one with a higher
+    id, so the cursor must not move past ids that may still be in flight. With a
+    commit_grace (longer than a link flush can take), a link is only sent once it was
+    seen commit_grace seconds ago: any link with a lower id committed by then.
+    """
+    deadline = time.monotonic() + max_duration
+    # Link id -> when this stream first saw it (links held back by commit_grace)
+    first_seen = {}
+    while True:
+        version = link_notifier.version(crawler_id)
+        # Read before the links: a crawler finishes only after its last links are written
+        running = Crawler.objects.filter(id=crawler_id, is_running=True).exists()
+        rows = list(
+            Link.objects.filter(crawler_id=crawler_id, id__gt=cursor)
+            .order_by('id')
+            .values(*STREAM_FIELDS)[:batch_size]
+        )
+        now = time.monotonic()
+        ready = []
+        for row in rows:
+            if now - first_seen.setdefault(row['id'], now) < commit_grace:
+                break
+            ready.append(row)
+        if ready:
+            cursor = ready[-1]['id']
+            for row in ready:
+                first_seen.pop(row['id'], None)
+            yield "links", ready
+            if len(ready) == batch_size:
+                continue
+        held = len(ready) < len(rows)
+        if not running and not held:
+            yield "end", "finished"
+            return
+        if time.monotonic() >= deadline:
+            yield "end", "timeout"
+            return
+        # Do not hold a database connection while idle
+        connection.close()
+        timeout = min(poll_interval, max(0.0, deadline - time.monotonic()))
+        if held:
+            # Until the first held link is old enough
+            timeout = min(timeout, max(0.0, first_seen[rows[len(ready)]['id']] + commit_grace - time.monotonic()))
+        if not link_notifier.wait(crawler_id, version, timeout) and not held:
+            yield "keepalive", None
+
+
+def _json(value) -> str:
+    return json.dumps(value, default=str, separators=(',', ':'))
+
+
+def format_sse(kind: str, payload) -> str:
+    if kind == "links":
+        return "".join(f"id: {row['id']}\nevent: link\ndata: {_json(row)}\n\n" for row in payload)
+    if kind == "keepalive":
+        return ": keepalive\n\n"
+    return f"event: end\ndata: {_json({'reason': payload})}\n\n"
+
+
+def format_ndjson(kind: str, payload) -> str:
+    if kind == "links":
+        return "".join(_json(row) + "\n" for row in payload)
+    if kind == "keepalive":
+        return "\n"
+    return _json({"end": payload}) + "\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Server-Sent Events; non-stream responses (errors) are sent as a single "error" event."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {_json(data)}\n\n".encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON; non-stream responses (errors) are sent as a single line."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (_json(data) + "\n").encode(self.charset)
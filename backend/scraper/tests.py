@@ -1,3 +1,1442 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib.util
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from urllib.parse import urljoin
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from . import llm_processor
+from .export import EXPORT_FIELDS, export_rows, iter_ndjson
+from .extractors import SoupLinkExtractor, StreamingLinkExtractor
+from .http_cache import CachedPage, FetchedPage, HttpCache
+from .frontier import AsyncFrontier, BloomFilter, ExactURLSet, FingerprintSet, Frontier, LinkPriority, make_visited_set
+from .llm_cache import LRUCache, ScoreCache
+from .models import Crawler, FrontierEntry, Link
+from .dedup import NearDuplicateIndex, simhash
+from .persistence import FrontierJournal, LinkWriteBuffer, URL_MAX_LENGTH
+from .pipeline import FrontierStage, Stage
+from .politeness import HostScheduler, parse_retry_after
+from .scheduler import CrawlScheduler, SchedulerError
+from .recrawl import RecrawlDiff, recrawl_report
+from .search import search_links
+from .sessions import SessionPool, SessionPoolTimeout
+from .streaming import iter_link_batches
+from .traps import TrapDetector
+
+BASE_URL = "https://example.com/section/"
+
+# Hand-written pages covering the cases parse_links has to handle
+LINK_CORPUS = [
+    '<a href="/a">Hello <b>World</b></a>',
+    '<a href="/a">x<!-- comment -->y</a>',
+    '<a href="/a"> a </a><a href=" /b ">  </a>',
+    '<a href="relative/page">relative</a><a href="../up">up</a><a href="https://other.org/x">abs</a>',
+    '<a href="javascript:void(0)" data-href="/from-data-href">t</a>',
+    '<a href="javascript:void(0)" data-url="/from-data-url">t</a>',
+    '<a href="javascript:void(0)" onclick="go(\'https://example.com/from-onclick\')">t</a>',
+    '<a href="javascript:;" data-url="javascript:x" onclick="location=\'https://example.com/y\'">t</a>',
+    '<a href="javascript:;" data-url="javascript:x">dropped</a>',
+    '<a href>empty</a><a name="anchor">no href</a>',
+    '<div><a href="/1">one<div>two</div></a>three</div>after',
+    '<div><a href="/1">one</div>tail</a>',
+    '<a href="/outer">outer<a href="/inner">inner</a>rest</a>',
+    '<a href="/s">x<script>var a = "<a href=/no>"</script>y<style>p {}</style>z</a>',
+    '<a href="/t"><template>tt</template>v<ruby>k<rt>r</rt><rp>(</rp></ruby></a>',
+    '<A HREF="/UPPER">Up&amp;per &copy; &nbsp; &#169; &#x41;</A>',
+    '<a href="/br">a<br>b<br/>c<img src="x.png">d</a>',
+    '<a href="/cdata"><![CDATA[cd]]>e</a>',
+    '<a href="/first" href="/second">duplicate attribute</a>',
+    '<p><a href="/unclosed">never closed <span>deep',
+    '<a href="/self"/>after self-closing',
+    '<a href="/q?a=1&amp;b=2#frag">query</a>',
+    '<table><tr><td><a href="/td">cell</td><td>next</td></tr></table>',
+    '<!DOCTYPE html><html><head><title>T</title></head><body><a href="/doc">doc</a></body></html>',
+    '<a href="/multi">\n  multi\n  line\n</a>',
+    '<a href="/paras"><p>para</p><p>two</p></a>',
+    '<svg><a href="/svg">svg</a></svg>',
+    '<a href="/pi"><?php echo 1 ?>c</a>',
+    '<textarea><a href="/textarea">ta</a></textarea>',
+    '<a href="mailto:someone@example.com">mail</a><a href="tel:+5511999999999">tel</a>',
+    '<a href="/entities">caf&eacute; &euro;5 &#8364;</a>',
+    '<a href="/budget-2024.pdf"><img src="pdf.png" alt="PDF"> Budget 2024 <small>(2 MB)</small></a>',
+]
+
+
+def random_page(rng: random.Random, index: int) -> str:
+    """Random tag soup mixing anchors, nesting, raw-text elements and entities."""
+    tags = ['a href="/r{}"', 'b', 'div', 'p', 'span', 'script', 'style', 'br', 'i', 'template', 'a', 'table', 'td']
+    texts = ['x', ' y ', '&amp;', '\n', 'z z', '<!--c-->', '&nbsp;', 'Contact', 'Relatório']
+    parts = []
+    for _ in range(rng.randint(1, 15)):
+        roll = rng.random()
+        if roll < 0.4:
+            parts.append(rng.choice(texts))
+            continue
+        tag = rng.choice(tags).format(index)
+        parts.append(f'<{tag}>' if roll < 0.8 else f'</{tag.split()[0]}>')
+    return "".join(parts)
+
+
+class LinkExtractorEquivalenceTests(SimpleTestCase):
+    """The streaming extractor must return exactly what the BeautifulSoup one returns."""
+
+    def assertSameLinks(self, html):
+        expected = SoupLinkExtractor().extract(html, BASE_URL)
+        actual = StreamingLinkExtractor().extract(html, BASE_URL)
+        self.assertEqual(actual, expected, msg=f"HTML: {html!r}")
+
+    def test_corpus(self):
+        for html in LINK_CORPUS:
+            with self.subTest(html=html):
+                self.assertSameLinks(html)
+
+    def test_random_pages(self):
+        rng = random.Random(2024)
+        for index in range(500):
+            html = random_page(rng, index)
+            with self.subTest(html=html):
+                self.assertSameLinks(html)
+
+    def test_javascript_fallbacks(self):
+        links = StreamingLinkExtractor().extract("".join(LINK_CORPUS[4:9]), BASE_URL)
+        self.assertEqual([link["url"] for link in links], [
+            "https://example.com/from-data-href",
+            "https://example.com/from-data-url",
+            "https://example.com/from-onclick",
+            "https://example.com/y",
+        ])
+
+
+class FakeOllama:
+    """Stands in for the Ollama client: answers prompts from a list of canned responses."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class BatchResponseParsingTests(SimpleTestCase):
+
+    def test_valid_response(self):
+        response = 'Sure: [{"id": 1, "score": 80, "category": "document"}, {"id": "2", "score": 5, "category": " News "}]'
+        self.assertEqual(llm_processor._parse_batch_response(response, 2), {0: (0.8, "document"), 1: (0.05, "news")})
+
+    def test_malformed_json(self):
+        for response in ("no json here", '[{"id": 1, "score": 80,', "[1, 2", '{"id": 1}'):
+            with self.subTest(response=response):
+                self.assertEqual(llm_processor._parse_batch_response(response, 1), {})
+
+    def test_missing_and_invalid_ids(self):
+        response = (
+            '[{"score": 80, "category": "news"}, {"id": 0, "score": 1, "category": "news"},'
+            ' {"id": 3, "score": 1, "category": "news"}, {"id": "x", "score": 1, "category": "news"},'
+            ' {"id": 2, "score": 10, "category": "contact"}, {"id": 2, "score": 99, "category": "news"}, "junk"]'
+        )
+        # Only the first answer for id 2 is kept
+        self.assertEqual(llm_processor._parse_batch_response(response, 2), {1: (0.1, "contact")})
+
+    def test_scores_are_clamped(self):
+        response = '[{"id": 1, "score": 250, "category": "news"}, {"id": 2, "score": -4, "category": "news"}]'
+        self.assertEqual(llm_processor._parse_batch_response(response, 2), {0: (1.0, "news"), 1: (0.0, "news")})
+
+    def test_invalid_values_are_none(self):
+        response = '[{"id": 1, "score": "high", "category": "document"}, {"id": 2, "score": 40, "category": "blog"}]'
+        self.assertEqual(llm_processor._parse_batch_response(response, 2), {0: (None, "document"), 1: (0.4, None)})
+
+
+class BatchScoringFallbackTests(SimpleTestCase):
+
+    def score(self, texts, responses):
+        fake = FakeOllama(responses)
+        with mock.patch.object(llm_processor, "ollama_llm", fake):
+            return llm_processor.score_and_classify_batch(texts, "budget"), fake
+
+    def test_single_call_for_complete_response(self):
+        results, fake = self.score(
+            ["Budget 2024", "Contact"],
+            ['[{"id": 1, "score": 90, "category": "document"}, {"id": 2, "score": 30, "category": "contact"}]']
+        )
+        self.assertEqual(results, [(0.9, "document"), (0.3, "contact")])
+        self.assertEqual(len(fake.prompts), 1)
+
+    def test_missing_items_fall_back_to_individual_calls(self):
+        results, fake = self.score(
+            ["Budget 2024", "Contact"],
+            ['[{"id": 1, "score": 90, "category": "document"}, {"id": 2, "score": 30, "category": "blog"}]', "contact"]
+        )
+        # Only the invalid category of the second text is asked again
+        self.assertEqual(results, [(0.9, "document"), (0.3, "contact")])
+        self.assertEqual(len(fake.prompts), 2)
+
+    def test_llm_outage_leaves_items_unscored(self):
+        results, fake = self.score(["Budget 2024", "Contact"], [ConnectionError("down")] * 3)
+        # The individual score call fails too; no category call is made for an unscored item
+        self.assertEqual(results, [None, None])
+        self.assertEqual(len(fake.prompts), 3)
+
+    def test_malformed_response_falls_back_for_every_item(self):
+        results, fake = self.score(["Budget 2024"], ["I cannot answer that", "75", "document"])
+        self.assertEqual(results, [(0.75, "document")])
+        self.assertEqual(len(fake.prompts), 3)
+
+    def test_empty_batch_makes_no_call(self):
+        results, fake = self.score([], [])
+        self.assertEqual(results, [])
+        self.assertEqual(fake.prompts, [])
+
+
+class ScoreTextsCacheTests(SimpleTestCase):
+    """LLM failures must not be cached: a later crawl has to ask again."""
+
+    def setUp(self):
+        from .services import WebScraper
+        self.scraper = WebScraper(keyword="budget", user=None, use_http_cache=False)
+        self.scraper.score_cache = ScoreCache(memory=LRUCache(100), use_db=False)
+
+    def test_failed_texts_are_not_cached(self):
+        fake = FakeOllama(['[{"id": 1, "score": 90, "category": "document"}]', ConnectionError("down")])
+        with mock.patch.object(llm_processor, "ollama_llm", fake):
+            results = self.scraper._score_texts(["Budget 2024", "Annual accounts"])
+        self.assertEqual(results, [(0.9, "document"), None])
+        cached = self.scraper.score_cache.get_many(["Budget 2024", "Annual accounts"], "budget")
+        self.assertEqual(list(cached.values()), [(0.9, "document")])
+        counters = self.scraper.metrics.snapshot()["counters"]
+        self.assertEqual((counters["llm_errors"], counters["llm_failed_texts"]), (1, 1))
+
+    def test_failed_links_keep_the_prefilter_score(self):
+        fake = FakeOllama([ConnectionError("down")] * 2)
+        link = {"url": "https://example.com/accounts", "text": "Annual budget accounts"}
+        with mock.patch.object(llm_processor, "ollama_llm", fake):
+            scored = self.scraper.score_links([link])
+        expected = llm_processor.prefilter_link(link["text"], link["url"], "budget")
+        self.assertEqual(scored, [(link, expected[0], expected[1])])
+
+
+# Links of a typical city government home page
+GOVERNMENT_SITE_ANCHORS = [
+    # Header and navigation
+    ("Skip to main content", "#main"), ("Home", "/"), ("Menu", "#"), ("Search", "/search"),
+    ("Residents", "/residents"), ("Business", "/business"), ("Visitors", "/visitors"),
+    ("Government", "/government"), ("Departments", "/departments"), ("Services", "/services"),
+    ("How do I...", "/how-do-i"), ("City Council", "/council"), ("Mayor's Office", "/mayor"),
+    ("Accessibility", "/accessibility"), ("Español", "/es"), ("Sign in", "/login"),
+    # Services
+    ("Pay a utility bill", "/utilities/pay"), ("Report a pothole", "/311/pothole"),
+    ("Building permits", "/permits/building"), ("Trash and recycling schedule", "/trash"),
+    ("Parking tickets", "/parking"), ("Business licenses", "/licenses"), ("Job openings", "/jobs"),
+    ("Parks and recreation", "/parks"), ("Public library", "/library"), ("Police department", "/police"),
+    ("Fire department", "/fire"), ("Animal shelter", "/animals"), ("Property tax lookup", "/tax"),
+    ("Apply for a permit", "/permits/apply"), ("Request public records", "/records"),
+    # Budget and finance
+    ("Budget", "/finance/budget"), ("Adopted budget 2024", "/finance/budget/2024"),
+    ("FY2025 proposed budget (PDF)", "/docs/fy2025-proposed-budget.pdf"),
+    ("Budget hearings schedule", "/finance/budget/hearings"), ("Finance department", "/finance"),
+    ("Annual comprehensive financial report", "/docs/acfr-2023.pdf"), ("Open checkbook", "/finance/checkbook"),
+    ("Capital improvement plan", "/finance/cip"), ("Where your tax dollars go", "/finance/taxes"),
+    ("Contact the budget office", "mailto:budget@city.gov"),
+    # News and events
+    ("City news", "/news"), ("Council approves new bike lanes", "/news/2024/05/bike-lanes"),
+    ("Summer concert series announced", "/news/2024/05/concerts"),
+    ("Water main repair on 5th Street", "/news/2024/05/water-main"), ("Press releases", "/news/press"),
+    ("Events calendar", "/calendar"), ("Council meeting agendas", "/council/agendas"),
+    ("Meeting minutes", "/council/minutes"), ("Public notices", "/notices"),
+    ("Read more", "/news/2024/05/bike-lanes"), ("Read more", "/news/2024/05/concerts"),
+    ("More news", "/news"), ("1", "/news?page=1"), ("2", "/news?page=2"), ("3", "/news?page=3"),
+    ("Next", "/news?page=2"), ("»", "/news?page=10"),
+    # Footer
+    ("Contact us", "/contact"), ("Staff directory", "/directory"), ("City Hall hours", "/hours"),
+    ("Employment", "/jobs"), ("Privacy policy", "/privacy"), ("Terms of use", "/terms"),
+    ("Sitemap", "/sitemap"), ("RSS", "/rss"), ("Facebook", "https://www.facebook.com/city"),
+    ("Twitter", "https://twitter.com/city"), ("Instagram", "https://www.instagram.com/city"),
+    ("YouTube", "https://www.youtube.com/city"), ("", "https://www.linkedin.com/company/city"),
+    ("Call 311", "tel:311"), ("Back to top", "#top"),
+]
+
+
+class PrefilterTests(SimpleTestCase):
+    """Which anchors the default pre-filter band settles without the LLM."""
+
+    def band(self, text, url="https://example.com/page", keyword="budget", band=llm_processor.DEFAULT_PREFILTER_BAND):
+        score, _ = llm_processor.prefilter_link(text, url, keyword)
+        low, high = band
+        return "low" if score < low else "high" if score > high else "llm"
+
+    def home_page_bands(self, **kwargs) -> dict:
+        bands = {"low": [], "high": [], "llm": []}
+        for text, url in GOVERNMENT_SITE_ANCHORS:
+            bands[self.band(text, urljoin("https://city.gov/", url), **kwargs)].append(text)
+        return bands
+
+    def test_skip_rate_on_a_government_home_page(self):
+        bands = self.home_page_bands()
+        # Boilerplate is settled low, keyword matches with a type or URL hint high
+        self.assertEqual({name: len(texts) for name, texts in bands.items()}, {"low": 24, "high": 5, "llm": 44})
+        self.assertCountEqual(bands["high"], [
+            "Budget", "Adopted budget 2024", "FY2025 proposed budget (PDF)", "Budget hearings schedule",
+            "Contact the budget office",
+        ])
+        self.assertFalse([text for text in bands["low"] if "budget" in text.lower()])
+
+        # A low bound above the base score settles most of the page, but also drops keyword-less budget links
+        bands = self.home_page_bands(band=(0.2, 0.8))
+        self.assertEqual({name: len(texts) for name, texts in bands.items()}, {"low": 52, "high": 5, "llm": 16})
+        self.assertIn("Annual comprehensive financial report", bands["llm"])
+        self.assertIn("Where your tax dollars go", bands["low"])
+
+    def test_obviously_irrelevant_anchors_are_rejected(self):
+        for text, url in [
+            ("", "https://example.com/a"),
+            ("   ", "https://example.com/a"),
+            ("Home", "https://example.com/"),
+            ("Read more", "https://example.com/a"),
+            ("Next page", "https://example.com/a?page=2"),
+            ("3", "https://example.com/a?page=3"),
+            ("Página 4", "https://example.com/a?page=4"),
+            ("Budget on Facebook", "https://www.facebook.com/city"),
+            ("»", "https://example.com/a"),
+        ]:
+            with self.subTest(text=text, url=url):
+                self.assertEqual(self.band(text, url), "low")
+
+    def test_anchors_without_lexical_hints_go_to_the_llm(self):
+        for text in ["Annual accounts", "Orçamento", "Where the money goes", "Fiscal year 2024 summary"]:
+            with self.subTest(text=text):
+                self.assertEqual(self.band(text), "llm")
+
+    def test_strong_matches_skip_the_llm(self):
+        self.assertEqual(self.band("Budget report", "https://example.com/budget-2024.pdf"), "high")
+
+
+class LinkWriteBufferTests(SimpleTestCase):
+    """A row the database rejects must not take the rest of its batch down with it."""
+
+    def setUp(self):
+        self.written = []
+
+        def bulk_create(rows, **kwargs):
+            if any("bad" in row.url for row in rows):
+                raise ValueError("value too long")
+            self.written.extend(row.url for row in rows)
+            return rows
+
+        patcher = mock.patch.object(Link.objects, "bulk_create", side_effect=bulk_create)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = LinkWriteBuffer(Crawler(), batch_size=100)
+
+    def add(self, url):
+        self.buffer.add(url, "unknown", 0.5, "budget", {"text": "t"})
+
+    def test_only_failing_rows_are_dropped(self):
+        urls = [f"https://example.com/{i}" for i in range(20)]
+        for i, url in enumerate(urls):
+            self.add(url)
+            if i in (3, 11):
+                self.add(f"https://example.com/bad/{i}")
+        self.assertEqual(self.buffer.flush(), 20)
+        self.assertEqual(sorted(self.written), sorted(urls))
+        self.assertEqual(self.buffer.get_stats()["dropped"], 2)
+
+    def test_urls_over_the_column_limit_are_skipped(self):
+        self.add("https://example.com/" + "x" * URL_MAX_LENGTH)
+        self.add("https://example.com/ok")
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.written, ["https://example.com/ok"])
+        self.assertEqual(self.buffer.get_stats()["dropped"], 1)
+
+
+class FrontierJournalTests(SimpleTestCase):
+
+    def setUp(self):
+        # Rows as the database would hold them: url -> state
+        self.rows = {}
+        self.writes = []
+        self.fail_next = False
+
+        def bulk_create(entries, **kwargs):
+            if self.fail_next:
+                self.fail_next = False
+                raise ConnectionError("connection lost")
+            for entry in entries:
+                self.rows.setdefault(entry.url, entry.state)
+                self.writes.append(("insert", entry.url))
+
+        def filter(crawler, url__in):
+            def update(state):
+                for url in url__in:
+                    self.writes.append(("update", url))
+                    if url in self.rows:
+                        self.rows[url] = state
+            return mock.Mock(update=update)
+
+        patcher = mock.patch.object(FrontierEntry, "objects")
+        objects = patcher.start()
+        objects.bulk_create.side_effect = bulk_create
+        objects.filter.side_effect = filter
+        self.addCleanup(patcher.stop)
+        self.link_buffer = mock.Mock()
+        self.journal = FrontierJournal(Crawler(), batch_size=100, link_buffer=self.link_buffer)
+
+    def test_done_queued_before_its_insert_is_written(self):
+        url = "https://example.com/a"
+        self.journal.add(url, 1)
+        # The first flush takes the insert, then stalls while it flushes the link buffer
+        stalled, release = threading.Event(), threading.Event()
+        self.link_buffer.flush.side_effect = lambda: stalled.set() or release.wait(5)
+        first = threading.Thread(target=self.journal.flush)
+        first.start()
+        self.assertTrue(stalled.wait(5))
+        self.link_buffer.flush.side_effect = None
+        # So the done-update is queued separately and taken by a second flush
+        self.journal.done(url)
+        second = threading.Thread(target=self.journal.flush)
+        second.start()
+        # It must wait for the first flush to write the insert
+        second.join(0.2)
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(self.writes, [("insert", url), ("update", url)])
+        self.assertEqual(self.rows, {url: FrontierEntry.DONE})
+
+    def test_failed_flush_is_written_by_the_next_one(self):
+        self.journal.add("https://example.com/a", 1)
+        self.journal.add("https://example.com/b", 1)
+        self.journal.flush()
+        self.journal.add("https://example.com/c", 2)
+        self.journal.done("https://example.com/a")
+        self.fail_next = True
+        with self.assertLogs("scraper.persistence", "ERROR"):
+            self.assertEqual(self.journal.flush(), 0)
+        self.journal.done("https://example.com/c")
+        self.assertEqual(self.journal.flush(), 2)
+        self.assertEqual(self.rows, {
+            "https://example.com/a": FrontierEntry.DONE,
+            "https://example.com/b": FrontierEntry.PENDING,
+            "https://example.com/c": FrontierEntry.DONE,
+        })
+        self.assertEqual(self.journal.get_stats()["errors"], 1)
+
+
+class SearchRankCursorTests(SimpleTestCase):
+
+    def test_rank_is_double_precision(self):
+        # ts_rank is real (float4); a float4 rank would not equal the float cursor value
+        rank = search_links(Link.objects.all(), "budget").query.annotations["search_rank"]
+        self.assertIsInstance(rank, Cast)
+        self.assertIsInstance(rank.output_field, FloatField)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "full-text search needs PostgreSQL")
+class SearchPaginationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("search", "search@example.com", "pw")
+        crawler = Crawler.objects.create(url="https://example.com", keyword="budget", user=user, max_depth=1)
+        # Identical anchors and URL words: every link gets the same rank
+        self.ids = {
+            Link.objects.create(url=f"https://example.com/budget/{i}", type="document", relevance_score=0.5,
+                                keywords="budget", metadata={"text": "Budget report"}, crawler=crawler).id
+            for i in range(5)
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_cursor_pages_over_tied_ranks(self):
+        seen = []
+        url = "/api/links/?q=budget&page_size=1"
+        while url and len(seen) <= len(self.ids):
+            page = self.client.get(url).json()
+            seen += [link["id"] for link in page["results"]]
+            url = page["next"]
+        self.assertEqual(sorted(seen), sorted(self.ids))
+
+
+class LinkPaginationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("pages", "pages@example.com", "pw")
+        crawler = Crawler.objects.create(url="https://example.com", keyword="budget", user=user, max_depth=1)
+        other = Crawler.objects.create(
+            url="https://example.com", keyword="budget", max_depth=1,
+            user=User.objects.create_user("other", "other@example.com", "pw")
+        )
+        for i, score in enumerate((0.9, 0.5, 0.5, 0.5, 0.5, 0.2, 0.2)):
+            Link.objects.create(url=f"https://example.com/{i}", type="document", relevance_score=score,
+                                keywords="budget", metadata={}, crawler=crawler)
+        Link.objects.create(url="https://example.com/other", type="document", relevance_score=1.0,
+                            keywords="budget", metadata={}, crawler=other)
+        self.expected = list(
+            Link.objects.filter(crawler=crawler).order_by('-relevance_score', '-id').values_list('id', flat=True)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_cursor_pages_over_tied_scores(self):
+        seen = []
+        url = "/api/links/?page_size=2"
+        while url and len(seen) <= len(self.expected):
+            page = self.client.get(url).json()
+            self.assertEqual(set(page), {"next", "results"})
+            self.assertLessEqual(len(page["results"]), 2)
+            seen += [link["id"] for link in page["results"]]
+            url = page["next"]
+        self.assertIsNone(url)
+        self.assertEqual(seen, self.expected)
+
+    def test_links_written_after_the_first_page_do_not_shift_later_pages(self):
+        page = self.client.get("/api/links/?page_size=3").json()
+        Link.objects.create(url="https://example.com/new", type="document", relevance_score=0.95,
+                            keywords="budget", metadata={}, crawler=Crawler.objects.get(user__username="pages"))
+        rest = self.client.get(page["next"]).json()
+        self.assertEqual([link["id"] for link in page["results"] + rest["results"]], self.expected[:6])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/links/?cursor=not-a-cursor").status_code, 404)
+
+
+class LinkExportTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("export", "export@example.com", "pw")
+        self.crawler = Crawler.objects.create(url="https://example.com", keyword="budget", user=user, max_depth=1)
+        other = Crawler.objects.create(url="https://example.com", keyword="budget", user=user, max_depth=1)
+        self.links = [
+            Link.objects.create(url=f"https://example.com/{i}", type="document", relevance_score=i / 10,
+                                keywords="budget", metadata={"text": f"Budget, part {i}"}, crawler=self.crawler)
+            for i in range(5)
+        ]
+        Link.objects.create(url="https://example.com/other", type="page", relevance_score=0.5,
+                            keywords="budget", metadata={}, crawler=other)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def export(self, export_format):
+        response = self.client.get(f"/api/links/export/?crawler={self.crawler.id}&format={export_format}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'filename="links-crawler-{self.crawler.id}.{export_format}"', response["Content-Disposition"])
+        return b"".join(response.streaming_content)
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self.export("ndjson").decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [link.id for link in self.links])
+        self.assertEqual(rows[2]["metadata"], {"text": "Budget, part 2"})
+        self.assertEqual(rows[2]["crawler_id"], str(self.crawler.id))
+        self.assertEqual(set(rows[0]), set(EXPORT_FIELDS))
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export("csv").decode())))
+        self.assertEqual(tuple(rows[0]), EXPORT_FIELDS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [link.id for link in self.links])
+        record = dict(zip(rows[0], rows[3]))
+        self.assertEqual(json.loads(record["metadata"]), {"text": "Budget, part 2"})
+        self.assertEqual(record["created_at"], self.links[2].created_at.isoformat())
+
+    def test_chunks_cover_every_row(self):
+        rows = list(export_rows(Link.objects.all(), chunk_size=2))
+        self.assertEqual(len(list(iter_ndjson(rows, chunk_size=2))), 3)
+        self.assertEqual(sum(chunk.count(b"\n") for chunk in iter_ndjson(rows, chunk_size=2)), 6)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow"), "pyarrow is installed")
+    def test_parquet_without_pyarrow(self):
+        response = self.client.get("/api/links/export/?format=parquet")
+        self.assertEqual(response.status_code, 501)
+        self.assertIn("pyarrow", json.loads(response.content)["error"])
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "Parquet export needs pyarrow")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(self.export("parquet")))
+        self.assertEqual(table.column_names, list(EXPORT_FIELDS))
+        self.assertEqual(table.column("id").to_pylist(), [link.id for link in self.links])
+
+
+class RecrawlDiffTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user("recrawl", "recrawl@example.com", "pw")
+        self.previous = Crawler.objects.create(url="https://a.org", keyword="budget", user=user, max_depth=1)
+        self.crawler = Crawler.objects.create(url="https://a.org", keyword="budget", user=user, max_depth=1,
+                                              recrawl_of=self.previous)
+        for path, text, score in (("/2023", "Budget 2023", 0.9), ("/news", "News", 0.1), ("/gone", "Old page", 0.3)):
+            Link.objects.create(url=f"https://a.org{path}", type="document", relevance_score=score,
+                                keywords="budget", metadata={"text": text}, crawler=self.previous)
+
+    def test_match(self):
+        diff = RecrawlDiff(self.previous.id)
+        links = [
+            {"url": "https://a.org/new", "text": "Budget 2024"},
+            {"url": "https://a.org/2023", "text": "Budget 2023"},
+            {"url": "https://a.org/news", "text": "Latest news"},
+            {"url": "https://a.org/2023", "text": "Budget 2023"},
+        ]
+        # Unchanged links keep the previous score and type; a changed anchor text is scored again
+        self.assertEqual(diff.match(links), {1: (0.9, "document"), 3: (0.9, "document")})
+        self.assertEqual(diff.match([]), {})
+        self.assertEqual(diff.get_stats(), {"reused": 2, "rescored": 2})
+
+    def test_links_of_other_crawls_are_not_reused(self):
+        Link.objects.create(url="https://a.org/new", type="document", relevance_score=0.8, keywords="budget",
+                            metadata={"text": "Budget 2024"}, crawler=self.crawler)
+        self.assertEqual(RecrawlDiff(self.previous.id).match([{"url": "https://a.org/new", "text": "Budget 2024"}]), {})
+
+    def test_report(self):
+        for path, text in (("/2023", "Budget 2023"), ("/news", "Latest news"), ("/new", "Budget 2024")):
+            Link.objects.create(url=f"https://a.org{path}", type="document", relevance_score=0.5,
+                                keywords="budget", metadata={"text": text}, crawler=self.crawler)
+        self.assertEqual(recrawl_report(self.crawler), {
+            "previous_crawler": str(self.previous.id), "added": 1, "removed": 1, "unchanged": 1, "changed": 1
+        })
+
+
+def flip_bits(fingerprint: int, *bits) -> int:
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+class NearDuplicateTests(SimpleTestCase):
+
+    def page(self, seed: int, words: int = 200) -> str:
+        rng = random.Random(seed)
+        vocabulary = [f"word{i}" for i in range(500)]
+        return "<html><body><p>" + " ".join(rng.choice(vocabulary) for _ in range(words)) + "</p></body></html>"
+
+    def test_hamming_distance_threshold(self):
+        fingerprint = 0x0123456789ABCDEF
+        for distance in range(5):
+            # Flipped bits spread over several bands, so no band matches by accident
+            near = flip_bits(fingerprint, *[13 * i + 5 for i in range(distance)])
+            with self.subTest(distance=distance):
+                index = NearDuplicateIndex(max_distance=3)
+                index.check_and_add(fingerprint)
+                self.assertEqual(index.check_and_add(near), distance <= 3)
+
+    def test_zero_distance_only_matches_identical_pages(self):
+        index = NearDuplicateIndex(max_distance=0)
+        self.assertFalse(index.check_and_add(42))
+        self.assertFalse(index.check_and_add(43))
+        self.assertTrue(index.check_and_add(42))
+        self.assertEqual(index.get_stats()["duplicates"], 1)
+
+    def test_simhash_of_similar_and_different_pages(self):
+        page = self.page(1)
+        # Same text with a different layout and one changed word
+        similar = page.replace("<p>", "<div class='print'>").replace("</p>", "</div>", 1)
+        similar = similar.replace("word", "other", 1)
+        self.assertLessEqual((simhash(page) ^ simhash(similar)).bit_count(), 3)
+        self.assertGreater((simhash(page) ^ simhash(self.page(2))).bit_count(), 3)
+
+    def test_short_pages_are_never_duplicates(self):
+        index = NearDuplicateIndex()
+        self.assertIsNone(simhash("<a href='/'>Home</a> <a href='/x'>Next</a>"))
+        self.assertFalse(index.check_and_add(None))
+        self.assertFalse(index.check_and_add(None))
+        self.assertEqual(index.get_stats()["skipped_short"], 2)
+
+
+class TrapDetectorTests(SimpleTestCase):
+
+    def test_pattern_is_quarantined_after_its_cap(self):
+        detector = TrapDetector(max_urls_per_pattern=3)
+        allowed = [detector.allow(f"https://example.com/item/{i}") for i in range(6)]
+        self.assertEqual(allowed, [True, True, True, False, False, False])
+        # Other patterns on the same site are unaffected
+        self.assertTrue(detector.allow("https://example.com/about"))
+        self.assertTrue(detector.allow("https://example.com/tag/python"))
+
+        stats = detector.get_stats()
+        self.assertEqual((stats["checked"], stats["pruned"], stats["quarantined_patterns"]), (8, 3, 1))
+        self.assertEqual(stats["quarantined"][0]["pattern"], "/item/<n>")
+        self.assertEqual(stats["quarantined"][0]["reason"], "pattern_limit")
+        self.assertEqual(stats["quarantined"][0]["pruned"], 3)
+        self.assertEqual(stats["quarantined"][0]["example"], "https://example.com/item/3")
+
+    def test_calendar_patterns_have_a_lower_cap(self):
+        detector = TrapDetector(max_urls_per_pattern=100, max_urls_per_calendar_pattern=2)
+        allowed = [detector.allow(f"https://example.com/events/2020-01-{day}") for day in range(1, 5)]
+        self.assertEqual(allowed, [True, True, False, False])
+        self.assertEqual(detector.get_stats()["quarantined"][0]["reason"], "calendar")
+
+    def test_future_calendar_pages_are_pruned(self):
+        detector = TrapDetector()
+        self.assertTrue(detector.allow("https://example.com/archive/2020/05"))
+        self.assertFalse(detector.allow("https://example.com/archive/2099/05"))
+        self.assertEqual(detector.get_stats()["quarantined"][0]["reason"], "calendar_future")
+
+    def test_repeated_segments_and_deep_paths_are_pruned(self):
+        detector = TrapDetector(max_path_segments=4)
+        self.assertFalse(detector.allow("https://example.com/a/b/a/b"))
+        self.assertFalse(detector.allow("https://example.com/docs/docs/docs"))
+        self.assertFalse(detector.allow("https://example.com/one/two/three/four/five"))
+        self.assertTrue(detector.allow("https://example.com/one/two/three/four"))
+        reasons = sorted((entry["reason"], entry["pattern"]) for entry in detector.get_stats()["quarantined"])
+        self.assertEqual(reasons, [("repeated_segments", "/a/b/..."), ("repeated_segments", "/docs/docs/..."),
+                                   ("too_deep", "/one/two/...")])
+
+    def test_directory_fanout(self):
+        detector = TrapDetector(max_children_per_directory=3)
+        allowed = [detector.allow(f"https://example.com/shop/{color}") for color in ("red", "blue", "green", "pink")]
+        self.assertEqual(allowed, [True, True, True, False])
+        # Quarantined directory: even previously unseen children are rejected
+        self.assertFalse(detector.allow("https://example.com/shop/black"))
+        self.assertEqual(detector.get_stats()["quarantined"][0],
+                         {"pattern": "/shop/*", "reason": "directory_fanout", "pruned": 2,
+                          "example": "https://example.com/shop/pink"})
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class SessionPoolTests(SimpleTestCase):
+
+    def pool(self, **kwargs):
+        pool = SessionPool(**kwargs)
+        patcher = mock.patch.object(pool, "_create_session", side_effect=lambda: mock.Mock(spec=["close"]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return pool
+
+    def test_returned_session_is_reused(self):
+        pool = self.pool(pool_size=2)
+        with pool.session("https://example.com/a") as first:
+            pass
+        with pool.session("https://example.com/b") as second:
+            self.assertIs(second, first)
+        # Other hosts get their own sessions
+        with pool.session("https://other.org/") as other:
+            self.assertIsNot(other, first)
+        stats = pool.get_stats()
+        self.assertEqual((stats["sessions_created"], stats["sessions_reused"], stats["checkouts"]), (2, 1, 3))
+
+    def test_exhausted_pool_times_out(self):
+        pool = self.pool(pool_size=1, checkout_timeout=0.05)
+        with pool.session("https://example.com/a"):
+            with self.assertRaises(SessionPoolTimeout):
+                with pool.session("https://example.com/b"):
+                    pass
+        stats = pool.get_stats()
+        self.assertEqual((stats["waits"], stats["timeouts"]), (1, 1))
+
+    def test_waiting_checkout_gets_the_returned_session(self):
+        pool = self.pool(pool_size=1, checkout_timeout=5)
+        borrowed = threading.Event()
+        with pool.session("https://example.com/a") as first:
+            def borrow():
+                with pool.session("https://example.com/b") as session:
+                    self.assertIs(session, first)
+                    borrowed.set()
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            self.assertFalse(borrowed.wait(0.05))
+        thread.join(5)
+        self.assertTrue(borrowed.is_set())
+
+    def test_checkouts_after_close_do_not_block(self):
+        pool = self.pool(pool_size=1, checkout_timeout=0.05)
+        with pool.session("https://example.com/a") as before:
+            pool.close()
+        before.close.assert_called_once()
+        sessions = []
+        for _ in range(3):
+            with pool.session("https://example.com/a") as session:
+                sessions.append(session)
+        # Each one is closed on return instead of going back to the closed pool
+        self.assertEqual(len(set(map(id, sessions))), 3)
+        for session in sessions:
+            session.close.assert_called_once()
+        self.assertEqual(pool.get_stats()["timeouts"], 0)
+
+    def test_connection_reuse_is_read_from_urllib3(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/"
+
+        pool = SessionPool(pool_size=1)
+        with mock.patch.object(pool, "_create_session", side_effect=requests.Session):
+            for _ in range(4):
+                with pool.session(url) as session:
+                    self.assertEqual(session.get(url, timeout=pool.timeout).text, "ok")
+        stats = pool.get_stats()
+        self.assertEqual((stats["http_requests"], stats["connections"]), (4, 1))
+        self.assertEqual(stats["connection_reuse_ratio"], 0.75)
+        # Counters survive closing the sessions
+        pool.close()
+        self.assertEqual(pool.get_stats()["connections"], 1)
+
+
+def wait_until(condition, timeout: float = 5.0) -> bool:
+    """Poll condition() until it is true or timeout seconds passed."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class CrawlSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        # Jobs run in threads; the status updates of the scheduler are not under test
+        patcher = mock.patch.object(Crawler, "objects")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.crawler_ids = iter(range(1000))
+
+    def crawler(self, user_id=1):
+        return SimpleNamespace(id=next(self.crawler_ids), user_id=user_id)
+
+    def blocking_target(self, started: list, release: threading.Event):
+        def target(workers):
+            started.append(workers)
+            release.wait(5)
+        return target
+
+    def test_async_crawl_accepts_more_in_flight_requests_than_thread_workers(self):
+        scheduler = CrawlScheduler(max_total_workers=200, max_workers_per_crawl=50, max_async_concurrency=2000,
+                                   async_requests_per_worker=50)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        started = []
+        with self.assertRaises(SchedulerError):
+            scheduler.submit(self.crawler(), 500, self.blocking_target(started, release))
+        self.assertEqual(scheduler.submit(self.crawler(), 500, self.blocking_target(started, release), engine="async"), 0)
+        # 500 in-flight requests hold 10 workers of the budget
+        self.assertEqual(scheduler.running_workers(), 10)
+        self.assertEqual(scheduler.submit(self.crawler(), 50, self.blocking_target(started, release)), 0)
+        self.assertEqual(scheduler.running_workers(), 60)
+        with self.assertRaises(SchedulerError):
+            scheduler.submit(self.crawler(), 2001, self.blocking_target(started, release), engine="async")
+        release.set()
+        self.assertTrue(wait_until(lambda: not scheduler.running_workers()))
+        self.assertCountEqual(started, [500, 50])
+        self.assertEqual(scheduler.get_stats()["rejected"], 2)
+
+    def test_next_job_comes_from_the_user_with_fewest_running_workers(self):
+        scheduler = CrawlScheduler(max_total_workers=100, max_workers_per_crawl=50)
+        releases = {}
+        started = []
+
+        def submit(user_id, name):
+            releases[name] = threading.Event()
+            self.addCleanup(releases[name].set)
+
+            def target(workers):
+                started.append(name)
+                releases[name].wait(5)
+            return scheduler.submit(self.crawler(user_id), 50, target)
+
+        self.assertEqual([submit(1, "a1"), submit(1, "a2")], [0, 0])
+        # The budget is full: both wait, user 1's job was submitted first
+        self.assertEqual([submit(1, "a3"), submit(2, "b1")], [1, 1])
+        self.assertTrue(wait_until(lambda: len(started) == 2))
+        releases["a1"].set()
+        # User 2 has nothing running, so its job goes ahead of user 1's older one
+        self.assertTrue(wait_until(lambda: len(started) == 3))
+        self.assertEqual(started[2], "b1")
+        self.assertEqual(scheduler.get_stats()["queued"], 1)
+        releases["a2"].set()
+        self.assertTrue(wait_until(lambda: len(started) == 4))
+        self.assertEqual(started[3], "a3")
+        for release in releases.values():
+            release.set()
+        self.assertTrue(wait_until(lambda: not scheduler.running_workers()))
+        self.assertEqual(scheduler.get_stats()["finished"], 4)
+
+    def test_budget_is_released_when_a_crawl_finishes_fails_or_is_cancelled(self):
+        scheduler = CrawlScheduler(max_total_workers=50, max_workers_per_crawl=50)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        started = []
+
+        def failing(workers):
+            release.wait(5)
+            raise RuntimeError("crawl failed")
+
+        self.assertEqual(scheduler.submit(self.crawler(), 50, failing), 0)
+        self.assertEqual(scheduler.submit(self.crawler(), 30, self.blocking_target(started, release)), 1)
+        queued = self.crawler()
+        self.assertEqual(scheduler.submit(queued, 20, self.blocking_target(started, release)), 2)
+        self.assertEqual(scheduler.running_workers(), 50)
+
+        self.assertTrue(scheduler.cancel(queued.id))
+        self.assertFalse(scheduler.cancel(queued.id))
+        self.assertFalse(scheduler.is_scheduled(queued.id))
+        with self.assertLogs("scraper.scheduler", "ERROR"):
+            release.set()
+            self.assertTrue(wait_until(lambda: started == [30]))
+            self.assertTrue(wait_until(lambda: not scheduler.running_workers()))
+        stats = scheduler.get_stats()
+        self.assertEqual((stats["started"], stats["finished"], stats["cancelled"], stats["queued"]), (2, 2, 1, 0))
+
+    def test_queued_crawls_per_user_are_capped(self):
+        scheduler = CrawlScheduler(max_total_workers=10, max_workers_per_crawl=10, max_queued_per_user=2)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        started = []
+        self.assertEqual(scheduler.submit(self.crawler(), 10, self.blocking_target(started, release)), 0)
+        for position in (1, 2):
+            self.assertEqual(scheduler.submit(self.crawler(), 10, self.blocking_target(started, release)), position)
+        with self.assertRaisesMessage(SchedulerError, "Too many queued crawls (limit 2)"):
+            scheduler.submit(self.crawler(), 10, self.blocking_target(started, release))
+        # The cap is per user
+        self.assertEqual(scheduler.submit(self.crawler(user_id=2), 10, self.blocking_target(started, release)), 1)
+        release.set()
+        self.assertTrue(wait_until(lambda: len(started) == 4))
+
+
+class VisitedSetTests(SimpleTestCase):
+
+    def test_fingerprint_set_membership_across_merges(self):
+        visited = FingerprintSet(min_merge_size=8)
+        urls = [f"https://example.com/p/{i}" for i in range(100)]
+        for url in urls:
+            self.assertTrue(visited.add(url))
+        # Most fingerprints were merged into the sorted array, the last ones are still recent
+        self.assertGreaterEqual(len(visited._sorted), 88)
+        self.assertTrue(visited._recent)
+        self.assertEqual(list(visited._sorted), sorted(visited._sorted))
+        for url in urls:
+            self.assertIn(url, visited)
+            self.assertFalse(visited.add(url))
+        self.assertNotIn("https://example.com/p/100", visited)
+        self.assertEqual(len(visited), 100)
+
+    def test_bloom_filter_false_positive_rate_at_capacity(self):
+        bloom = BloomFilter(capacity=20_000, error_rate=0.01)
+        for i in range(20_000):
+            bloom.add(f"https://example.com/seen/{i}")
+        self.assertTrue(all(f"https://example.com/seen/{i}" in bloom for i in range(20_000)))
+        false_positives = sum(f"https://example.com/unseen/{i}" in bloom for i in range(20_000))
+        self.assertLess(false_positives / 20_000, 0.015)
+
+    def test_modes(self):
+        for mode, cls in [("fingerprint", FingerprintSet), ("bloom", BloomFilter), ("exact", ExactURLSet)]:
+            with self.subTest(mode=mode):
+                visited = make_visited_set(mode, capacity=1000)
+                self.assertIsInstance(visited, cls)
+                self.assertTrue(visited.add("https://example.com/a"))
+                self.assertFalse(visited.add("https://example.com/a"))
+                self.assertTrue(visited.add("https://example.com/b"))
+                self.assertEqual(len(visited), 2)
+        with self.assertRaises(ValueError):
+            make_visited_set("list")
+
+
+class LinkPriorityTests(SimpleTestCase):
+
+    def test_higher_scores_first_and_fifo_on_ties(self):
+        priority = LinkPriority(aging_window=1000)
+        keys = {name: priority.key(score) for name, score in [("a", 0.2), ("b", 0.8), ("c", 0.8), ("d", 0.5)]}
+        self.assertEqual(sorted(keys, key=keys.get), ["b", "c", "d", "a"])
+
+    def test_keys_age(self):
+        priority = LinkPriority(aging_window=10)
+        low = priority.key(0.0)
+        high = [priority.key(1.0) for _ in range(20)]
+        # The low scoring URL is passed by the 9 URLs queued after it within a full point of
+        # score; on the tie at the 10th, the URL queued first goes first
+        self.assertEqual(sorted([low] + high).index(low), 9)
+        self.assertEqual(low[0], high[9][0])
+
+    def test_best_first_frontier_reaches_low_scores(self):
+        frontier = Frontier("https://example.com", mode="best_first", aging_window=4)
+        frontier.add("https://example.com/low", 1, score=0.0)
+        for i in range(8):
+            frontier.add(f"https://example.com/high/{i}", 1, score=0.5)
+        urls = [frontier.get(timeout=0)[0] for _ in range(frontier.qsize())]
+        # Half a point of score is made up by aging_window / 2 later URLs
+        self.assertEqual(urls.index("https://example.com/low"), 1)
+        self.assertEqual([url for url in urls if "high" in url], [f"https://example.com/high/{i}" for i in range(8)])
+
+
+class FrontierTests(SimpleTestCase):
+
+    def fill(self, frontier):
+        for path, score in [("/a", 0.1), ("/b", 0.9), ("/c", 0.5), ("/b", 1.0), ("/d/d/d", 1.0)]:
+            frontier.add(f"https://example.com{path}", 1, score=score)
+        frontier.add("https://example.com/e", 6, enqueue=False)
+
+    def test_async_frontier_matches_the_thread_frontier(self):
+        for mode in ("bfs", "best_first"):
+            with self.subTest(mode=mode):
+                frontier = Frontier("https://example.com", trap_detector=TrapDetector(), mode=mode)
+                self.fill(frontier)
+                expected = [frontier.get(timeout=0) for _ in range(frontier.qsize())]
+
+                async def drain():
+                    async_frontier = AsyncFrontier("https://example.com", trap_detector=TrapDetector(), mode=mode)
+                    self.fill(async_frontier)
+                    urls = []
+                    while async_frontier.qsize():
+                        url, depth = await async_frontier.get()
+                        urls.append((url, depth))
+                        async_frontier.task_done(url)
+                    await asyncio.wait_for(async_frontier.join(), 1)
+                    return urls, async_frontier.visited_count()
+
+                urls, visited = asyncio.run(drain())
+                self.assertEqual(urls, expected)
+                order = ["/a", "/b", "/c"] if mode == "bfs" else ["/b", "/c", "/a"]
+                self.assertEqual(urls, [(f"https://example.com{path}", 1) for path in order])
+                # Duplicates and trap URLs are not queued; the trap URL and /e still count as seen
+                self.assertEqual(len(urls), 3)
+                self.assertEqual(visited, 5)
+
+    def test_urls_are_queued_as_paths_of_the_origin(self):
+        frontier = Frontier("https://example.com/", visited=ExactURLSet())
+        frontier.add("https://example.com", 0)
+        frontier.add("https://example.com/a/b", 1)
+        frontier.add("https://other.org/x", 1)
+        self.assertEqual(list(frontier._queue.queue), [("", 0), ("/a/b", 1), ("https://other.org/x", 1)])
+        self.assertGreater(frontier.memory_usage()["queue_bytes"], 0)
+        self.assertEqual([frontier.get(timeout=0) for _ in range(3)],
+                         [("https://example.com", 0), ("https://example.com/a/b", 1), ("https://other.org/x", 1)])
+        self.assertEqual(frontier.memory_usage()["queue_bytes"], 0)
+
+    def test_journal_bookkeeping(self):
+        journal = mock.Mock()
+        frontier = Frontier("https://example.com", journal=journal)
+        self.assertTrue(frontier.add("https://example.com/a", 1))
+        self.assertFalse(frontier.add("https://example.com/a", 1))
+        frontier.add("https://example.com/deep", 4, enqueue=False)
+        self.assertEqual(journal.add.call_args_list, [
+            mock.call("https://example.com/a", 1, pending=True), mock.call("https://example.com/deep", 4, pending=False),
+        ])
+
+        url, depth = frontier.get(timeout=0)
+        frontier.requeue(url, depth)
+        journal.retry.assert_called_once_with(url)
+        frontier.task_done(url)
+        # The retry is skipped (e.g. stopping): it stays pending in the journal
+        retried, _ = frontier.get(timeout=0)
+        frontier.task_done(retried, completed=False)
+        journal.done.assert_called_once_with(url)
+        self.assertTrue(frontier.join(timeout=0))
+
+
+class PipelineStageTests(SimpleTestCase):
+
+    def test_close_processes_every_queued_item_once(self):
+        processed = []
+        lock = threading.Lock()
+
+        def handler(item):
+            time.sleep(0.001)
+            with lock:
+                processed.append(item)
+
+        stage = Stage("test", handler, concurrency=3, queue_size=2).start()
+        for item in range(50):
+            self.assertTrue(stage.put(item))
+        # Items queued before the stop markers are all handled
+        stage.close(timeout=5)
+        self.assertCountEqual(processed, range(50))
+        metrics = stage.metrics()
+        self.assertEqual((metrics["processed"], metrics["busy"], metrics["queue_depth"]), (50, 0, 0))
+        self.assertLessEqual(metrics["max_queue_depth"], 2)
+
+    def test_put_gives_up_on_a_full_queue_once_stopping(self):
+        release = threading.Event()
+        stage = Stage("test", lambda item: release.wait(5), concurrency=1, queue_size=1).start()
+        self.assertTrue(stage.put(1))
+        self.assertTrue(wait_until(lambda: stage.metrics()["busy"] == 1))
+        self.assertTrue(stage.put(2))
+        self.assertFalse(stage.put(3, should_stop=lambda: True, poll_interval=0.01))
+        release.set()
+        stage.close(timeout=5)
+        self.assertEqual(stage.metrics()["processed"], 2)
+
+    def test_handler_errors_do_not_stop_the_workers(self):
+        def handler(item):
+            if item % 2:
+                raise ValueError(item)
+
+        with self.assertLogs("scraper.pipeline", "ERROR") as logs:
+            stage = Stage("test", handler, concurrency=2, queue_size=4).start()
+            for item in range(10):
+                stage.put(item)
+            stage.close(timeout=5)
+        self.assertEqual(len(logs.records), 5)
+        self.assertEqual((stage.metrics()["processed"], stage.metrics()["errors"]), (5, 5))
+
+    def test_frontier_stage_drains_the_frontier(self):
+        frontier = Frontier("https://example.com")
+        fetched = []
+
+        def fetch(item):
+            url, depth = item
+            fetched.append(url)
+            # Each page links to two children until depth 3
+            if depth < 3:
+                for child in ("a", "b"):
+                    frontier.add(f"{url}/{child}", depth + 1)
+            frontier.task_done(url)
+
+        frontier.add("https://example.com", 0)
+        stage = FrontierStage("fetch", fetch, frontier, concurrency=4, poll_interval=0.01).start()
+        self.assertTrue(frontier.join(timeout=5))
+        stage.close(timeout=5)
+        self.assertEqual(len(fetched), 15)
+        self.assertEqual(len(set(fetched)), 15)
+
+
+class RetryAfterTests(SimpleTestCase):
+
+    def test_delta_seconds(self):
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after(" 0 "), 0.0)
+
+    def test_http_date(self):
+        now = 1_700_000_000.0  # Tue, 14 Nov 2023 22:13:20 GMT
+        self.assertEqual(parse_retry_after("Tue, 14 Nov 2023 22:14:20 GMT", now=now), 60.0)
+        # Dates in the past mean "now"
+        self.assertEqual(parse_retry_after("Tue, 14 Nov 2023 22:00:00 GMT", now=now), 0.0)
+
+    def test_missing_or_invalid_values(self):
+        for value in [None, "", "soon", "-5", "1.5", "Tue, 99 Nov 2023"]:
+            with self.subTest(value=value):
+                self.assertIsNone(parse_retry_after(value))
+
+
+class HostSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        # Fake clock for the token buckets and back-off windows
+        self.now = 100.0
+        patcher = mock.patch("scraper.politeness.time")
+        clock = patcher.start()
+        clock.monotonic.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+
+    def test_token_bucket(self):
+        scheduler = HostScheduler(rate=2.0, burst=2.0, concurrency=10, max_rate=2.0)
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.0)
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.0)
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.5)
+        # Other hosts have their own bucket
+        self.assertEqual(scheduler.try_acquire("b.org"), 0.0)
+        self.now += 0.25
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.25)
+        self.now += 0.25
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.0)
+        # An idle host refills up to the burst only
+        self.now += 60
+        self.assertEqual([scheduler.try_acquire("a.org") for _ in range(3)], [0.0, 0.0, 0.5])
+
+    def test_concurrency_limit(self):
+        scheduler = HostScheduler(rate=100.0, burst=100.0, concurrency=1)
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.0)
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.05)
+        scheduler.release("a.org", 200, 0.1)
+        self.assertEqual(scheduler.try_acquire("a.org"), 0.0)
+
+    def test_retry_after_pauses_the_host_and_halves_its_limits_once(self):
+        with self.assertLogs("scraper.politeness", "WARNING"):
+            scheduler = HostScheduler(rate=8.0, burst=8.0, concurrency=8, default_backoff=10.0, max_backoff=300.0)
+            for _ in range(3):
+                scheduler.try_acquire("a.org")
+            self.assertEqual(scheduler.release("a.org", 429, 0.1, retry_after=30.0), 30.0)
+            self.assertEqual(scheduler.try_acquire("a.org"), 30.0)
+            # Requests already in flight when the host started throttling don't cut the limits again
+            self.assertEqual(scheduler.release("a.org", 503, 0.1), 10.0)
+            stats = scheduler.get_stats()["a.org"]
+            self.assertEqual((stats["concurrency"], stats["rate"], stats["throttled"]), (4.0, 4.0, 2))
+
+            self.now += 30
+            self.assertEqual(scheduler.try_acquire("a.org"), 0.0)
+            # Retry-After is capped by max_backoff
+            self.assertEqual(scheduler.release("a.org", 429, 0.1, retry_after=86400.0), 300.0)
+            self.assertEqual(scheduler.get_stats()["a.org"]["concurrency"], 2.0)
+
+    def test_aimd_concurrency(self):
+        scheduler = HostScheduler(rate=100.0, burst=100.0, concurrency=4, min_concurrency=1, max_concurrency=5,
+                                  target_latency=1.0)
+        for _ in range(8):
+            scheduler.try_acquire("a.org")
+            scheduler.release("a.org", 200, 0.1)
+        # About one more slot per window of fast responses, up to max_concurrency
+        self.assertEqual(scheduler.get_stats()["a.org"]["concurrency"], 5.0)
+        scheduler.try_acquire("a.org")
+        scheduler.release("a.org", 200, 3.0)
+        self.assertEqual(scheduler.get_stats()["a.org"]["concurrency"], 3.75)
+        for _ in range(10):
+            scheduler.try_acquire("a.org")
+            scheduler.release("a.org", None)
+        stats = scheduler.get_stats()["a.org"]
+        self.assertEqual((stats["concurrency"], stats["errors"]), (1.0, 10))
+
+
+class ThrottleRetryTests(SimpleTestCase):
+    """The retry count of a URL is dropped once it was fetched or given up on."""
+
+    def setUp(self):
+        from .services import WebScraper
+        self.scraper = WebScraper(keyword="budget", user=None, use_http_cache=False, max_retries=2)
+        self.scraper.host_scheduler = mock.Mock()
+        self.scraper.host_scheduler.acquire.return_value = True
+
+    def fetch(self, status):
+        response = SimpleNamespace(status_code=status, headers={}, content=b"")
+        requeued = []
+        with mock.patch.object(self.scraper, "fetch_response", return_value=response), \
+                mock.patch.object(self.scraper, "page_from_response", return_value="<html></html>"):
+            html = self.scraper.polite_fetch("https://a.org/x", 1, lambda url, depth: requeued.append(url))
+        return html, requeued
+
+    def test_success_clears_the_retry_count(self):
+        with self.assertLogs("scraper.services", "INFO"):
+            self.assertEqual(self.fetch(429), ("", ["https://a.org/x"]))
+        self.assertEqual(self.scraper._retries, {"https://a.org/x": 1})
+        self.assertEqual(self.fetch(200), ("<html></html>", []))
+        self.assertEqual(self.scraper._retries, {})
+
+    def test_giving_up_clears_the_retry_count(self):
+        with self.assertLogs("scraper.services", "INFO") as logs:
+            for _ in range(3):
+                self.fetch(503)
+        self.assertIn("Giving up on https://a.org/x after 3 throttled attempts", logs.output[-1])
+        self.assertEqual(self.scraper._retries, {})
+
+
+class DistributedCrawlTests(SimpleTestCase):
+
+    def test_seed_is_canonicalized(self):
+        from . import distributed
+        with mock.patch.object(distributed.Crawler, "objects") as crawlers, \
+                mock.patch.object(distributed.FrontierEntry, "objects") as entries:
+            crawler = distributed.submit_distributed_crawl("https://a.org/docs/?page=2#top", "budget", None)
+            entries.create.assert_called_once_with(crawler=crawler, url="https://a.org/docs", depth=0)
+            with self.assertRaises(ValueError):
+                distributed.submit_distributed_crawl("ftp://a.org/docs", "budget", None)
+        self.assertEqual(crawlers.create.call_count, 1)
+
+    def test_idle_scrapers_are_closed(self):
+        from .distributed import CrawlWorker
+        worker = CrawlWorker(worker_id="w1")
+        self.addCleanup(worker.session_pool.close)
+        scrapers = {crawler_id: mock.Mock() for crawler_id in (1, 2, 3)}
+        worker._scrapers = dict(scrapers)
+        with mock.patch.object(FrontierEntry, "objects") as entries:
+            # Only crawl 2 is still running with URLs this worker could lease
+            entries.filter.return_value.values_list.return_value.distinct.return_value = [2]
+            worker._evict_scrapers()
+        self.assertEqual(list(worker._scrapers), [2])
+        for crawler_id, scraper in scrapers.items():
+            self.assertEqual(scraper.link_buffer.close.called, crawler_id != 2)
+
+
+class CrawlParameterTests(SimpleTestCase):
+    """Malformed numbers in crawl requests are answered with 400 naming the field."""
+
+    def post(self, view, data, **kwargs):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        request = APIRequestFactory().post("/", data, format="json")
+        force_authenticate(request, user=SimpleNamespace(is_authenticated=True))
+        return view.as_view()(request, **kwargs)
+
+    def test_parse_number(self):
+        from .views import ParameterError, _parse_number
+        self.assertEqual(_parse_number({"workers": "8"}, "workers", 50), 8)
+        self.assertEqual(_parse_number({}, "workers", 50), 50)
+        self.assertEqual(_parse_number({"host_rate": "2.5"}, "host_rate", 10.0, cast=float), 2.5)
+        self.assertIsNone(_parse_number({"page_budget": ""}, "page_budget", None, optional=True))
+        for value in ("lots", None, "", True, [1]):
+            with self.assertRaisesMessage(ParameterError, "workers must be an integer"):
+                _parse_number({"workers": value}, "workers", 50)
+        with self.assertRaisesMessage(ParameterError, "prefilter_low must be a number"):
+            _parse_number({"prefilter_low": "low"}, "prefilter_low", 0.25, cast=float)
+
+    def test_start_crawl(self):
+        from .views import StartCrawlView
+        base = {"url": "https://a.org", "keyword": "budget"}
+        for field in ("depth", "workers", "pool_size", "parse_processes", "parse_workers", "score_workers",
+                      "host_rate", "prefilter_low", "prefilter_high", "page_budget", "near_duplicate_distance"):
+            response = self.post(StartCrawlView, {**base, field: "abc"})
+            self.assertEqual(response.status_code, 400, field)
+            self.assertIn(field, response.data["error"])
+
+    def test_resume_crawl(self):
+        from .views import ResumeCrawlerView
+        for field in ("workers", "pool_size", "page_budget"):
+            response = self.post(ResumeCrawlerView, {field: "abc"}, crawler_id="00000000-0000-0000-0000-000000000001")
+            self.assertEqual(response.status_code, 400, field)
+            self.assertIn(field, response.data["error"])
+
+
+class LinkStreamTests(SimpleTestCase):
+    """iter_link_batches against a fake clock and a fake Link table."""
+
+    def setUp(self):
+        self.now = 0.0
+        self.running = False
+        # Link ids committed by the given time
+        self.committed = lambda now: []
+        self.cursors = []
+        for target, configure in (
+            ("scraper.streaming.time", lambda m: setattr(m.monotonic, "side_effect", lambda: self.now)),
+            ("scraper.streaming.connection", lambda m: None),
+            ("scraper.streaming.link_notifier", self.configure_notifier),
+            ("scraper.streaming.Crawler.objects", lambda m: setattr(
+                m.filter.return_value.exists, "side_effect", lambda: self.running)),
+            ("scraper.streaming.Link.objects", lambda m: setattr(m.filter, "side_effect", self.links)),
+        ):
+            patcher = mock.patch(target)
+            configure(patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def configure_notifier(self, notifier):
+        notifier.version.return_value = 0
+
+        def wait(crawler_id, version, timeout):
+            # Nothing written in this process: sleep through the timeout
+            self.now += timeout
+            return False
+        notifier.wait.side_effect = wait
+
+    def links(self, crawler_id, id__gt):
+        self.cursors.append(id__gt)
+        queryset = mock.Mock()
+        queryset.order_by.return_value.values.return_value = [
+            {"id": link_id} for link_id in sorted(self.committed(self.now)) if link_id > id__gt
+        ]
+        return queryset
+
+    def batches(self, **kwargs):
+        return [
+            (kind, [row["id"] for row in payload] if kind == "links" else payload)
+            for kind, payload in iter_link_batches(1, **kwargs)
+        ]
+
+    def test_cursor_and_batches(self):
+        self.committed = lambda now: range(1, 6)
+        self.assertEqual(self.batches(cursor=1, batch_size=2), [
+            ("links", [2, 3]), ("links", [4, 5]), ("end", "finished")
+        ])
+        self.assertEqual(self.cursors, [1, 3, 5])
+
+    def test_timeout(self):
+        self.running = True
+        self.assertEqual(self.batches(poll_interval=4.0, max_duration=10.0), [
+            ("keepalive", None), ("keepalive", None), ("keepalive", None), ("end", "timeout")
+        ])
+        self.assertEqual(self.now, 10.0)
+
+    def test_commit_grace_waits_for_lower_ids_committed_late(self):
+        # Link 2 commits after link 3 (another worker's flush was slower)
+        self.committed = lambda now: [1, 3] if now < 5 else [1, 2, 3]
+        # Each link is held for the grace period from when the stream first got to it
+        self.assertEqual(self.batches(commit_grace=5.0), [
+            ("links", [1]), ("links", [2]), ("links", [3]), ("end", "finished")
+        ])
+        self.assertEqual(self.now, 15.0)
+        # Without a grace period link 2 is skipped for good
+        self.now = 0.0
+        self.assertEqual(self.batches(commit_grace=0.0), [("links", [1, 3]), ("end", "finished")])
+
+
+class HttpCacheRevalidationTests(SimpleTestCase):
+    url = "https://a.org/budget"
+    html = '<a href="/budget/2024.pdf">Budget 2024</a>'
+
+    def setUp(self):
+        from .services import WebScraper
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.scraper = WebScraper(keyword="budget", user=None, use_http_cache=False)
+        self.scraper.http_cache = HttpCache(directory.name)
+
+    def response(self, status, html="", **headers):
+        return SimpleNamespace(status_code=status, text=html, headers=headers)
+
+    def fetch(self, response):
+        """One round of polite_fetch without the network: conditional request, then the page."""
+        cached, headers = self.scraper.revalidation_headers(self.url)
+        return self.scraper.page_from_response(self.url, response, cached), headers
+
+    def test_304_reuses_the_cached_links(self):
+        page, headers = self.fetch(self.response(200, self.html, ETag='"v1"', **{"Last-Modified": "Mon, 01 Jan 2024"}))
+        self.assertIsInstance(page, FetchedPage)
+        self.assertEqual(headers, {})
+        with self.assertLogs("scraper.services", "INFO"):
+            links = self.scraper.parse_links(page, self.url)
+        self.assertEqual(links[0]["url"], "https://a.org/budget/2024.pdf")
+
+        page, headers = self.fetch(self.response(304))
+        self.assertEqual(headers, {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024"})
+        self.assertIsInstance(page, CachedPage)
+        with mock.patch.object(self.scraper.link_extractor, "extract") as extract, \
+                self.assertLogs("scraper.services", "INFO"):
+            self.assertEqual(self.scraper.parse_links(page, self.url), links)
+        extract.assert_not_called()
+        self.assertEqual(self.scraper.metrics.counters["cache_not_modified"], 1)
+
+    def test_same_content_with_new_validators_updates_the_entry(self):
+        page, _ = self.fetch(self.response(200, self.html, ETag='"v1"'))
+        with self.assertLogs("scraper.services", "INFO"):
+            links = self.scraper.parse_links(page, self.url)
+        page, _ = self.fetch(self.response(200, self.html, ETag='"v2"'))
+        self.assertIsInstance(page, CachedPage)
+        self.assertEqual(page.links, links)
+        self.assertEqual(self.scraper.revalidation_headers(self.url)[1], {"If-None-Match": '"v2"'})
+        self.assertEqual(self.scraper.metrics.counters["cache_unchanged"], 1)
+
+        # Changed content is parsed again
+        page, _ = self.fetch(self.response(200, self.html + '<a href="/budget/2025.pdf">2025</a>', ETag='"v3"'))
+        self.assertIsInstance(page, FetchedPage)
+        self.assertEqual(page.etag, '"v3"')
+
+    def test_304_for_a_page_that_is_not_cached(self):
+        with self.assertLogs("scraper.services", "ERROR"):
+            self.assertEqual(self.scraper.page_from_response(self.url, self.response(304), None), "")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.scraper.http_cache
+        cache.put("https://a.org/1", etag='"1"')
+        entry_size = cache.size()
+        # Room for two entries and a half; eviction goes down to 90%
+        cache.max_bytes = int(entry_size * 2.5)
+        cache.put("https://a.org/2", etag='"2"')
+        # A hit counts as use: 2 is now the least recently used
+        with mock.patch("scraper.http_cache.time.time", return_value=time.time() + 60):
+            self.assertIsNotNone(cache.get("https://a.org/1"))
+        cache.put("https://a.org/3", etag='"3"')
+        self.assertIsNone(cache.get("https://a.org/2"))
+        self.assertIsNotNone(cache.get("https://a.org/1"))
+        self.assertEqual(cache.get_stats()["evictions"], 1)
@@ -0,0 +1,139 @@
+import re
+import threading
+from datetime import date
+from urllib.parse import urlparse
+
+_DATE_RE = re.compile(r"^\d{4}-\d{1,2}(-\d{1,2})?$")
+_ID_RE = re.compile(r"^(?=.*\d)[0-9a-f-]{16,}$", re.IGNORECASE)
+_DIGITS_RE = re.compile(r"\d+")
+
+# Patterns kept in the report (the ones with the most pruned URLs)
+MAX_REPORTED_PATTERNS = 50
+
+# Keyword arguments of TrapDetector that crawls and settings may override
+TRAP_LIMITS = (
+    "max_urls_per_pattern", "max_urls_per_calendar_pattern", "max_children_per_directory",
+    "max_segment_repeats", "max_path_segments",
+)
+
+
+def _normalize_segment(segment: str) -> str:
+    if segment.isdigit():
+        return "<year>" if len(segment) == 4 and 1900 <= int(segment) <= 2099 else "<n>"
+    if _DATE_RE.match(segment):
+        return "<date>"
+    if _ID_RE.match(segment):
+        return "<id>"
+    return _DIGITS_RE.sub("<n>", segment)
+
+
+def _repeated_block(segments: list, max_repeats: int) -> bool:
+    """True if some segment occurs more than max_repeats times or a block of 2+ segments repeats back to back (/a/b/a/b)."""
+    counts = {}
+    for segment in segments:
+        counts[segment] = counts.get(segment, 0) + 1
+        if counts[segment] > max_repeats:
+            return True
+    for size in range(2, len(segments) // 2 + 1):
+        for start in range(len(segments) - 2 * size + 1):
+            if segments[start:start + size] == segments[start + size:start + 2 * size]:
+                return True
+    return False
+
+
+class TrapDetector:
+    """
+    Spots crawler traps (infinite URL spaces) among newly discovered URLs:
+
+    - Path patterns: numbers, dates and ids in the path are generalized (/events/2031/05
+      becomes /events/<year>/<n>) and every pattern may only produce max_urls_per_pattern
+      URLs, max_urls_per_calendar_pattern for patterns with a year or a date in them.
+    - Calendar pages for years after next year.
+    - Repeated path segments (/a/b/a/b/..., or a segment more than max_segment_repeats
+      times) and paths deeper than max_path_segments.
+    - Directories with more than max_children_per_directory distinct children (faceted paths).
+
+    Once a pattern or directory exceeds its cap it is quarantined: none of its further
+    URLs are fetched. The report lists what was pruned, per pattern.
+    """
+
+    def __init__(self, max_urls_per_pattern: int = 5000, max_urls_per_calendar_pattern: int = 400,
+                 max_children_per_directory: int = 2000, max_segment_repeats: int = 2, max_path_segments: int = 12):
+        self.max_urls_per_pattern = max_urls_per_pattern
+        self.max_urls_per_calendar_pattern = max_urls_per_calendar_pattern
+        self.max_children_per_directory = max_children_per_directory
+        self.max_segment_repeats = max_segment_repeats
+        self.max_path_segments = max_path_segments
+        self.max_year = date.today().year + 1
+        self._patterns = {}     # pattern -> URLs allowed so far
+        self._directories = {}  # directory -> distinct children allowed so far
+        self._quarantine = {}   # quarantined pattern or directory -> reason
+        self._pruned = {}       # (reason, pattern) -> {"pruned", "example"}
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "pruned": 0}
+
+    def allow(self, url: str) -> bool:
+        """Check a newly discovered URL; False if it looks like part of a trap and must not be fetched."""
+        path = urlparse(url).path
+        segments = [segment for segment in path.split("/") if segment]
+        normalized = [_normalize_segment(segment) for segment in segments]
+        pattern = "/" + "/".join(normalized)
+        directory = "/" + "/".join(segments[:-1])
+        directory_key = directory.rstrip("/") + "/*"
+
+        reason, key = self._url_reason(segments, normalized)
+        with self._lock:
+            self.stats["checked"] += 1
+            if reason is None:
+                if pattern in self._quarantine:
+                    reason, key = self._quarantine[pattern], pattern
+                elif directory_key in self._quarantine:
+                    reason, key = self._quarantine[directory_key], directory_key
+                else:
+                    calendar = "<year>" in normalized or "<date>" in normalized
+                    limit = self.max_urls_per_calendar_pattern if calendar else self.max_urls_per_pattern
+                    children = self._directories.get(directory, 0)
+                    if self._patterns.get(pattern, 0) >= limit:
+                        reason, key = ("calendar" if calendar else "pattern_limit"), pattern
+                    elif segments and children >= self.max_children_per_directory:
+                        reason, key = "directory_fanout", directory_key
+                    else:
+                        self._patterns[pattern] = self._patterns.get(pattern, 0) + 1
+                        if segments:
+                            self._directories[directory] = children + 1
+                        return True
+                    self._quarantine[key] = reason
+
+            self.stats["pruned"] += 1
+            entry = self._pruned.get((reason, key))
+            if entry is None:
+                entry = self._pruned[(reason, key)] = {"pruned": 0, "example": url}
+            entry["pruned"] += 1
+        return False
+
+    def _url_reason(self, segments: list, normalized: list):
+        """(reason, report key) for traps visible in the URL alone, or (None, None)."""
+        prefix = "/" + "/".join(normalized[:2])
+        if len(segments) > self.max_path_segments:
+            return "too_deep", f"{prefix}/..."
+        if _repeated_block(segments, self.max_segment_repeats):
+            return "repeated_segments", f"{prefix}/..."
+        for segment, token in zip(segments, normalized):
+            year = int(segment[:4]) if token in ("<year>", "<date>") else None
+            if year is not None and year > self.max_year:
+                return "calendar_future", f"{prefix}/..."
+        return None, None
+
+    def get_stats(self) -> dict:
+        """Checked and pruned counts, and the quarantined patterns with most pruned URLs first."""
+        with self._lock:
+            quarantined = sorted(
+                ({"pattern": key, "reason": reason, **entry} for (reason, key), entry in self._pruned.items()),
+                key=lambda entry: entry["pruned"],
+                reverse=True
+            )
+            return {
+                **self.stats,
+                "quarantined_patterns": len(quarantined),
+                "quarantined": quarantined[:MAX_REPORTED_PATTERNS],
+            }
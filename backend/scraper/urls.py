@@ -4,6 +4,10 @@ from .views import (
     LinkViewSet, 
     ListCrawlersView, 
     StopCrawlerView, 
+    ResumeCrawlerView,
+    CrawlerMetricsView,
+    CrawlerLinkStreamView,
+    PrometheusMetricsView,
     StopAllCrawlersView,
     LoginView,
     TestView,
@@ -19,6 +23,10 @@ urlpatterns = [
     path('crawlers/', ListCrawlersView.as_view(), name='list-crawlers'),
     path('crawlers/start/', StartCrawlView.as_view(), name='start-crawler'),  # Add new endpoint
     path('crawlers/stop/<uuid:crawler_id>/', StopCrawlerView.as_view(), name='stop-crawler'),
+    path('crawlers/resume/<uuid:crawler_id>/', ResumeCrawlerView.as_view(), name='resume-crawler'),
+    path('crawlers/<uuid:crawler_id>/metrics/', CrawlerMetricsView.as_view(), name='crawler-metrics'),
+    path('crawlers/<uuid:crawler_id>/links/stream/', CrawlerLinkStreamView.as_view(), name='crawler-link-stream'),
+    path('metrics/', PrometheusMetricsView.as_view(), name='prometheus-metrics'),
     path('crawlers/stop-all/', StopAllCrawlersView.as_view(), name='stop-all-crawlers'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -1,9 +1,10 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import authenticate
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -11,19 +12,53 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExampl
 from drf_spectacular.types import OpenApiTypes
 
 from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
 from .models import Link, Crawler  
 from .serializers import (
     LinkSerializer, CrawlerSerializer, MessageSerializer, LoginSerializer
 )
-from .services import WebScraper, get_active_crawlers, stop_crawler, stop_all_crawlers
-import threading
+from .services import WebScraper, get_active_crawlers, stop_crawler, stop_all_crawlers, CRAWL_ENGINES, active_crawlers
+from .frontier import FRONTIER_MODES
+from .traps import TRAP_LIMITS
+from .llm_processor import DEFAULT_PREFILTER_BAND
+from .distributed import submit_distributed_crawl
+from .scheduler import get_scheduler, SchedulerError
+from .metrics import to_prometheus
+from .pagination import LinkCursorPagination
+from .search import search_links
+from .export import export_rows, parquet_schema, ExportUnavailable, EXPORT_RENDERERS, EXPORT_ENCODERS
+from .streaming import iter_link_batches, format_sse, format_ndjson, EventStreamRenderer, NDJSONRenderer, STREAM_COMMIT_GRACE, STREAM_MAX_TIMEOUT
+import functools
 import uuid
 
 
+class ParameterError(ValueError):
+    """A request parameter that is not a valid number; the message names the field."""
+
+
+def _parse_number(data, name: str, default, cast=int, optional: bool = False):
+    """
+    data[name] converted with cast (int or float), or default when it is missing. With
+    optional, null or "" give None. Raises ParameterError for anything else that does
+    not convert, so the view can answer 400 instead of 500.
+    """
+    value = data.get(name, default)
+    if optional and value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        value = None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        kind = "an integer" if cast is int else "a number"
+        raise ParameterError(f"{name} must be {kind}")
+
+
 
 class LinkViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = LinkSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LinkCursorPagination
     
     # Simplify the retrieve schema
     @extend_schema(
@@ -39,15 +74,82 @@ class LinkViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
     
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='q', description='Full-text search on anchor text and URL (web search syntax: "phrase", or, -word)', required=False, type=OpenApiTypes.STR),
+            OpenApiParameter(name='crawler', description='Only links of this crawler', required=False, type=OpenApiTypes.UUID),
+            OpenApiParameter(name='keyword', description='Only links found for this keyword', required=False, type=OpenApiTypes.STR),
+            OpenApiParameter(name='type', description='Only links of this type', required=False, type=OpenApiTypes.STR),
+            OpenApiParameter(name='min_relevance', description='Minimum relevance score', required=False, type=OpenApiTypes.FLOAT),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        operation_id='export_links',
+        description='Export all links matching the list filters in one streamed download, ordered by id: '
+                    'NDJSON (default), CSV or Parquet (Accept header or ?format=ndjson|csv|parquet). '
+                    'Parquet needs pyarrow on the server.',
+        parameters=[
+            OpenApiParameter(name='q', description='Full-text search on anchor text and URL (web search syntax: "phrase", or, -word)', required=False, type=OpenApiTypes.STR),
+            OpenApiParameter(name='crawler', description='Only links of this crawler', required=False, type=OpenApiTypes.UUID),
+            OpenApiParameter(name='keyword', description='Only links found for this keyword', required=False, type=OpenApiTypes.STR),
+            OpenApiParameter(name='type', description='Only links of this type', required=False, type=OpenApiTypes.STR),
+            OpenApiParameter(name='min_relevance', description='Minimum relevance score', required=False, type=OpenApiTypes.FLOAT),
+        ],
+        responses={
+            (200, 'application/x-ndjson'): OpenApiTypes.STR,
+            (200, 'text/csv'): OpenApiTypes.STR,
+            (200, 'application/vnd.apache.parquet'): OpenApiTypes.BINARY,
+        }
+    )
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS, pagination_class=None)
+    def export(self, request):
+        crawler_id = request.query_params.get('crawler')
+        try:
+            name = f"crawler-{uuid.UUID(crawler_id)}" if crawler_id else f"user-{request.user.id}"
+        except ValueError:
+            return Response({"error": "Invalid crawler id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        export_format = request.accepted_renderer.format
+        encoder = EXPORT_ENCODERS[export_format]
+        if export_format == 'parquet':
+            try:
+                encoder = functools.partial(encoder, schema=parquet_schema())
+            except ExportUnavailable as e:
+                return Response({"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        response = StreamingHttpResponse(
+            encoder(export_rows(self.get_queryset())),
+            content_type=request.accepted_renderer.media_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="links-{name}.{export_format}"'
+        return response
+
     def get_queryset(self):
-        # Filter links by the user's crawlers
-        queryset = Link.objects.filter(crawler__user=self.request.user).order_by('-relevance_score')
+        # Filter links by the user's crawlers: a semi-join on the crawler ids, so the
+        # (crawler, ...) / (relevance_score, id) indexes drive the scan instead of a join
+        user_crawlers = Crawler.objects.filter(user=self.request.user).values('id')
+        queryset = (
+            Link.objects.filter(crawler__in=user_crawlers)
+            .defer('search_vector')
+            .order_by('-relevance_score', '-id')
+        )
         
         # Apply filters if provided
+        q = self.request.query_params.get('q', '').strip()
+        crawler_id = self.request.query_params.get('crawler')
         keyword = self.request.query_params.get('keyword')
         link_type = self.request.query_params.get('type')
         min_relevance = self.request.query_params.get('min_relevance')
         
+        if crawler_id:
+            try:
+                queryset = queryset.filter(crawler_id=uuid.UUID(crawler_id))
+            except ValueError:
+                return queryset.none()
+
         if keyword:
             queryset = queryset.filter(keywords=keyword)
         
@@ -60,6 +162,10 @@ class LinkViewSet(viewsets.ReadOnlyModelViewSet):
                 queryset = queryset.filter(relevance_score__gte=min_relevance)
             except ValueError:
                 pass
+
+        if q:
+            # Best matches first (the paginator orders by search_rank)
+            queryset = search_links(queryset, q).order_by('-search_rank', '-id')
                 
         return queryset
     
@@ -75,35 +181,272 @@ class StartCrawlView(generics.GenericAPIView):
         request=LinkSerializer,
         responses={
             202: MessageSerializer,
-            400: MessageSerializer
+            400: MessageSerializer,
+            429: MessageSerializer
         }
     )
     def post(self, request):
         url = request.data.get('url')
         keyword = request.data.get('keyword')
-        depth = int(request.data.get('depth', 3))
-        workers = int(request.data.get('workers', 50))
+        recrawl_of_id = request.data.get('recrawl_of')
+        recrawl_of = None
+        if recrawl_of_id:
+            # Recrawl: URL, keyword and depth default to the previous crawl's
+            try:
+                recrawl_of = Crawler.objects.filter(id=uuid.UUID(str(recrawl_of_id)), user=request.user).first()
+            except ValueError:
+                pass
+            if recrawl_of is None:
+                return Response(
+                    {"error": f"Crawler {recrawl_of_id} not found or not owned by you"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            url = url or recrawl_of.url
+            keyword = keyword or recrawl_of.keyword
+            if keyword != recrawl_of.keyword:
+                return Response(
+                    {"error": "A recrawl must use the keyword of the previous crawl"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        engine = request.data.get('engine', 'threads')
+        frontier_mode = request.data.get('frontier_mode', 'bfs')
+        try:
+            depth = _parse_number(request.data, 'depth', recrawl_of.max_depth if recrawl_of else 3)
+            workers = _parse_number(request.data, 'workers', 50)
+            pool_size = _parse_number(request.data, 'pool_size', 10)
+            parse_processes = _parse_number(request.data, 'parse_processes', 0)
+            parse_workers = _parse_number(request.data, 'parse_workers', 4)
+            score_workers = _parse_number(request.data, 'score_workers', 4)
+            host_rate = _parse_number(request.data, 'host_rate', 10.0, cast=float)
+            prefilter_band = (
+                _parse_number(request.data, 'prefilter_low', DEFAULT_PREFILTER_BAND[0], cast=float),
+                _parse_number(request.data, 'prefilter_high', DEFAULT_PREFILTER_BAND[1], cast=float)
+            )
+            page_budget = _parse_number(request.data, 'page_budget', None, optional=True)
+            # null turns near-duplicate detection off
+            near_duplicate_distance = _parse_number(
+                request.data, 'near_duplicate_distance', getattr(settings, 'CRAWL_NEAR_DUPLICATE_DISTANCE', 3),
+                optional=True
+            )
+        except ParameterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        trap_detection = request.data.get('trap_detection', getattr(settings, 'CRAWL_TRAP_DETECTION', True))
+        if isinstance(trap_detection, str):
+            trap_detection = trap_detection.lower() == 'true'
+        # Overrides of individual caps on top of the CRAWL_TRAP_LIMITS setting
+        trap_limits = request.data.get('trap_limits') or {}
         
         if not url or not keyword:
             return Response(
                 {"error": "URL and keyword are required"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        if engine not in CRAWL_ENGINES + ('distributed',):
+            return Response(
+                {"error": f"Invalid engine. Choose one of: {', '.join(CRAWL_ENGINES + ('distributed',))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not 0.0 <= prefilter_band[0] <= prefilter_band[1] <= 1.0:
+            return Response(
+                {"error": "prefilter_low and prefilter_high must satisfy 0 <= low <= high <= 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if frontier_mode not in FRONTIER_MODES:
+            return Response(
+                {"error": f"Invalid frontier_mode. Choose one of: {', '.join(FRONTIER_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if page_budget is not None and page_budget < 1:
+            return Response(
+                {"error": "page_budget must be at least 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if near_duplicate_distance is not None and not 0 <= near_duplicate_distance <= 31:
+            return Response(
+                {"error": "near_duplicate_distance must be between 0 and 31 bits, or null to disable"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if engine == 'distributed' and (frontier_mode != 'bfs' or page_budget is not None):
+            return Response(
+                {"error": "frontier_mode and page_budget are not supported by the distributed engine"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if (not isinstance(trap_limits, dict)
+                or any(name not in TRAP_LIMITS or isinstance(value, bool) or not isinstance(value, int) or value < 1
+                       for name, value in trap_limits.items())):
+            return Response(
+                {"error": f"trap_limits must map any of {', '.join(TRAP_LIMITS)} to positive integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        trap_limits = {**getattr(settings, 'CRAWL_TRAP_LIMITS', {}), **trap_limits}
+
+        if engine == 'distributed' and 'near_duplicate_distance' in request.data:
+            return Response(
+                {"error": "Distributed workers use the CRAWL_NEAR_DUPLICATE_DISTANCE setting"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if engine == 'distributed' and ('trap_detection' in request.data or 'trap_limits' in request.data):
+            return Response(
+                {"error": "Distributed workers use the CRAWL_TRAP_DETECTION and CRAWL_TRAP_LIMITS settings"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scheduler = get_scheduler()
+        if not 1 <= workers <= scheduler.max_workers(engine):
+            return Response(
+                {"error": f"workers must be between 1 and {scheduler.max_workers(engine)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if engine == 'distributed':
+            # Processed by crawl_worker processes, which may run on other machines
+            try:
+                crawler = submit_distributed_crawl(url, keyword, request.user, max_depth=depth, recrawl_of=recrawl_of)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {"message": f"Distributed crawl {crawler.id} queued for {url} with keyword '{keyword}'"},
+                status=status.HTTP_202_ACCEPTED
+            )
             
-        # Start crawling in a background thread
-        def crawl_task():
-            scraper = WebScraper(keyword=keyword, user=request.user)
-            scraper.crawl(url, max_depth=depth, max_workers=workers)
-            
-        thread = threading.Thread(target=crawl_task)
-        thread.daemon = True
-        thread.start()
-        
-        return Response(
-            {"message": f"Crawling started for {url} with keyword '{keyword}'"},
-            status=status.HTTP_202_ACCEPTED
+        crawler = Crawler.objects.create(
+            url=url,
+            keyword=keyword,
+            user=request.user,
+            max_depth=depth,
+            status=Crawler.QUEUED,
+            recrawl_of=recrawl_of
         )
 
+        # Queued; the scheduler starts it once its workers fit in the global budget
+        def crawl_task(workers):
+            scraper = WebScraper(
+                keyword=keyword,
+                user=request.user,
+                pool_size=pool_size,
+                prefilter_band=prefilter_band,
+                parse_processes=parse_processes,
+                parse_workers=parse_workers,
+                score_workers=score_workers,
+                host_rate=host_rate,
+                frontier_mode=frontier_mode,
+                page_budget=page_budget,
+                near_duplicate_distance=near_duplicate_distance,
+                trap_detection=trap_detection,
+                trap_limits=trap_limits
+            )
+            scraper.crawl(url, max_workers=workers, engine=engine, crawler_model=crawler)
+
+        try:
+            position = scheduler.submit(crawler, workers, crawl_task, engine=engine)
+        except SchedulerError as e:
+            crawler.delete()
+            return Response({"error": str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        if position:
+            message = f"Crawl {crawler.id} for {url} with keyword '{keyword}' queued (position {position})"
+        else:
+            message = f"Crawling started for {url} with keyword '{keyword}' (crawler {crawler.id})"
+        return Response({"message": message}, status=status.HTTP_202_ACCEPTED)
+
+class ResumeCrawlerView(generics.GenericAPIView):
+    serializer_class = MessageSerializer
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        operation_id='resume_crawler',
+        description='Resume a stopped or interrupted crawler from its recorded frontier',
+        responses={
+            202: MessageSerializer,
+            400: MessageSerializer,
+            404: MessageSerializer,
+            409: MessageSerializer,
+            429: MessageSerializer
+        }
+    )
+    def post(self, request, crawler_id):
+        engine = request.data.get('engine', 'threads')
+        frontier_mode = request.data.get('frontier_mode', 'bfs')
+        try:
+            workers = _parse_number(request.data, 'workers', 50)
+            pool_size = _parse_number(request.data, 'pool_size', 10)
+            page_budget = _parse_number(request.data, 'page_budget', None, optional=True)
+        except ParameterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        crawler = Crawler.objects.filter(id=crawler_id, user=request.user).first()
+        if not crawler:
+            return Response(
+                {"error": f"Crawler {crawler_id} not found or not owned by you"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if engine not in CRAWL_ENGINES:
+            return Response(
+                {"error": f"Invalid engine. Choose one of: {', '.join(CRAWL_ENGINES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if frontier_mode not in FRONTIER_MODES:
+            return Response(
+                {"error": f"Invalid frontier_mode. Choose one of: {', '.join(FRONTIER_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if page_budget is not None and page_budget < 1:
+            return Response(
+                {"error": "page_budget must be at least 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if crawler.distributed:
+            # Crawl workers pick the pending URLs up again as soon as the crawler is running
+            crawler.status = Crawler.RUNNING
+            crawler.is_running = True
+            crawler.end_time = None
+            crawler.save(update_fields=['status', 'is_running', 'end_time'])
+            return Response(
+                {"message": f"Crawler {crawler_id} resumed"},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        scheduler = get_scheduler()
+        if scheduler.is_scheduled(crawler.id) or str(crawler.id) in active_crawlers:
+            return Response(
+                {"error": f"Crawler {crawler_id} is already queued or running"},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if not 1 <= workers <= scheduler.max_workers(engine):
+            return Response(
+                {"error": f"workers must be between 1 and {scheduler.max_workers(engine)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        def resume_task(workers):
+            scraper = WebScraper(keyword=crawler.keyword, user=request.user, pool_size=pool_size,
+                                 frontier_mode=frontier_mode, page_budget=page_budget,
+                                 near_duplicate_distance=getattr(settings, 'CRAWL_NEAR_DUPLICATE_DISTANCE', 3),
+                                 trap_detection=getattr(settings, 'CRAWL_TRAP_DETECTION', True),
+                                 trap_limits=getattr(settings, 'CRAWL_TRAP_LIMITS', {}))
+            scraper.resume(crawler, max_workers=workers, engine=engine)
+
+        try:
+            position = scheduler.submit(crawler, workers, resume_task, engine=engine)
+        except SchedulerError as e:
+            return Response({"error": str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        message = f"Crawler {crawler_id} queued (position {position})" if position else f"Crawler {crawler_id} resumed"
+        return Response({"message": message}, status=status.HTTP_202_ACCEPTED)
+
 class ListCrawlersView(generics.ListAPIView):
     serializer_class = CrawlerSerializer
     permission_classes = [IsAuthenticated]
@@ -124,6 +467,104 @@ class ListCrawlersView(generics.ListAPIView):
         else:
             return Crawler.objects.filter(user=self.request.user)
 
+class CrawlerMetricsView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        operation_id='crawler_metrics',
+        description='Live metrics of a crawler: throughput, fetch/LLM/DB latency histograms, '
+                    'frontier size, visited count and pipeline stage queues. '
+                    'For crawlers not running in this process, the metrics saved when they ended.',
+        responses={200: OpenApiTypes.OBJECT, 404: MessageSerializer}
+    )
+    def get(self, request, crawler_id):
+        crawler = Crawler.objects.filter(id=crawler_id, user=request.user).first()
+        if not crawler:
+            return Response(
+                {"error": f"Crawler {crawler_id} not found or not owned by you"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        scraper = active_crawlers.get(str(crawler.id))
+        if scraper is not None:
+            metrics = scraper.metrics.snapshot()
+            if scraper.stages:
+                metrics["stages"] = scraper.pipeline_metrics()
+            live = True
+        else:
+            metrics = (crawler.stats or {}).get("metrics", {})
+            live = False
+
+        return Response({"id": str(crawler.id), "status": crawler.status, "live": live, "metrics": metrics})
+
+class CrawlerLinkStreamView(generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, NDJSONRenderer]
+
+    @extend_schema(
+        operation_id='stream_crawler_links',
+        description='Stream the links of a crawler as they are written, as Server-Sent Events '
+                    '(default) or NDJSON (Accept: application/x-ndjson or ?format=ndjson). '
+                    'Every link carries its id; reconnect with Last-Event-ID or ?cursor=<id> '
+                    'to continue after the last link received.',
+        parameters=[
+            OpenApiParameter(name='cursor', description='Only links with a greater id', required=False, type=OpenApiTypes.INT),
+            OpenApiParameter(name='batch_size', description='Links read per query (max 500)', required=False, type=OpenApiTypes.INT),
+            OpenApiParameter(name='timeout', description=f'Seconds before the stream ends (max {STREAM_MAX_TIMEOUT}); reconnect to continue', required=False, type=OpenApiTypes.INT),
+        ],
+        responses={(200, 'text/event-stream'): OpenApiTypes.STR, (200, 'application/x-ndjson'): OpenApiTypes.STR}
+    )
+    def get(self, request, crawler_id):
+        crawler = Crawler.objects.filter(id=crawler_id, user=request.user).first()
+        if not crawler:
+            return Response(
+                {"error": f"Crawler {crawler_id} not found or not owned by you"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            cursor = int(request.query_params.get('cursor') or request.headers.get('Last-Event-ID') or 0)
+            batch_size = min(500, max(1, int(request.query_params.get('batch_size', 200))))
+            timeout = min(STREAM_MAX_TIMEOUT, max(1, int(request.query_params.get('timeout', STREAM_MAX_TIMEOUT))))
+        except ValueError:
+            return Response(
+                {"error": "cursor, batch_size and timeout must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        formatter = format_ndjson if request.accepted_renderer.format == 'ndjson' else format_sse
+        batches = iter_link_batches(
+            crawler.id,
+            cursor=cursor,
+            batch_size=batch_size,
+            max_duration=timeout,
+            # Distributed workers commit links concurrently, so ids may become visible out of order
+            commit_grace=STREAM_COMMIT_GRACE if crawler.distributed else 0.0
+        )
+        response = StreamingHttpResponse(
+            (formatter(kind, payload) for kind, payload in batches),
+            content_type=request.accepted_renderer.media_type
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Do not let a proxy buffer the stream
+        return response
+
+class PrometheusMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        operation_id='prometheus_metrics',
+        description='Metrics of all crawlers running in this process, in the Prometheus text format',
+        responses={(200, 'text/plain'): OpenApiTypes.STR}
+    )
+    def get(self, request):
+        snapshots = {crawler_id: scraper.metrics.snapshot() for crawler_id, scraper in list(active_crawlers.items())}
+        text = to_prometheus(snapshots)
+        scheduler_stats = get_scheduler().get_stats()
+        for name in ("queued", "running", "workers_in_use", "max_total_workers"):
+            text += f"# TYPE crawl_scheduler_{name} gauge\ncrawl_scheduler_{name} {scheduler_stats[name]}\n"
+        return HttpResponse(text, content_type="text/plain; version=0.0.4; charset=utf-8")
+
 class StopCrawlerView(generics.GenericAPIView):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
@@ -133,8 +574,8 @@ class StopCrawlerView(generics.GenericAPIView):
     )
     def post(self, request, crawler_id):
         try:
-            # Convert string to UUID
-            crawler_id = uuid.UUID(crawler_id)
+            # Convert string to UUID (the URL converter already passes a UUID)
+            crawler_id = uuid.UUID(str(crawler_id))
             crawler = Crawler.objects.filter(id=crawler_id, user=request.user).first()
             
             if not crawler:
@@ -143,8 +584,7 @@ class StopCrawlerView(generics.GenericAPIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            crawler.is_running = False
-            crawler.save()
+            stop_crawler(crawler.id)
             
             return Response({"message": f"Crawler {crawler_id} stopped successfully"})
             
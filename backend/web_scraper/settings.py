@@ -25,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'scraper',
     'drf_spectacular',
@@ -206,3 +207,25 @@ LOGGING = {
     },
 }
 
+
+# Crawl scheduling: crawls are queued and started while the process-wide worker budget allows
+CRAWL_MAX_TOTAL_WORKERS = 200
+CRAWL_MAX_WORKERS_PER_CRAWL = 50
+CRAWL_MAX_QUEUED_PER_USER = 20
+# Async crawls: workers are in-flight requests, up to CRAWL_MAX_ASYNC_CONCURRENCY per crawl,
+# and every CRAWL_ASYNC_REQUESTS_PER_WORKER of them count as one worker of the budget
+CRAWL_MAX_ASYNC_CONCURRENCY = 2000
+CRAWL_ASYNC_REQUESTS_PER_WORKER = 50
+
+# Disk cache of page validators and extracted links, shared by all crawls (empty to disable)
+HTTP_CACHE_DIR = os.path.join(BASE_DIR, 'http_cache')
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Pages whose SimHash is within this many bits of a page already parsed by the crawl are
+# not parsed (None to parse every page); crawls may override it with near_duplicate_distance
+CRAWL_NEAR_DUPLICATE_DISTANCE = 3
+
+# Crawler trap detection (see scraper.traps.TrapDetector); CRAWL_TRAP_LIMITS overrides
+# its caps, e.g. {'max_urls_per_pattern': 20000}. Crawls may override both
+CRAWL_TRAP_DETECTION = True
+CRAWL_TRAP_LIMITS = {}